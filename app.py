@@ -1,22 +1,22 @@
+# Only what the login form needs is imported up front (streamlit and sqlite); pandas,
+# matplotlib and the market data modules are imported after login, see below
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import modules.portfolio
-import modules.market_data
-import modules.rebalance
-import modules.chart
-import csvportion.parseCSVfile
 import os
-from modules.database import PortfolioDB
+import config
+import modules.metrics
+from modules.database import get_db
 import modules.auth  # Import the auth module directly
 
+# Timings for this script run (no-op unless metrics are enabled)
+modules.metrics.begin_trace()
+
 # ---- Streamlit App Title ----
 st.set_page_config(page_title="Portfolio Tracker", layout="wide")
 st.title("📊 Portfolio Tracker Dashboard")
 
-# Initialize database
+# Initialize database (one pooled handler shared by every session, not one per rerun)
 os.makedirs("data", exist_ok=True)  # Create data directory if it doesn't exist
-db = PortfolioDB("data/portfolio_app.db")
+db = get_db("data/portfolio_app.db", config.DB_WRITE_BEHIND_SECONDS)
 
 # Initialize authentication
 auth = modules.auth.PortfolioAuth(db)  # Use the full module path
@@ -27,7 +27,18 @@ if not auth.require_login():
     # and we stop execution here
     st.stop()
 
-# After login
+# After login: the heavy imports (cached in sys.modules after the first logged-in run)
+import pandas as pd
+import matplotlib.pyplot as plt
+import modules.analytics
+import modules.market_data
+import modules.rebalance
+import modules.chart
+import modules.chart_data
+import modules.render_cache
+import modules.snapshots
+import csvportion.parseCSVfile
+
 # Add logout button to sidebar
 if st.sidebar.button("Log Out"):
     auth.logout()
@@ -54,6 +65,10 @@ else:
     # Create initial portfolio in database
     db.create_portfolio(username, portfolio_data, cash_balance, start_date.strftime("%Y-%m-%d"))
 
+# Keep every held symbol in the background quote refresh (when enabled)
+if config.QUOTE_REFRESHER_ENABLED:
+    modules.market_data.watch_symbols(db.get_held_symbols() + list(portfolio_data))
+
 # Initialize session state for stock prices if not already done
 if 'stock_prices' not in st.session_state:
     st.session_state.stock_prices = {}
@@ -63,9 +78,10 @@ if 'stock_prices' not in st.session_state:
 # Add refresh button in sidebar
 if st.sidebar.button("🔄 Refresh Stock Prices"):
     try:
-        # Only fetch prices for symbols we currently have
-        for symbol in st.session_state.stock_prices.keys():
-            st.session_state.stock_prices[symbol] = modules.market_data.current_ticker_price(symbol)
+        # Only fetch prices for symbols we currently have, all in one batched call
+        st.session_state.stock_prices.update(
+            modules.market_data.current_prices(list(st.session_state.stock_prices.keys()))
+        )
         st.sidebar.success("Stock prices updated!")
     except Exception as e:
         st.sidebar.error(f"Error updating prices: {str(e)}")
@@ -88,25 +104,30 @@ cash_balance = st.sidebar.number_input("Excess Cash ($)", value=float(cash_balan
 # ---- Portfolio Holdings Input ----
 if csv_or_manual == "CSV":
     # File uploader
-    uploaded_file = st.sidebar.file_uploader("Upload CSV/Excel", type=["csv", "xlsx", "xls"])
+    uploaded_file = st.sidebar.file_uploader("Upload CSV/Excel/Parquet/Arrow",
+                                             type=csvportion.parseCSVfile.SUPPORTED_EXTENSIONS)
     
     # Try to process the file if it exists
     if uploaded_file is not None:
         try:
-            # Get portfolio data from file
-            portfolio_data = csvportion.parseCSVfile.get_symbol_data(uploaded_file)
+            # Get portfolio data from file, streamed in chunks with per-row validation
+            portfolio_data, import_report = csvportion.parseCSVfile.import_positions(uploaded_file)
+            if not portfolio_data:
+                raise ValueError(f"No valid rows found: {import_report.summary()}")
             
             # Update stock prices for any new symbols
             for symbol in portfolio_data.keys():
                 if symbol not in st.session_state.stock_prices:
                     st.session_state.stock_prices[symbol] = 0
             
-            # Save to database
-            db.update_portfolio(username, portfolio_data)
-            db.update_portfolio_settings(username, cash_balance, start_date.strftime("%Y-%m-%d"))
+            # Save to database (one transaction, skipped if nothing changed)
+            db.save_portfolio(username, portfolio_data, cash_balance, start_date.strftime("%Y-%m-%d"))
             
             # Display success message
-            st.sidebar.success("File processed successfully!")
+            st.sidebar.success(f"File processed successfully! {import_report.summary()}")
+            if import_report.rows_rejected:
+                with st.sidebar.expander(f"⚠️ {import_report.rows_rejected} rows skipped"):
+                    st.table(pd.DataFrame(import_report.error_samples, columns=["Row", "Problem"]))
             st.sidebar.info("Click 'Refresh Stock Prices' to update current prices")
             
         except Exception as e:
@@ -129,9 +150,39 @@ else:
     portfolio_data["TQQQ"] = {"Average Cost": tqqq_cost, "Shares": tqqq_shares}
     portfolio_data[stock2] = {"Average Cost": stock2_cost, "Shares": stock2_shares}
     
-    # Save to database
-    db.update_portfolio(username, portfolio_data)
-    db.update_portfolio_settings(username, cash_balance, start_date.strftime("%Y-%m-%d"))
+    # Queue the save: reruns collapse into one write, and unchanged values are never written
+    db.save_portfolio_deferred(username, portfolio_data, cash_balance, start_date.strftime("%Y-%m-%d"))
+
+# ---- Record a Trade ----
+with st.sidebar.expander("📝 Record Trade"):
+    with st.form("trade_form", clear_on_submit=True):
+        trade_symbol = st.text_input("Ticker").upper()
+        trade_side = st.radio("Side", ["Buy", "Sell"], horizontal=True)
+        trade_shares = st.number_input("Shares", min_value=0.0, step=1.0)
+        trade_price = st.number_input("Price", min_value=0.0, step=0.01)
+        trade_fees = st.number_input("Fees", min_value=0.0, step=0.01)
+        if st.form_submit_button("Record"):
+            try:
+                db.record_trade(username, trade_symbol, trade_shares if trade_side == "Buy" else -trade_shares,
+                                trade_price, trade_fees)
+                st.rerun()
+            except ValueError as e:
+                st.error(f"Unable to record trade: {str(e)}")
+
+# ---- Export ----
+with st.sidebar.expander("⬇️ Export Data"):
+    export_format = st.selectbox("Format", ["parquet", "arrow", "csv"])
+    extension = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}[export_format]
+    try:
+        st.download_button("Holdings", csvportion.parseCSVfile.export_holdings(portfolio_data, export_format),
+                           file_name=f"holdings.{extension}")
+        if st.button("Prepare price history"):
+            price_history = modules.market_data.get_price_frame(list(portfolio_data), start_date)
+            st.download_button("Price history",
+                               csvportion.parseCSVfile.export_price_history(price_history, export_format),
+                               file_name=f"price_history.{extension}")
+    except ValueError as e:
+        st.error(str(e))
 
 # ---- Portfolio Value Calculation ----
 # Calculate portfolio value using stored prices
@@ -162,18 +213,9 @@ else:
 # ---- Portfolio Holdings Table ----
 st.write("### 📌 Your Current Holdings")
 
-# Convert portfolio_data dictionary to DataFrame for display
-holdings_data = []
-for symbol, details in portfolio_data.items():
-    current_price = st.session_state.stock_prices.get(symbol, 0)
-    holdings_data.append({
-        "Symbol": symbol,
-        "Shares": details.get("Shares", 0),
-        "Average Cost": details.get("Average Cost", 0),
-        "Current Price": current_price,
-        "Total Value": round(details.get("Shares", 0) * current_price, 2)
-    })
-            
+# Holdings with P&L, read from the position aggregates the trade ledger maintains
+holdings_data = db.get_holdings_summary(username, st.session_state.stock_prices)
+
 if holdings_data:
     df_portfolio = pd.DataFrame(holdings_data)
     st.table(df_portfolio)
@@ -192,7 +234,7 @@ with col1:
     st.subheader("📈 TQQQ Gain Percentage")
     try:
         gain_percentage = modules.market_data.get_percentage_change("TQQQ", start_date, pd.to_datetime("today"))
-        st.metric(label=f"{"TQQQ"} Change Since Start", value=f"{gain_percentage:.2f}%")
+        st.metric(label="TQQQ Change Since Start", value=f"{gain_percentage:.2f}%")
     except Exception as e:
         st.warning(f"Unable to calculate gain percentage: {str(e)}")
 
@@ -200,7 +242,7 @@ with col1:
 with col2:
     st.subheader("⏳ Quarters Elapsed")
     try:
-        quarters = modules.rebalance.get_quarters(pd.to_datetime(start_date))
+        quarters = modules.rebalance.get_schedule(pd.Timestamp(start_date)).elapsed()
         st.metric(label="Quarters Passed", value=f"{quarters} quarters")
     except Exception as e:
         st.warning(f"Unable to calculate quarters: {str(e)}")
@@ -208,8 +250,9 @@ with col2:
 # ---- Rebalancing Status ----
 st.subheader("🔄 Rebalancing Status")
 try:
-    next_quarter = modules.rebalance.get_next_quarter(pd.to_datetime(start_date))
-    previous_quarter = modules.rebalance.get_previous_quarter(next_quarter)
+    schedule = modules.rebalance.get_schedule(pd.Timestamp(start_date))
+    next_quarter = schedule.next_boundary()
+    previous_quarter = schedule.previous_boundary()
 
     st.write(f"📅 **Next Quarter Ends:** {next_quarter}")
     st.write(f"📆 **Previous Quarter Ended:** {previous_quarter}")
@@ -225,6 +268,7 @@ except Exception as e:
 
 # ---- Rebalancing Suggestions ----
 try:
+    # The return index snaps the window to the quarter's first TQQQ close
     gain_percentage = modules.market_data.get_percentage_change("TQQQ", previous_quarter, next_quarter)
     st.write(f"📊 TQQQ has gained **{gain_percentage:.2f}%** since {previous_quarter}.")
     # Get TQQQ shares from portfolio_data
@@ -238,11 +282,10 @@ except Exception as e:
 st.markdown("---")
 st.subheader("📉 Portfolio Progress Over Time")
 
-# Generate Chart
+# Generate Chart (served from the render cache when holdings, start date and prices are unchanged)
 try:
-    fig = modules.chart.csv_chart(portfolio_data, start_date)
-    st.pyplot(fig)
-    plt.close(fig)  # Close the figure to free memory
+    chart_png = modules.render_cache.render_chart("csv_chart", modules.chart.csv_chart, portfolio_data, start_date)
+    st.image(chart_png)
 except Exception as e:
     st.warning(f"⚠️ Unable to generate chart: {str(e)}")
 
@@ -250,16 +293,90 @@ except Exception as e:
 st.markdown("---")
 st.subheader("📈 Total Portfolio Value Over Time")
 
-# Generate chart based on input method
+chart_type = st.radio("Chart type", ["Interactive", "Static"], index=0 if config.CHART_INTERACTIVE else 1,
+                      horizontal=True)
+
+# Stored daily valuations (holdings, cash and total); only days since the last snapshot are valued here
 try:
-    fig = modules.chart.total_value_chart(portfolio_data, start_date)
-    if fig is not None:
-        st.pyplot(fig)
-        plt.close(fig)  # Close the figure to free memory
-    else:
-        st.info("📤 Please upload a CSV/Excel file to view your portfolio value chart.")
+    value_history = modules.snapshots.value_history(db, username, start_date)
 except Exception as e:
-    st.error(f"⚠️ Unable to generate portfolio value chart: {str(e)}")
-    
+    value_history = None
+    st.error(f"⚠️ Unable to load portfolio value history: {str(e)}")
+
+if value_history is not None and value_history.empty:
+    st.info("📤 Please upload a CSV/Excel file to view your portfolio value chart.")
+elif value_history is not None:
+    # Interactive: downsampled series for each zoom level, drawn client-side
+    show_static = chart_type == "Static"
+    if not show_static:
+        try:
+            # Computed once per change of the stored days and served from the render cache after that
+            chart_series = modules.render_cache.render_series(
+                "value_history_series",
+                lambda: modules.chart_data.value_history_series(value_history, config.CHART_POINTS,
+                                                                config.CHART_DOWNSAMPLE_METHOD),
+                modules.snapshots.history_version(username, value_history))
+            chart_levels = chart_series["levels"]
+            zoom = st.radio("Zoom", list(chart_levels), index=len(chart_levels) - 1, horizontal=True)
+            st.line_chart(modules.chart_data.expand(chart_levels[zoom]))
+        except Exception as e:
+            # Fall back to the matplotlib image
+            st.warning(f"⚠️ Interactive chart unavailable, showing a static one: {str(e)}")
+            show_static = True
+
+    # Static: matplotlib image of every stored day, redrawn only when the stored days change
+    if show_static:
+        try:
+            st.image(modules.render_cache.render_versioned(
+                "value_history_chart", lambda: modules.chart.value_history_chart(value_history),
+                modules.snapshots.history_version(username, value_history)))
+        except Exception as e:
+            st.error(f"⚠️ Unable to generate portfolio value chart: {str(e)}")
+
+    # ---- Risk ----
+    st.subheader("📉 Risk")
+    try:
+        benchmark = config.RISK_BENCHMARK.upper()
+        benchmark_closes = modules.market_data.get_price_frame([benchmark], value_history.index[0])
+        benchmark_closes = benchmark_closes[benchmark].reindex(value_history.index, method="ffill")
+        risk = modules.analytics.risk_metrics(value_history["Total"].to_numpy(), benchmark_closes.to_numpy())
+
+        def show(value, fmt):
+            return "n/a" if pd.isna(value) else fmt.format(value)
+
+        risk_cols = st.columns(4)
+        risk_cols[0].metric("Max Drawdown", show(risk["max_drawdown_pct"], "{:.2f}%"),
+                            help=f"Currently {show(risk['current_drawdown_pct'], '{:.2f}%')} below the peak")
+        risk_cols[1].metric("Time Under Water", f"{int(risk['current_under_water_days'])} days",
+                            help=f"Longest: {int(risk['longest_under_water_days'])} trading days")
+        risk_cols[2].metric(f"Volatility ({config.RISK_WINDOW_DAYS}d)", show(risk["volatility_pct"], "{:.2f}%"))
+        risk_cols[3].metric(f"Beta vs {benchmark}", show(risk["beta"], "{:.2f}"))
+        ratio_cols = st.columns(4)
+        ratio_cols[0].metric("Sharpe Ratio", show(risk["sharpe"], "{:.2f}"))
+        ratio_cols[1].metric("Sortino Ratio", show(risk["sortino"], "{:.2f}"))
+    except Exception as e:
+        st.warning(f"⚠️ Unable to calculate risk measures: {str(e)}")
+
 # Close any open plots to prevent memory issues
-plt.close('all')
\ No newline at end of file
+plt.close('all')
+
+# ---- Admin Timing Panel ----
+if modules.metrics.enabled():
+    if username in config.METRICS_ADMIN_USERS:
+        with st.sidebar.expander("⏱️ Performance"):
+            trace = modules.metrics.current_trace()
+            if trace:
+                st.write("**This run**")
+                df_trace = pd.DataFrame(
+                    [(name, t["calls"], round(t["seconds"] * 1000, 1)) for name, t in trace.items()],
+                    columns=["Call", "Calls", "ms"],
+                ).sort_values("ms", ascending=False)
+                st.table(df_trace)
+            st.write("**Process totals**")
+            metrics_snapshot = modules.metrics.snapshot()
+            st.json({"counters": metrics_snapshot["counters"], "gauges": metrics_snapshot["gauges"]})
+            st.download_button("Prometheus dump", modules.metrics.prometheus_text(), file_name="metrics.prom")
+    try:
+        modules.metrics.write_prometheus()
+    except OSError as e:
+        print(f"Error writing metrics: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+cold_start measures the import cost of the login page and of the full dashboard in fresh interpreters
+each set of imports runs in a new process with -X importtime, so nothing is already cached;
+the login path must stay under its target and must not pull in any of the heavy modules
+
+usage: python -m benchmarks.cold_start --out cold_start.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# What app.py imports before the login check, and what it adds once a user is logged in
+LOGIN_IMPORTS = ["streamlit", "config", "modules.metrics", "modules.database", "modules.auth"]
+DASHBOARD_IMPORTS = LOGIN_IMPORTS + ["pandas", "matplotlib.pyplot", "modules.market_data", "modules.rebalance",
+                                     "modules.chart", "modules.chart_data", "modules.analytics", "modules.render_cache",
+                                     "csvportion.parseCSVfile"]
+
+# Modules the login page must not load
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "yfinance", "pyarrow"]
+
+# Seconds of import time allowed on the login path on top of streamlit itself
+LOGIN_TARGET_SECONDS = 0.05
+
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+{imports}
+print(time.perf_counter() - started)
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def measure_imports(modules: List[str], top: int = 10, repeat: int = 3) -> Dict:
+    """
+    Wall time, slowest top-level imports and loaded modules for importing `modules` in a new process
+    The fastest of `repeat` runs is kept, to keep noise from other processes out of the comparison.
+    """
+    code = _PROBE.format(imports="\n".join(f"import {module}" for module in modules))
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                                check=True)
+        runs.append((float(result.stdout.strip().splitlines()[-2]), result))
+    wall, result = min(runs, key=lambda run: run[0])
+    loaded = result.stdout.strip().splitlines()[-1]
+
+    # stderr lines: "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    cumulative = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # top-level imports only
+            cumulative.append((name.strip(), int(cumulative_us) / 1e6))
+
+    cumulative.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "modules": modules,
+        "wall_seconds": wall,
+        "slowest": [{"module": name, "seconds": seconds} for name, seconds in cumulative[:top]],
+        "loaded": loaded.split(),
+    }
+
+
+def report(out: Optional[str] = None) -> bool:
+    """Measure both paths, print the report and return whether the login path meets its target"""
+    baseline = measure_imports(["streamlit"])
+    login = measure_imports(LOGIN_IMPORTS)
+    dashboard = measure_imports(DASHBOARD_IMPORTS)
+
+    login_extra = login["wall_seconds"] - baseline["wall_seconds"]
+    heavy_on_login = [module for module in HEAVY_MODULES if module in login["loaded"]]
+    passed = login_extra <= LOGIN_TARGET_SECONDS and not heavy_on_login
+
+    for label, result in (("streamlit", baseline), ("login page", login), ("dashboard", dashboard)):
+        print(f"{label:<12} {result['wall_seconds'] * 1000:8.1f} ms  ({len(result['loaded'])} modules)")
+        for entry in result["slowest"][:5]:
+            print(f"    {entry['module']:<40} {entry['seconds'] * 1000:8.1f} ms")
+    print(f"\nlogin path over streamlit: {login_extra * 1000:.1f} ms (target {LOGIN_TARGET_SECONDS * 1000:.0f} ms)")
+    if heavy_on_login:
+        print(f"heavy modules loaded by the login path: {', '.join(heavy_on_login)}")
+    print("PASS" if passed else "FAIL")
+
+    if out:
+        for result in (baseline, login, dashboard):
+            result["loaded"] = len(result["loaded"])
+        with open(out, "w") as f:
+            json.dump({"streamlit": baseline, "login": login, "dashboard": dashboard,
+                       "login_extra_seconds": login_extra, "login_target_seconds": LOGIN_TARGET_SECONDS,
+                       "heavy_on_login": heavy_on_login, "passed": passed}, f, indent=2)
+    return passed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Import-time report for the login page and dashboard")
+    parser.add_argument("--out", default=None, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    sys.exit(0 if report(args.out) else 1)
+
+
+if __name__ == "__main__":
+    main()
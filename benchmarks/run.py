@@ -0,0 +1,288 @@
+"""
+benchmarks times the app's hot paths on synthetic data so regressions can be compared between commits
+prices come from a FakeFetcher (deterministic random walks, no network) and portfolios are
+generated at several scales; every run goes to a scratch directory and the timings to JSON
+
+usage: python -m benchmarks.run --out benchmarks/results.json
+       python -m benchmarks.run --quick --compare benchmarks/results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+
+import config
+import csvportion.parseCSVfile
+import modules.chart
+import modules.market_data
+import modules.rebalance
+import modules.render_cache
+from modules.database import PortfolioDB
+from modules.price_cache import FakeFetcher, PriceCache
+from modules.quote_cache import QuoteCache
+
+SYMBOL_COUNTS = [1, 10, 100]
+YEAR_SPANS = [1, 5, 20]
+IMPORT_ROWS = [1_000, 100_000]
+QUICK_SYMBOL_COUNTS = [1, 10]
+QUICK_YEAR_SPANS = [1, 5]
+QUICK_IMPORT_ROWS = [1_000]
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+class _Bytes(io.BytesIO):
+    """In-memory upload with a file name, like Streamlit's UploadedFile"""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def measure(name: str, fn: Callable, repeat: int = 5, **params) -> Dict:
+    """
+    Time fn() once cold and then `repeat` more times warm
+    The cold call is reported separately since it includes fetching and cache fills.
+    """
+    started = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - started
+
+    warm = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        warm.append(time.perf_counter() - started)
+    plt.close("all")
+
+    result = {"name": name, "params": params, "cold_s": cold, "min_s": min(warm),
+              "median_s": statistics.median(warm), "mean_s": statistics.fmean(warm), "repeat": repeat}
+    print(f"{name:<28} {json.dumps(params):<40} cold {cold * 1000:9.2f} ms   median {result['median_s'] * 1000:9.2f} ms")
+    return result
+
+
+def make_positions(n_symbols: int, tag: str) -> Dict[str, Dict[str, float]]:
+    """Holdings in distinct synthetic symbols, so each scale starts with a cold price store"""
+    positions = {f"{tag}{i:03d}": {"Average Cost": 10.0 + i, "Shares": float(1 + i % 50)} for i in range(n_symbols)}
+    positions["TQQQ"] = {"Average Cost": 25.0, "Shares": 100.0}
+    return positions
+
+
+def make_upload(rows: int, n_symbols: int) -> _Bytes:
+    """Transactions-style CSV with repeated symbols, as a broker export would have"""
+    frame = pd.DataFrame({
+        "Symbol": [f"IMP{i % n_symbols:03d}" for i in range(rows)],
+        "Average Cost": [10.0 + i % 7 for i in range(rows)],
+        "Shares": [1.0 + i % 3 for i in range(rows)],
+    })
+    return _Bytes(frame.to_csv(index=False).encode(), "holdings.csv")
+
+
+def bench_market(symbol_counts: List[int], year_spans: List[int], repeat: int) -> List[Dict]:
+    results = []
+    today = pd.Timestamp.today().normalize()
+    for n_symbols in symbol_counts:
+        for years in year_spans:
+            positions = make_positions(n_symbols, f"S{n_symbols}Y{years}_")
+            start_date = today - pd.DateOffset(years=years)
+            scale = {"symbols": n_symbols, "years": years}
+
+            results.append(measure("total_value_chart", lambda: modules.chart.total_value_chart(positions, start_date),
+                                   repeat, **scale))
+            results.append(measure("csv_chart", lambda: modules.chart.csv_chart(positions, start_date), repeat, **scale))
+            results.append(measure("get_price_frame", lambda: modules.market_data.get_price_frame(list(positions),
+                                                                                                 start_date),
+                                   repeat, **scale))
+            results.append(measure("current_prices", lambda: modules.market_data.current_prices(list(positions)),
+                                   repeat, **scale))
+    return results
+
+
+def bench_import(row_counts: List[int], repeat: int) -> List[Dict]:
+    results = []
+    for rows in row_counts:
+        upload = make_upload(rows, 100)
+        results.append(measure("get_symbol_data", lambda: csvportion.parseCSVfile.get_symbol_data(upload),
+                               repeat, rows=rows))
+    return results
+
+
+def bench_rebalance(repeat: int) -> List[Dict]:
+    start_dates = pd.date_range("2010-01-01", periods=1000, freq="D")
+
+    def next_quarters():
+        # Fresh schedules each run, so this times the computation rather than the lru_cache
+        modules.rebalance.get_schedule.cache_clear()
+        for start_date in start_dates:
+            modules.rebalance.get_next_quarter(start_date)
+
+    return [
+        measure("get_next_quarter", next_quarters, repeat, start_dates=len(start_dates)),
+        measure("quarter_status", lambda: modules.rebalance.quarter_status(start_dates), repeat,
+                start_dates=len(start_dates)),
+    ]
+
+
+def bench_database(workdir: str, symbol_counts: List[int], repeat: int, users: int = 1000) -> List[Dict]:
+    results = []
+    db = PortfolioDB(os.path.join(workdir, "bench_portfolio.db"), write_behind_seconds=0)
+    try:
+        for user in range(users):
+            db.add_user(f"user{user}", "benchmark")
+        for n_symbols in symbol_counts:
+            positions = make_positions(n_symbols, "DB")
+            username = f"user{n_symbols}"
+            db.save_portfolio(username, positions, 1000, "2024-01-01")
+            changed = {symbol: dict(details, Shares=details["Shares"] + 1) for symbol, details in positions.items()}
+            prices = {symbol: 20.0 for symbol in positions}
+            flip = [positions, changed]
+
+            def save_changed():
+                flip.reverse()
+                db.save_portfolio(username, flip[0], 1000, "2024-01-01")
+
+            scale = {"symbols": n_symbols}
+            results.append(measure("db.get_portfolio", lambda: db.get_portfolio(username), repeat, **scale))
+            results.append(measure("db.save_portfolio", save_changed, repeat, **scale))
+            results.append(measure("db.save_portfolio_unchanged",
+                                   lambda: db.save_portfolio(username, flip[0], 1000, "2024-01-01"), repeat, **scale))
+            results.append(measure("db.record_trade", lambda: db.record_trade(username, "TQQQ", 1, 30.0), repeat,
+                                   **scale))
+            results.append(measure("db.get_holdings_summary", lambda: db.get_holdings_summary(username, prices),
+                                   repeat, **scale))
+        results.append(measure("db.get_all_users", db.get_all_users, repeat, users=users))
+    finally:
+        db.close()
+    return results
+
+
+def bench_app(workdir: str, symbol_counts: List[int], repeat: int) -> List[Dict]:
+    """Full script runs of app.py for a logged-in user, through Streamlit's headless AppTest"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("streamlit.testing is not available, skipping the app render benchmark")
+        return []
+
+    # AppTest warns about the missing script context on every run (a filter, since Streamlit resets log levels)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage())
+
+    results = []
+    # app.py opens data/portfolio_app.db relative to the working directory
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        db = PortfolioDB("data/portfolio_app.db", write_behind_seconds=0)
+        for n_symbols in symbol_counts:
+            username = f"app{n_symbols}"
+            db.add_user(username, "benchmark", full_name="Benchmark")
+            db.save_portfolio(username, make_positions(n_symbols, f"APP{n_symbols}_"), 1000, "2022-01-01")
+
+            def render():
+                app = AppTest.from_file(APP_PATH, default_timeout=120)
+                app.session_state["authenticated"] = True
+                app.session_state["username"] = username
+                app.session_state["user_data"] = db.get_user(username)
+                app.run()
+                if app.exception:
+                    raise RuntimeError(app.exception[0].message)
+
+            results.append(measure("app_render", render, repeat, symbols=n_symbols))
+    finally:
+        os.chdir(previous_dir)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: Dict, current: Dict, threshold: float = 0.2):
+    """Print benchmarks whose median got slower (or faster) by more than `threshold`"""
+    before = {(r["name"], json.dumps(r["params"], sort_keys=True)): r["median_s"] for r in previous["results"]}
+    print(f"\nCompared with {previous['meta'].get('commit')}:")
+    changed = False
+    for result in current["results"]:
+        old = before.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if not old:
+            continue
+        ratio = result["median_s"] / old
+        if abs(ratio - 1) > threshold:
+            changed = True
+            label = "SLOWER" if ratio > 1 else "faster"
+            print(f"  {label:<6} {result['name']:<28} {json.dumps(result['params']):<40} x{ratio:.2f}")
+    if not changed:
+        print(f"  no median changed by more than {threshold:.0%}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths on synthetic data")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="smaller scales only")
+    parser.add_argument("--skip-app", action="store_true", help="skip the full app.py render")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    symbol_counts = QUICK_SYMBOL_COUNTS if args.quick else SYMBOL_COUNTS
+    year_spans = QUICK_YEAR_SPANS if args.quick else YEAR_SPANS
+    import_rows = QUICK_IMPORT_ROWS if args.quick else IMPORT_ROWS
+
+    with tempfile.TemporaryDirectory(prefix="portfolio-bench-") as workdir:
+        # Offline price store, close matrix and a quote cache with no expiry, all private to this run
+        fetcher = FakeFetcher()
+        config.CLOSE_MATRIX_PATH = os.path.join(workdir, "close_matrix")
+        modules.market_data.set_price_cache(PriceCache(os.path.join(workdir, "prices.db"), fetcher))
+        modules.market_data._quote_cache = QuoteCache(modules.market_data._load_quotes, ttl_seconds=float("inf"))
+        modules.render_cache.get_render_cache().clear()
+
+        results = []
+        results += bench_market(symbol_counts, year_spans, args.repeat)
+        results += bench_import(import_rows, args.repeat)
+        results += bench_rebalance(args.repeat)
+        results += bench_database(workdir, symbol_counts, args.repeat)
+        if not args.skip_app:
+            results += bench_app(workdir, symbol_counts, args.repeat)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "fetch_calls": len(fetcher.calls),
+        },
+        "results": results,
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n{len(results)} timings written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
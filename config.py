@@ -0,0 +1,58 @@
+"""
+Application settings shared by app.py and the modules package
+"""
+
+# ---- Market data ----
+# On-disk store for daily price history (see modules/price_cache.py)
+PRICE_CACHE_PATH = "data/price_cache.db"
+
+# How long (seconds) the latest cached day is trusted before the trailing days are re-fetched
+PRICE_REFRESH_SECONDS = 15 * 60
+
+# Latest-price quotes shared by all sessions (see modules/quote_cache.py)
+QUOTE_TTL_SECONDS = 60
+# Per-symbol TTL overrides, e.g. {"AGG": 600}
+QUOTE_TTL_OVERRIDES = {}
+
+# Background refresh of every held symbol (see modules/quote_refresher.py)
+# When enabled, page renders read cached quotes and never wait on the network
+QUOTE_REFRESHER_ENABLED = False
+QUOTE_REFRESH_INTERVAL_SECONDS = 60
+QUOTE_REFRESH_CONCURRENCY = 8
+QUOTE_REFRESH_BATCH_SIZE = 25
+
+# Split-adjusted closes shared by every process as one memory-mapped matrix (see modules/close_matrix.py)
+# "float32" halves its size at about 7 significant digits per close
+CLOSE_MATRIX_ENABLED = True
+CLOSE_MATRIX_PATH = "data/close_matrix"
+CLOSE_MATRIX_DTYPE = "float64"
+
+# ---- Chart rendering ----
+# Upper bound on memory held by rendered chart images (see modules/render_cache.py)
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RENDER_CACHE_MAX_ENTRIES = 256
+
+# Interactive (client-side) value chart instead of a matplotlib image (see modules/chart_data.py)
+CHART_INTERACTIVE = True
+# Points drawn per zoom level, and "lttb" (keeps the shape) or "minmax" (keeps every extreme)
+CHART_POINTS = 600
+CHART_DOWNSAMPLE_METHOD = "lttb"
+
+# ---- Database ----
+# Seconds between flushes of buffered portfolio writes (see PortfolioDB.save_portfolio_deferred)
+DB_WRITE_BEHIND_SECONDS = 5.0
+
+# ---- Instrumentation ----
+# Timing of market data, database, chart and import calls (see modules/metrics.py)
+METRICS_ENABLED = False
+# Prometheus text dump rewritten after every script run while metrics are on (None to skip)
+METRICS_PATH = "data/metrics.prom"
+# Users who get the timing panel in the sidebar
+METRICS_ADMIN_USERS = []
+
+# ---- Risk analytics ----
+# Benchmark for beta, trailing trading days for volatility, and the annual risk-free rate for
+# Sharpe/Sortino (see modules/analytics.py)
+RISK_BENCHMARK = "QQQ"
+RISK_WINDOW_DAYS = 63
+RISK_FREE_RATE = 0.0
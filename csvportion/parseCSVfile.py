@@ -1,42 +1,301 @@
+import io
+import numpy as np
 import pandas as pd
+from typing import Dict, Iterator, Tuple
 
+from modules import metrics
+
+REQUIRED_COLUMNS = ['Symbol', 'Average Cost', 'Shares']
+
+# Rows per chunk; memory use depends on this, not on the file size
+CHUNK_ROWS = 50_000
+
+# Columnar formats and their file extensions
+COLUMNAR_FORMATS = {'parquet': ['parquet', 'pq'], 'arrow': ['arrow', 'feather', 'ipc']}
+
+# Every extension the importer accepts
+SUPPORTED_EXTENSIONS = ['csv', 'xlsx', 'xls'] + [ext for exts in COLUMNAR_FORMATS.values() for ext in exts]
+
+# How many individual row errors to keep for display
+MAX_ERROR_SAMPLES = 100
+
+
+class ImportReport:
+    """Counts and examples of what happened to each row during an import"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.error_counts = {}   # reason -> number of rows
+        self.error_samples = []  # (row number in file, reason), first MAX_ERROR_SAMPLES only
+
+    @property
+    def rows_rejected(self) -> int:
+        return sum(self.error_counts.values())
+
+    def add_errors(self, row_numbers, reason: str):
+        row_numbers = list(row_numbers)
+        if not row_numbers:
+            return
+        self.error_counts[reason] = self.error_counts.get(reason, 0) + len(row_numbers)
+        room = MAX_ERROR_SAMPLES - len(self.error_samples)
+        self.error_samples.extend((row, reason) for row in row_numbers[:max(room, 0)])
+
+    def summary(self) -> str:
+        text = f"{self.rows_imported} of {self.rows_read} rows imported"
+        if self.error_counts:
+            text += " (" + ", ".join(f"{count} {reason}" for reason, count in self.error_counts.items()) + ")"
+        return text
+
+
+def _check_columns(columns):
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def _csv_chunks(file) -> Iterator[pd.DataFrame]:
+    # Only the needed columns, all read as text so bad values can be reported instead of failing the read
+    reader = pd.read_csv(file, usecols=lambda col: col.strip() in REQUIRED_COLUMNS,
+                         dtype=str, chunksize=CHUNK_ROWS)
+    first = True
+    for chunk in reader:
+        chunk.columns = [col.strip() for col in chunk.columns]
+        if first:
+            _check_columns(chunk.columns)
+            first = False
+        yield chunk
+    if first:
+        raise ValueError("File is empty")
+
+
+def _xlsx_chunks(file) -> Iterator[pd.DataFrame]:
+    import openpyxl
+
+    # read_only mode streams rows from the sheet instead of loading the whole workbook
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("File is empty")
+        header = [str(col).strip() if col is not None else "" for col in header]
+        _check_columns(header)
+        positions = [header.index(col) for col in REQUIRED_COLUMNS]
+
+        batch = []
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            if len(batch) == CHUNK_ROWS:
+                yield pd.DataFrame(batch, columns=REQUIRED_COLUMNS, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=REQUIRED_COLUMNS, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _xls_chunks(file) -> Iterator[pd.DataFrame]:
+    # Legacy .xls can't be streamed, but the format itself caps a sheet at 65,536 rows
+    df = pd.read_excel(file, usecols=lambda col: str(col).strip() in REQUIRED_COLUMNS, dtype=str)
+    df.columns = [str(col).strip() for col in df.columns]
+    _check_columns(df.columns)
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+
+def _pyarrow():
+    # Optional dependency, only needed for the columnar formats
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet/Arrow files need the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def _arrow_source(file):
+    """Memory-map a path, or wrap an upload's bytes without copying them"""
+    pa = _pyarrow()
+    if isinstance(file, str):
+        return pa.memory_map(file)
+    if hasattr(file, "getbuffer"):
+        return pa.BufferReader(pa.py_buffer(file.getbuffer()))
+    return pa.BufferReader(file.read())
+
+
+def _parquet_chunks(file) -> Iterator[pd.DataFrame]:
+    pa = _pyarrow()
+    parquet = pa.parquet.ParquetFile(_arrow_source(file))
+    _check_columns(parquet.schema_arrow.names)
+    # Column projection: only the three needed columns are decoded, one batch at a time
+    for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=REQUIRED_COLUMNS):
+        yield batch.to_pandas()
+
+
+def _arrow_batches(file):
+    """Record batches from an Arrow IPC file, falling back to the streaming format"""
+    pa = _pyarrow()
+    source = _arrow_source(file)
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def _arrow_chunks(file) -> Iterator[pd.DataFrame]:
+    schema, batches = _arrow_batches(file)
+    _check_columns(schema.names)
+    for batch in batches:
+        batch = batch.select(REQUIRED_COLUMNS)
+        for start in range(0, batch.num_rows, CHUNK_ROWS):
+            yield batch.slice(start, CHUNK_ROWS).to_pandas()
+
+
+def read_chunks(file) -> Iterator[pd.DataFrame]:
+    """Yield the Symbol / Average Cost / Shares columns of an upload in bounded chunks"""
+    # Uploads are re-read on every rerun, so start from the top each time
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+    # Detect file type based on extension
+    file_extension = str(getattr(file, "name", file)).split('.')[-1].lower()
+
+    if file_extension == 'csv':
+        return _csv_chunks(file)
+    elif file_extension == 'xlsx':
+        return _xlsx_chunks(file)
+    elif file_extension == 'xls':
+        return _xls_chunks(file)
+    elif file_extension in COLUMNAR_FORMATS['parquet']:
+        return _parquet_chunks(file)
+    elif file_extension in COLUMNAR_FORMATS['arrow']:
+        return _arrow_chunks(file)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+
+@metrics.timed("import.import_positions")
+def import_positions(file) -> Tuple[Dict[str, Dict[str, float]], ImportReport]:
+    """
+    Stream a holdings or transactions export into a positions dictionary
+    Rows for the same symbol are combined: shares are summed and the average cost is
+    weighted by shares. Invalid rows (including zero or negative shares) are skipped and
+    counted in the report.
+    """
+    report = ImportReport()
+    shares_total = {}  # symbol -> summed shares
+    cost_total = {}    # symbol -> summed shares * average cost
+
+    row_offset = 2  # header is line 1
+    for chunk in read_chunks(file):
+        chunk = chunk[REQUIRED_COLUMNS].reset_index(drop=True)
+        row_numbers = chunk.index + row_offset
+        row_offset += len(chunk)
+        report.rows_read += len(chunk)
+
+        symbols = chunk['Symbol'].astype("string").str.strip().str.upper()
+        shares = pd.to_numeric(chunk['Shares'], errors='coerce')
+        costs = pd.to_numeric(chunk['Average Cost'], errors='coerce')
+
+        missing_symbol = symbols.isna() | (symbols == "")
+        bad_shares = ~missing_symbol & ~(np.isfinite(shares) & (shares > 0))
+        bad_cost = ~missing_symbol & ~bad_shares & ~(np.isfinite(costs) & (costs >= 0))
+        report.add_errors(row_numbers[missing_symbol], "rows missing a symbol")
+        report.add_errors(row_numbers[bad_shares], "rows with invalid shares")
+        report.add_errors(row_numbers[bad_cost], "rows with invalid average cost")
+
+        valid = ~(missing_symbol | bad_shares | bad_cost)
+        report.rows_imported += int(valid.sum())
+        if not valid.any():
+            continue
+
+        # Aggregate the chunk first so the running totals only touch one entry per symbol
+        grouped = pd.DataFrame({
+            'Symbol': symbols[valid],
+            'Shares': shares[valid],
+            'Cost': shares[valid] * costs[valid],
+        }).groupby('Symbol', sort=False).sum()
+        for symbol, chunk_shares, chunk_cost in zip(grouped.index, grouped['Shares'], grouped['Cost']):
+            shares_total[symbol] = shares_total.get(symbol, 0.0) + chunk_shares
+            cost_total[symbol] = cost_total.get(symbol, 0.0) + chunk_cost
+
+    positions = {}
+    for symbol, total in shares_total.items():
+        average_cost = cost_total[symbol] / total
+        positions[symbol] = {"Average Cost": float(average_cost), "Shares": float(total)}
+
+    return positions, report
+
+
+@metrics.timed("import.get_symbol_data")
 def get_symbol_data(file):
     # First check if file is None
     if file is None:
         return {"TQQQ": {"Average Cost": 0, "Shares": 0}}
-    
-    try:
-        # Detect file type based on extension
-        file_extension = file.name.split('.')[-1].lower()
-        
-        if file_extension == 'csv':
-            df = pd.read_csv(file)
-        elif file_extension in ['xlsx', 'xls']:
-            df = pd.read_excel(file)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-        
-        # Verify required columns exist
-        required_columns = ['Symbol', 'Average Cost', 'Shares']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-        
-        # Process each row into positions dictionary
-        positions = {}
-        for index, row in df.iterrows():
-            symbol = row['Symbol']
-            cost = row['Average Cost']
-            shares = row['Shares']
-            
-            # Add to dict
-            positions[symbol] = {"Average Cost": cost, "Shares": shares}
-        
-        return positions
-        
-    except Exception as e:
-        # Log the error
-        print(f"Error in get_symbol_data: {str(e)}")
-        # Return a default portfolio on error
-        return {"TQQQ": {"Average Cost": 0, "Shares": 0}}
\ No newline at end of file
+
+    positions, report = import_positions(file)
+    if not positions:
+        raise ValueError(f"No valid rows found: {report.summary()}")
+
+    return positions
+
+
+@metrics.timed("import.read_price_history")
+def read_price_history(file) -> pd.DataFrame:
+    """
+    Load a wide price history (Date column plus one close column per symbol) written by
+    export_frame, ready for modules.valuation. Arrow files are memory-mapped when given a path.
+    """
+    file_extension = str(getattr(file, "name", file)).split('.')[-1].lower()
+    pa = _pyarrow()
+    if file_extension in COLUMNAR_FORMATS['parquet']:
+        table = pa.parquet.read_table(_arrow_source(file))
+    elif file_extension in COLUMNAR_FORMATS['arrow']:
+        schema, batches = _arrow_batches(file)
+        table = pa.Table.from_batches(list(batches), schema=schema)
+    else:
+        return pd.read_csv(file, index_col="Date", parse_dates=["Date"])
+
+    # split_blocks keeps each column in its own block, avoiding a consolidation copy
+    return table.to_pandas(split_blocks=True).set_index("Date")
+
+
+@metrics.timed("export.export_frame")
+def export_frame(df: pd.DataFrame, fmt: str) -> bytes:
+    """Serialize a frame as csv, parquet or arrow (IPC file) bytes"""
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode()
+
+    pa = _pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, sink)
+    elif fmt == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return sink.getvalue()
+
+
+def export_holdings(positions: Dict[str, Dict[str, float]], fmt: str = 'parquet') -> bytes:
+    """A user's holdings in the same Symbol / Average Cost / Shares layout the importer reads"""
+    df = pd.DataFrame(
+        [(symbol, float(details.get("Average Cost", 0) or 0), float(details.get("Shares", 0) or 0))
+         for symbol, details in positions.items()],
+        columns=REQUIRED_COLUMNS,
+    )
+    return export_frame(df, fmt)
+
+
+def export_price_history(closes: pd.DataFrame, fmt: str = 'parquet') -> bytes:
+    """A wide close-price frame (e.g. market_data.get_price_frame) with its dates as a Date column"""
+    df = closes.copy()
+    df.index.name = "Date"
+    return export_frame(df.reset_index(), fmt)
@@ -0,0 +1,285 @@
+"""
+analytics measures the risk of equity curves: drawdown, time under water, rolling volatility,
+Sharpe/Sortino ratios and beta against a benchmark (QQQ by default)
+every function takes a (days, portfolios) value matrix, so a whole batch of users valued off the
+aligned close matrix is measured in one pass; a single curve can be passed as a 1-D array
+
+RollingRisk keeps the same measures as running sums and a ring buffer of the last window of
+returns, so appending a day costs O(1) per portfolio instead of a recompute over the history
+"""
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import config
+import modules.valuation
+from modules.portfolio import Portfolio
+
+TRADING_DAYS = 252
+
+# Keys of the measure dicts returned by risk_metrics and RollingRisk.metrics
+METRICS = [
+    "max_drawdown_pct", "current_drawdown_pct", "longest_under_water_days", "current_under_water_days",
+    "volatility_pct", "sharpe", "sortino", "beta",
+]
+
+
+def _matrix(values) -> np.ndarray:
+    """Float matrix of shape (days, portfolios); days with no positive value become NaN"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    return np.where(values > 0, values, np.nan)
+
+
+def _squeeze(result: Dict[str, np.ndarray], single: bool) -> Dict:
+    return {key: float(value[0]) for key, value in result.items()} if single else result
+
+
+def daily_returns(values) -> np.ndarray:
+    """Simple day-over-day returns, shape (days - 1, portfolios); NaN next to missing days"""
+    values = _matrix(values)
+    return values[1:] / values[:-1] - 1
+
+
+def drawdowns(values) -> np.ndarray:
+    """Fraction below the running peak on every day (0 at a new high), NaN before the first value"""
+    values = _matrix(values)
+    peaks = np.fmax.accumulate(values, axis=0)
+    return 1 - values / peaks
+
+
+def under_water(values) -> np.ndarray:
+    """Trading days since the last running peak on every day (0 at a new high)"""
+    values = _matrix(values)
+    days = np.arange(len(values))[:, None]
+    at_peak = values >= np.fmax.accumulate(values, axis=0)
+    last_peak = np.maximum.accumulate(np.where(at_peak, days, -1), axis=0)
+    # Nothing to be under before the first value
+    return np.where(last_peak >= 0, days - last_peak, 0)
+
+
+def rolling_volatility(values, window: Optional[int] = None) -> np.ndarray:
+    """
+    Annualized volatility (%) of the trailing `window` daily returns on every day from the window's end
+    Computed from cumulative sums, so the cost does not grow with the window.
+    """
+    window = window or config.RISK_WINDOW_DAYS
+    returns = daily_returns(values)
+    valid = ~np.isnan(returns)
+    filled = np.where(valid, returns, 0.0)
+
+    def trailing(a):
+        total = np.cumsum(np.vstack([np.zeros((1, a.shape[1])), a]), axis=0)
+        return total[window:] - total[:-window]
+
+    return _volatility(trailing(valid.astype(float)), trailing(filled), trailing(filled ** 2))
+
+
+def _volatility(count, total, squares):
+    """Annualized volatility (%) from the count, sum and sum of squares of daily returns"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares - total ** 2 / count) / (count - 1)
+    return np.where(count > 1, np.sqrt(np.clip(variance, 0, None)), np.nan) * np.sqrt(TRADING_DAYS) * 100
+
+
+def _ratios(count, total, squares, downside):
+    """Annualized Sharpe and Sortino ratios from sums of daily excess returns"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.clip((squares - total ** 2 / count) / (count - 1), 0, None))
+        sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), np.nan)
+        downside_dev = np.sqrt(downside / count)
+        sortino = np.where(downside_dev > 0, mean / downside_dev * np.sqrt(TRADING_DAYS), np.nan)
+    return sharpe, sortino
+
+
+def _beta(count, returns, benchmark, cross, benchmark_squares):
+    """Beta from sums over the days where both the portfolio and benchmark have a return"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = cross - returns * benchmark / count
+        variance = benchmark_squares - benchmark ** 2 / count
+        return np.where((count > 1) & (variance > 0), covariance / variance, np.nan)
+
+
+def risk_metrics(values, benchmark=None, window: Optional[int] = None,
+                 risk_free_rate: Optional[float] = None) -> Dict:
+    """
+    Risk measures of each equity curve (see METRICS)
+
+    Parameters:
+    - values: daily portfolio values, shape (days,) or (days, portfolios)
+    - benchmark: benchmark closes on the same days (e.g. QQQ), for beta
+    - window: trading days in the volatility window (default config.RISK_WINDOW_DAYS)
+    - risk_free_rate: annual rate subtracted before Sharpe/Sortino (default config.RISK_FREE_RATE)
+
+    Returns:
+    - {measure: array with one entry per portfolio}, or floats for a single curve
+    """
+    single = np.ndim(values) == 1
+    window = window or config.RISK_WINDOW_DAYS
+    risk_free_rate = config.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+    values = _matrix(values)
+    portfolios = values.shape[1]
+
+    down = drawdowns(values)
+    water = under_water(values)
+    returns = daily_returns(values)
+    valid = ~np.isnan(returns)
+
+    excess = np.where(valid, returns - risk_free_rate / TRADING_DAYS, 0.0)
+    count = valid.sum(axis=0)
+    sharpe, sortino = _ratios(count, excess.sum(axis=0), (excess ** 2).sum(axis=0),
+                              (np.minimum(excess, 0) ** 2).sum(axis=0))
+
+    recent = np.where(valid, returns, 0.0)[-window:]
+    volatility = _volatility(valid[-window:].sum(axis=0), recent.sum(axis=0), (recent ** 2).sum(axis=0))
+
+    beta = np.full(portfolios, np.nan)
+    if benchmark is not None:
+        benchmark_returns = daily_returns(np.asarray(benchmark, dtype=float))
+        both = valid & ~np.isnan(benchmark_returns)
+        r = np.where(both, returns, 0.0)
+        b = np.where(both, benchmark_returns, 0.0)
+        beta = _beta(both.sum(axis=0), r.sum(axis=0), b.sum(axis=0), (r * b).sum(axis=0), (b ** 2).sum(axis=0))
+
+    return _squeeze({
+        "max_drawdown_pct": np.fmax.reduce(down, axis=0) * 100,
+        "current_drawdown_pct": down[-1] * 100 if len(down) else np.full(portfolios, np.nan),
+        "longest_under_water_days": water.max(axis=0) if len(water) else np.zeros(portfolios),
+        "current_under_water_days": water[-1] if len(water) else np.zeros(portfolios),
+        "volatility_pct": volatility,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "beta": beta,
+    }, single)
+
+
+def portfolio_values(portfolios: Dict[str, Union[Dict, Portfolio]], closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Value every portfolio on every day of the close frame with its current holdings and cash
+    Portfolios are database records or Portfolio objects, keyed by username. One matrix product
+    over the aligned closes; returns a (dates x usernames) frame.
+    """
+    aligned = modules.valuation.align_closes(closes)
+    usernames = list(portfolios)
+    books = [book if isinstance(book, Portfolio) else Portfolio.from_record(book) for book in portfolios.values()]
+    shares = Portfolio.share_matrix(books, list(aligned.columns))
+    cash = np.array([book.cash_balance for book in books])
+    prices = np.nan_to_num(aligned.to_numpy(dtype=float), nan=0.0)
+    return pd.DataFrame(prices @ shares + cash, index=aligned.index, columns=usernames)
+
+
+class RollingRisk:
+    """
+    The risk_metrics measures of one or more equity curves, advanced one day at a time
+    Volatility covers the last `window` returns (kept in a ring buffer); the other measures cover
+    every day seen. Running sums are rebuilt from the buffer once per window, so float error
+    from adding and removing returns does not accumulate.
+    """
+
+    def __init__(self, portfolios: int = 1, window: Optional[int] = None, risk_free_rate: Optional[float] = None):
+        self.window = window or config.RISK_WINDOW_DAYS
+        self.risk_free_rate = config.RISK_FREE_RATE if risk_free_rate is None else risk_free_rate
+        self._single = portfolios == 1
+        self.days = 0
+        self._last = np.full(portfolios, np.nan)
+        self._last_benchmark = np.nan
+        self._peak = np.full(portfolios, np.nan)
+        self._drawdown = np.full(portfolios, np.nan)
+        self._max_drawdown = np.full(portfolios, np.nan)
+        self._under = np.zeros(portfolios)
+        self._longest_under = np.zeros(portfolios)
+        # Every return seen: count, sum, sum of squares, downside sum of squares (excess returns)
+        self._count, self._sum, self._squares, self._downside = np.zeros((4, portfolios))
+        # Days with both a portfolio and benchmark return, for beta
+        self._pairs, self._pair_r, self._pair_b, self._pair_rb, self._pair_bb = np.zeros((5, portfolios))
+        # Last `window` returns (NaN for missing) and their running sums
+        self._buffer = np.full((self.window, portfolios), np.nan)
+        self._slot = 0
+        self._window_count, self._window_sum, self._window_squares = np.zeros((3, portfolios))
+
+    @classmethod
+    def from_history(cls, values, benchmark=None, window: Optional[int] = None,
+                     risk_free_rate: Optional[float] = None) -> "RollingRisk":
+        """State after replaying an existing history, shape (days,) or (days, portfolios)"""
+        matrix = _matrix(values)
+        state = cls(matrix.shape[1], window, risk_free_rate)
+        state._single = np.ndim(values) == 1
+        benchmark = np.full(len(matrix), np.nan) if benchmark is None else np.asarray(benchmark, dtype=float)
+        for day, close in zip(matrix, benchmark):
+            state.update(day, close)
+        return state
+
+    def update(self, values, benchmark: Optional[float] = None):
+        """Append one day: each portfolio's value, and the benchmark close for beta"""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        values = np.where(values > 0, values, np.nan)
+        benchmark = np.nan if benchmark is None or not benchmark > 0 else float(benchmark)
+
+        returns = values / self._last - 1
+        benchmark_return = benchmark / self._last_benchmark - 1
+        self._last, self._last_benchmark = values, benchmark
+        self.days += 1
+
+        # Drawdown and time under water
+        self._peak = np.fmax(self._peak, values)
+        self._drawdown = 1 - values / self._peak
+        self._max_drawdown = np.fmax(self._max_drawdown, self._drawdown)
+        started = ~np.isnan(self._peak)
+        self._under = np.where(values >= self._peak, 0, np.where(started, self._under + 1, 0))
+        self._longest_under = np.maximum(self._longest_under, self._under)
+
+        # Whole-history sums
+        valid = ~np.isnan(returns)
+        excess = np.where(valid, returns - self.risk_free_rate / TRADING_DAYS, 0.0)
+        self._count += valid
+        self._sum += excess
+        self._squares += excess ** 2
+        self._downside += np.minimum(excess, 0) ** 2
+        if not np.isnan(benchmark_return):
+            r = np.where(valid, returns, 0.0)
+            b = np.where(valid, benchmark_return, 0.0)
+            self._pairs += valid
+            self._pair_r += r
+            self._pair_b += b
+            self._pair_rb += r * b
+            self._pair_bb += b ** 2
+
+        # Trailing window: swap the oldest return for the new one
+        if self.days == 1:
+            return
+        old = self._buffer[self._slot]
+        old_valid = ~np.isnan(old)
+        old = np.where(old_valid, old, 0.0)
+        new = np.where(valid, returns, 0.0)
+        self._buffer[self._slot] = returns
+        self._slot = (self._slot + 1) % self.window
+        if self._slot == 0:
+            self._resum()
+        else:
+            self._window_count += valid.astype(float) - old_valid
+            self._window_sum += new - old
+            self._window_squares += new ** 2 - old ** 2
+
+    def _resum(self):
+        valid = ~np.isnan(self._buffer)
+        filled = np.where(valid, self._buffer, 0.0)
+        self._window_count = valid.sum(axis=0).astype(float)
+        self._window_sum = filled.sum(axis=0)
+        self._window_squares = (filled ** 2).sum(axis=0)
+
+    def metrics(self) -> Dict:
+        """Current measures, keyed like risk_metrics"""
+        sharpe, sortino = _ratios(self._count, self._sum, self._squares, self._downside)
+        return _squeeze({
+            "max_drawdown_pct": self._max_drawdown * 100,
+            "current_drawdown_pct": self._drawdown * 100,
+            "longest_under_water_days": self._longest_under.copy(),
+            "current_under_water_days": self._under.copy(),
+            "volatility_pct": _volatility(self._window_count, self._window_sum, self._window_squares),
+            "sharpe": sharpe,
+            "sortino": sortino,
+            "beta": _beta(self._pairs, self._pair_r, self._pair_b, self._pair_rb, self._pair_bb),
+        }, self._single)
@@ -98,6 +98,9 @@ class PortfolioAuth:
     
     def logout(self):
         """Log out the current user"""
+        # Write any buffered portfolio changes before the session forgets the user
+        if st.session_state.username:
+            self.db.flush(st.session_state.username)
         st.session_state.authenticated = False
         st.session_state.username = None
         st.session_state.user_data = None
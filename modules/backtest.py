@@ -0,0 +1,164 @@
+"""
+backtest replays the 9-Sig signal for every quarter since a start date
+each quarter the signal holding is moved back to last quarter's balance grown by the target rate:
+surplus is sold into cash/bonds, shortfall is bought with whatever cash is available
+the quarter loop is short (4 steps a year) and every step works on numpy arrays covering
+all target rates at once, so a whole parameter grid replays in one pass
+"""
+from typing import Dict, Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+import modules.market_data
+import modules.rebalance
+
+
+def signal_prices(symbol: str = "TQQQ", start_date="2010-01-01") -> pd.Series:
+    """Daily closes for the signal ticker from the local price cache, adjusted for splits and dividends"""
+    closes = modules.market_data.get_price_frame([symbol], start_date, adjust="total")
+    return closes[symbol.upper()].dropna()
+
+
+def quarter_indices(dates: pd.DatetimeIndex, anchor) -> np.ndarray:
+    """
+    Positions in `dates` of each quarter boundary from `anchor` onwards
+    Boundaries are anchor + 3, 6, 9... months, snapped forward to the next trading day.
+    """
+    return modules.rebalance.get_schedule(pd.Timestamp(anchor).normalize()).trading_day_positions(dates)
+
+
+def _simulate(prices: np.ndarray, qidx: np.ndarray, target_rates: np.ndarray,
+              initial_capital: float, cash_fraction: float, cash_rate: float) -> Dict[str, np.ndarray]:
+    """
+    Run the quarterly rebalance for several target rates at once
+    Returns per-quarter arrays of shape (quarters, rates).
+    """
+    n = len(target_rates)
+    quarters = len(qidx)
+    cash_growth = (1 + cash_rate) ** 0.25
+
+    first_price = prices[qidx[0]]
+    shares = np.full(n, initial_capital * (1 - cash_fraction) / first_price)
+    cash = np.full(n, initial_capital * cash_fraction)
+    balance = shares * first_price
+
+    shares_hist = np.empty((quarters, n))
+    cash_hist = np.empty((quarters, n))
+    target_hist = np.empty((quarters, n))
+    trade_hist = np.zeros((quarters, n))
+    shares_hist[0], cash_hist[0], target_hist[0] = shares, cash, balance
+
+    for k in range(1, quarters):
+        price = prices[qidx[k]]
+        cash = cash * cash_growth
+
+        # Target is last quarter's post-trade balance grown by the target rate
+        target = balance * (1 + target_rates)
+        amount = np.minimum(target - shares * price, cash)  # > 0 buy, < 0 sell; buys limited by cash
+
+        traded = amount / price
+        shares = shares + traded
+        cash = cash - amount
+        balance = shares * price
+
+        shares_hist[k], cash_hist[k], target_hist[k], trade_hist[k] = shares, cash, target, traded
+
+    return {"shares": shares_hist, "cash": cash_hist, "target": target_hist, "traded": trade_hist}
+
+
+def _equity(prices: np.ndarray, qidx: np.ndarray, state: Dict[str, np.ndarray]) -> np.ndarray:
+    """Daily equity from the first quarter boundary on, shape (days, rates)"""
+    days = np.arange(qidx[0], len(prices))
+    quarter = np.searchsorted(qidx, days, side="right") - 1
+    return state["shares"][quarter] * prices[days, None] + state["cash"][quarter]
+
+
+def _max_drawdown(equity: np.ndarray) -> np.ndarray:
+    """Largest peak-to-trough drop per column, as a positive percentage"""
+    peaks = np.maximum.accumulate(equity, axis=0)
+    return ((1 - equity / peaks).max(axis=0)) * 100
+
+
+def backtest(prices: pd.Series, start_date, target_rate: float = 0.09, initial_capital: float = 10000,
+             cash_fraction: float = 0.4, cash_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    Replay 9-Sig for one configuration
+
+    Parameters:
+    - prices: daily closes of the signal ticker (see signal_prices)
+    - start_date: strategy start, also the quarter anchor
+    - target_rate: quarterly growth target for the signal balance (0.09 = 9%)
+    - initial_capital: starting portfolio value
+    - cash_fraction: share of the starting value held in cash/bonds
+    - cash_rate: annual return on the cash/bond balance
+
+    Returns:
+    - dict with "quarters" (one row per rebalance) and "equity" (daily curve) DataFrames
+    """
+    prices = prices.sort_index().dropna()
+    dates = pd.DatetimeIndex(prices.index)
+    values = prices.to_numpy(dtype=float)
+    qidx = quarter_indices(dates, start_date)
+    if len(qidx) == 0:
+        raise ValueError(f"No price data after {start_date}")
+
+    state = _simulate(values, qidx, np.array([target_rate]), initial_capital, cash_fraction, cash_rate)
+    equity = _equity(values, qidx, state)[:, 0]
+
+    quarters = pd.DataFrame({
+        "Price": values[qidx],
+        "Target": state["target"][:, 0],
+        "Shares Traded": state["traded"][:, 0],
+        "Shares": state["shares"][:, 0],
+        "Cash": state["cash"][:, 0],
+    }, index=dates[qidx])
+    quarters["Signal Value"] = quarters["Shares"] * quarters["Price"]
+    quarters["Action"] = np.where(quarters["Shares Traded"] > 0, "Buy",
+                                  np.where(quarters["Shares Traded"] < 0, "Sell", "Hold"))
+
+    curve = pd.DataFrame({"Equity": equity}, index=dates[qidx[0]:])
+    return {"quarters": quarters, "equity": curve}
+
+
+def sweep(prices: pd.Series, start_dates: Iterable, target_rates: Iterable[float], initial_capital: float = 10000,
+          cash_fraction: float = 0.4, cash_rate: float = 0.0) -> pd.DataFrame:
+    """
+    Replay 9-Sig for every (start date, target rate) pair
+
+    All target rates for a start date are simulated together as one vectorized run.
+
+    Returns:
+    - DataFrame with one row per configuration and its summary statistics
+    """
+    prices = prices.sort_index().dropna()
+    dates = pd.DatetimeIndex(prices.index)
+    values = prices.to_numpy(dtype=float)
+    rates = np.asarray(list(target_rates), dtype=float)
+
+    frames = []
+    for start_date in start_dates:
+        qidx = quarter_indices(dates, start_date)
+        if len(qidx) == 0:
+            continue
+
+        state = _simulate(values, qidx, rates, initial_capital, cash_fraction, cash_rate)
+        equity = _equity(values, qidx, state)
+        final = equity[-1]
+        years = max((dates[-1] - dates[qidx[0]]).days / 365.25, 1e-9)
+
+        frames.append(pd.DataFrame({
+            "start_date": dates[qidx[0]],
+            "target_rate": rates,
+            "final_value": final,
+            "total_return_pct": (final / initial_capital - 1) * 100,
+            "cagr_pct": ((final / initial_capital) ** (1 / years) - 1) * 100,
+            "max_drawdown_pct": _max_drawdown(equity),
+            "buys": (state["traded"] > 0).sum(axis=0),
+            "sells": (state["traded"] < 0).sum(axis=0),
+            "quarters": len(qidx) - 1,
+        }))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
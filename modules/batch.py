@@ -0,0 +1,183 @@
+"""
+batch values and rebalances every user's portfolio without Streamlit, e.g. as a quarter-end job
+quotes are fetched once for the whole run and quarter gains come from the shared return index;
+with a past --today, holdings are valued at the closes on or before that day instead of live quotes
+and the quarter gains stop at it;
+users are read from the database in chunks on a thread pool and each chunk is computed in one vectorized pass
+with --risk, each user's holdings are also valued over the last year off one shared close matrix and
+their drawdown, volatility, Sharpe/Sortino and beta are added (see modules/analytics.py)
+
+usage: python -m modules.batch --db data/portfolio_app.db --out quarter_report.csv [--risk]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+import modules.analytics
+import modules.market_data
+import modules.portfolio
+import modules.rebalance
+from modules.database import PortfolioDB
+from modules.return_index import ReturnIndex
+
+# Columns of the report, one row per user with a portfolio
+REPORT_COLUMNS = [
+    "username", "start_date", "cash_balance", "holdings_value", "total_value", "missing_quotes",
+    "quarters_elapsed", "previous_quarter", "next_quarter", "signal_shares", "signal_gain_pct",
+    "shares_to_buy_or_sell",
+]
+
+# History the risk columns are measured over
+RISK_LOOKBACK = pd.DateOffset(years=1)
+
+# How far before a past as-of date to look for each symbol's last close
+_CLOSE_LOOKBACK = pd.Timedelta(days=10)
+
+
+def _chunk_report(portfolios: Dict[str, Dict], quotes: Dict[str, float], signal_index: ReturnIndex,
+                  signal_symbol: str, target_rate: float, today: pd.Timestamp,
+                  risk_closes: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Report rows for one chunk of users, with the risk columns when closes for them are given"""
+    usernames = list(portfolios)
+    books = [modules.portfolio.Portfolio.from_record(portfolios[u]) for u in usernames]
+    cash = np.array([book.cash_balance for book in books])
+
+    # Holdings of the whole chunk as one (symbols x users) matrix, valued in one product
+    symbols = sorted({symbol for book in books for symbol in book.symbols} | {signal_symbol})
+    shares = modules.portfolio.Portfolio.share_matrix(books, symbols)
+    prices = np.array([quotes.get(symbol, 0.0) or 0.0 for symbol in symbols])
+    holdings_value = prices @ shares
+    signal_shares = shares[symbols.index(signal_symbol)]
+    absent = (shares != 0) & (prices == 0)[:, None]
+    missing = [",".join(symbols[i] for i in np.flatnonzero(absent[:, user])) if absent[:, user].any() else ""
+               for user in range(len(usernames))]
+
+    status = modules.rebalance.quarter_status([portfolios[u]["start_date"] or "2024-01-01" for u in usernames], today)
+    # Gain windows start on the first trading day of the quarter, as on the dashboard, and end with `today`
+    ends = np.minimum(status["next_quarter"].to_numpy(), np.datetime64(today + pd.Timedelta(days=1), "D"))
+    gains = np.round(signal_index.range_returns(status["previous_quarter"], ends), 2)
+    adjustments = [modules.rebalance.tqqq_quarterly_buy(shares, gain, target_rate) if not np.isnan(gain) else np.nan
+                   for shares, gain in zip(signal_shares, gains)]
+
+    report = pd.DataFrame({
+        "username": usernames,
+        "start_date": status["start_date"].to_numpy(),
+        "cash_balance": cash,
+        "holdings_value": holdings_value.round(2),
+        "total_value": (holdings_value + cash).round(2),
+        "missing_quotes": missing,
+        "quarters_elapsed": status["elapsed"].to_numpy(),
+        "previous_quarter": status["previous_quarter"].to_numpy(),
+        "next_quarter": status["next_quarter"].to_numpy(),
+        "signal_shares": signal_shares,
+        "signal_gain_pct": gains,
+        "shares_to_buy_or_sell": adjustments,
+    }, columns=REPORT_COLUMNS)
+
+    if risk_closes is not None:
+        held = {symbol for book in books for symbol in book.symbols}
+        values = modules.analytics.portfolio_values(dict(zip(usernames, books)),
+                                                    risk_closes[sorted(held & set(risk_closes.columns))])
+        benchmark = risk_closes[config.RISK_BENCHMARK.upper()].ffill()
+        risk = modules.analytics.risk_metrics(values.to_numpy(), benchmark.to_numpy())
+        for measure in modules.analytics.METRICS:
+            report[measure] = np.round(risk[measure], 4)
+    return report
+
+
+def _closes_as_of(symbols: List[str], day: pd.Timestamp) -> Dict[str, float]:
+    """Each symbol's last close on or before `day`, in the quote layout (0 when it has none)"""
+    closes = modules.market_data.get_price_frame(symbols, day - _CLOSE_LOOKBACK, day + pd.Timedelta(days=1))
+    last = closes.ffill().iloc[-1].fillna(0.0) if not closes.empty else pd.Series(dtype=float)
+    return {str(symbol).upper(): float(last.get(str(symbol).upper(), 0.0)) for symbol in symbols}
+
+
+def run_batch(db: PortfolioDB, signal_symbol: str = "TQQQ", target_rate: float = 0.09,
+              chunk_size: int = 500, max_workers: int = 8, today=None, with_risk: bool = False) -> pd.DataFrame:
+    """
+    Value every user's portfolio and compute their quarter status and 9-Sig adjustment
+    Each held symbol is quoted once for the whole run, and every quarter gain is a lookup in
+    the signal ticker's return index. A `today` in the past values holdings at the closes on or
+    before it and ends the quarter gains there. With `with_risk`, the risk measures of each user's current
+    holdings over the last year are added, from one close matrix read for the whole run.
+    """
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.today()).normalize()
+    usernames = [user["username"] for user in db.get_all_users()]
+    if not usernames:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    symbols = sorted(set(db.get_held_symbols()) | {signal_symbol})
+    if today < pd.Timestamp.today().normalize():
+        quotes = _closes_as_of(symbols, today)
+    else:
+        quotes = {str(symbol).upper(): price for symbol, price in modules.market_data.current_prices(symbols).items()}
+
+    # Every user's current quarter started within the last three months (or starts later), so
+    # an index from a little before that covers all the gain windows
+    earliest = today - pd.DateOffset(months=3) - pd.Timedelta(days=7)
+    signal_index = modules.market_data.get_return_index(signal_symbol, earliest)
+
+    risk_closes = None
+    if with_risk:
+        risk_symbols = sorted({str(symbol).upper() for symbol in symbols} | {config.RISK_BENCHMARK.upper()})
+        risk_closes = modules.market_data.get_price_frame(risk_symbols, today - RISK_LOOKBACK)
+        risk_closes = risk_closes.loc[risk_closes.index <= today]
+
+    def report_chunk(chunk_usernames: List[str]) -> pd.DataFrame:
+        portfolios = db.get_portfolios(chunk_usernames)
+        if not portfolios:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        return _chunk_report(portfolios, quotes, signal_index, signal_symbol.upper(), target_rate, today,
+                             risk_closes)
+
+    chunks = [usernames[i:i + chunk_size] for i in range(0, len(usernames), chunk_size)]
+    # Database reads release the GIL, so one chunk computes while others load over the connection pool
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="batch") as pool:
+        reports = [report for report in pool.map(report_chunk, chunks) if not report.empty]
+
+    return pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+def write_report(report: pd.DataFrame, path: str):
+    """Write the report as csv, or parquet/arrow by file extension"""
+    import csvportion.parseCSVfile
+
+    extension = path.rsplit(".", 1)[-1].lower()
+    fmt = next((fmt for fmt, exts in csvportion.parseCSVfile.COLUMNAR_FORMATS.items() if extension in exts), "csv")
+    with open(path, "wb") as f:
+        f.write(csvportion.parseCSVfile.export_frame(report, fmt))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Value and rebalance every user's portfolio")
+    parser.add_argument("--db", default="data/portfolio_app.db")
+    parser.add_argument("--signal", default="TQQQ", help="ticker the 9-Sig adjustment is computed for")
+    parser.add_argument("--target-rate", type=float, default=0.09)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--today", default=None, help="as-of date, defaults to today")
+    parser.add_argument("--risk", action="store_true", help="add drawdown, volatility, Sharpe/Sortino and beta columns")
+    parser.add_argument("--out", default="quarter_report.csv", help=".csv, .parquet or .arrow")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    db = PortfolioDB(args.db, write_behind_seconds=0)
+    try:
+        report = run_batch(db, args.signal, args.target_rate, args.chunk_size, args.workers, args.today, args.risk)
+    finally:
+        db.close()
+    write_report(report, args.out)
+
+    print(f"{len(report)} portfolios written to {args.out} in {time.time() - started:.1f}s")
+    if not report.empty:
+        print(f"Total value: ${report['total_value'].sum():,.2f}, "
+              f"{(report['missing_quotes'] != '').sum()} portfolios with missing quotes")
+
+
+if __name__ == "__main__":
+    main()
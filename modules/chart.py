@@ -1,20 +1,20 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import modules.market_data
-import pandas as pd
+import modules.metrics
+import modules.valuation
 
 
+@modules.metrics.timed("chart.manual_chart")
 def manual_chart(stock1, stock2, start_date):
-    # 1) Get stock data
-    stock1_data = modules.market_data.get_stock_data(stock1[0], start_date)
-    stock2_data = modules.market_data.get_stock_data(stock2[0], start_date)
+    # 1) Get closing prices for both stocks in one batched call
+    closes = modules.market_data.get_price_frame([stock1[0], stock2[0]], start_date)
 
     # 2) Create a figure and axes using subplots
     fig, ax = plt.subplots(figsize=(12, 6))
 
     # 3) Plot stock data on our axes
-    ax.plot(stock1_data["Close"] * stock1[1], label=stock1[0])
-    ax.plot(stock2_data["Close"] * stock2[1], label=stock2[0])
+    ax.plot(closes[stock1[0].upper()].dropna() * stock1[1], label=stock1[0])
+    ax.plot(closes[stock2[0].upper()].dropna() * stock2[1], label=stock2[0])
     ax.set_title(f"{stock1[0]} vs {stock2[0]}")
     ax.set_xlabel("Date")
     ax.set_ylabel("Value")
@@ -23,18 +23,18 @@ def manual_chart(stock1, stock2, start_date):
     # 4) Return the figure object (and/or axes if you want)
     return fig
 
+@modules.metrics.timed("chart.csv_chart")
 def csv_chart(positions, start_date):
-    #get stock data of tqqq and other stocks
-    stock_data = {}
-    for stock in positions:
-        stock_data[stock] = modules.market_data.get_stock_data(stock, start_date)
+    #get closing prices of tqqq and other stocks in one batched call
+    closes = modules.market_data.get_price_frame(list(positions), start_date)
+    values = modules.valuation.value_positions(positions, closes)
     
     #create figure
     fig, ax = plt.subplots(figsize=(12, 6))
 
     #plot stock data on axes
-    for stock in stock_data:
-        ax.plot(stock_data[stock]["Close"] * positions[stock]["Shares"], label=stock)
+    for stock in positions:
+        ax.plot(values[stock.upper()], label=stock)
     ax.set_title("Portfolio Value Over Time")
     ax.set_xlabel("Date")
     ax.set_ylabel("Value")
@@ -44,6 +44,7 @@ def csv_chart(positions, start_date):
     return fig 
 
 
+@modules.metrics.timed("chart.manual_total_value_chart")
 def manual_total_value_chart(stock1, stock2, cash_balance, start_date):
     """
     Create a chart showing total portfolio value over time for manually entered holdings.
@@ -60,35 +61,27 @@ def manual_total_value_chart(stock1, stock2, cash_balance, start_date):
     # Close any existing figures to prevent memory issues
     plt.close('all')
     
-    # Get stock data
-    stock1_data = modules.market_data.get_stock_data(stock1[0], start_date)
-    stock2_data = modules.market_data.get_stock_data(stock2[0], start_date)
+    # Get closing prices for both stocks in one batched call
+    closes = modules.market_data.get_price_frame([stock1[0], stock2[0]], start_date)
     
     # Ensure data is available
-    if stock1_data is None or stock2_data is None or stock1_data.empty or stock2_data.empty:
+    if closes.empty or closes.isna().all().any():
         raise ValueError(f"No data available for {stock1[0]} or {stock2[0]}")
     
-    # Align dates for both stocks
-    common_dates = stock1_data.index.intersection(stock2_data.index)
-    if len(common_dates) == 0:
-        raise ValueError("No common dates found between stocks")
-    
-    stock1_data = stock1_data.loc[common_dates]
-    stock2_data = stock2_data.loc[common_dates]
+    # Value both holdings on every trading day, carrying a close forward where one stock didn't trade
+    holdings = {stock1[0]: {"Shares": stock1[1]}, stock2[0]: {"Shares": stock2[1]}}
+    values = modules.valuation.value_positions(holdings, closes, cash_balance)
+    common_dates = values.index
     
     # Create a completely new figure - avoiding plt.clf() which may not fully clear legend data
     fig, ax = plt.subplots(figsize=(12, 6))
     fig.tight_layout(pad=4.0)
     
-    # Calculate components of portfolio value
-    stock1_values = stock1_data["Close"] * stock1[1]
-    stock2_values = stock2_data["Close"] * stock2[1]
-    
-    # Add constant cash balance
-    cash_series = pd.Series(cash_balance, index=common_dates)
-    
-    # Calculate total portfolio value
-    total_value = stock1_values + stock2_values + cash_series
+    # Components of portfolio value
+    stock1_values = values[stock1[0].upper()]
+    stock2_values = values[stock2[0].upper()]
+    cash_series = values["Cash"]
+    total_value = values["Total"]
     
     # Plot each line and store the line objects
     lines = []
@@ -115,6 +108,7 @@ def manual_total_value_chart(stock1, stock2, cash_balance, start_date):
     # Return the figure
     return fig
 
+@modules.metrics.timed("chart.total_value_chart")
 def total_value_chart(positions, start_date):
     """
     Create a chart showing total portfolio value over time for CSV-imported holdings.
@@ -129,55 +123,29 @@ def total_value_chart(positions, start_date):
     # Close any existing figures
     plt.close('all')
     
-    # Get stock data for each position
-    stock_data = {}
-    for stock in positions:
-        data = modules.market_data.get_stock_data(stock, start_date)
-        if data is not None and not data.empty:
-            stock_data[stock] = data
+    # Get stock data for every position in one batched call
+    closes = modules.market_data.get_price_frame(list(positions), start_date)
+    closes = closes.dropna(axis=1, how="all")
     
-    if not stock_data:
+    if closes.empty:
         raise ValueError("No valid stock data available")
     
+    # Value every position on the union of trading days in one matrix product
+    values = modules.valuation.value_positions(positions, closes)
+    date_range = values.index
+    
     # Create figure
     fig, ax = plt.subplots(figsize=(12, 6))
     fig.tight_layout(pad=4.0)
     
-    # Use the first stock's dates as a reference
-    reference_stock = list(stock_data.keys())[0]
-    date_range = stock_data[reference_stock].index
-    
-    # Create a dictionary to store values per date for each stock
-    value_by_date = {}
-    
-    # Initialize total value array
-    total_values = np.zeros(len(date_range))
-    
-    # Plot individual stock values
-    for i, date in enumerate(date_range):
-        for stock in stock_data:
-            if date in stock_data[stock].index:
-                # Get stock price for this date
-                price = stock_data[stock].loc[date, "Close"]
-                shares = positions[stock]["Shares"]
-                value = price * shares
-                
-                # Store value for plotting later
-                if stock not in value_by_date:
-                    value_by_date[stock] = np.zeros(len(date_range))
-                value_by_date[stock][i] = value
-                
-                # Add to total for this date
-                total_values[i] += value
-    
     # Plot each stock's value
-    for stock in value_by_date:
-        ax.plot(date_range, value_by_date[stock], 
+    for stock in closes.columns:
+        ax.plot(date_range, values[stock], 
                 label=f"{stock}", 
                 linewidth=1, alpha=0.6)
     
     # Plot total portfolio value
-    ax.plot(date_range, total_values, 
+    ax.plot(date_range, values["Total"], 
             label=f"Total Value", 
             linewidth=2.5, color='blue')
     
@@ -192,4 +160,35 @@ def total_value_chart(positions, start_date):
     from matplotlib.ticker import FuncFormatter
     ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x:,.0f}'))
     
+    return fig
+
+
+@modules.metrics.timed("chart.value_history_chart")
+def value_history_chart(values):
+    """
+    Chart a stored value history (modules.snapshots.value_history): each symbol, cash and the total
+
+    Parameters:
+    - values: DataFrame with one column per symbol plus "Cash" and "Total", indexed by date
+
+    Returns:
+    - Matplotlib figure object
+    """
+    fig, ax = plt.subplots(figsize=(12, 6))
+    fig.tight_layout(pad=4.0)
+
+    for column in values.columns:
+        if column == "Total":
+            continue
+        ax.plot(values.index, values[column], label=column, linewidth=1, alpha=0.6,
+                linestyle='--' if column == "Cash" else '-')
+    ax.plot(values.index, values["Total"], label="Total Value", linewidth=2.5, color='blue')
+
+    ax.set_title("Total Portfolio Value Over Time", fontsize=14, fontweight='bold')
+    ax.set_xlabel("Date", fontsize=12)
+    ax.set_ylabel("Value ($)", fontsize=12)
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='best')
+    ax.yaxis.set_major_formatter('${x:,.0f}')
+
     return fig
\ No newline at end of file
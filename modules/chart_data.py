@@ -0,0 +1,135 @@
+"""
+chart_data prepares value histories for an interactive (client-side) chart
+long histories are downsampled to roughly one point per pixel, either with LTTB (keeps the
+visual shape) or min/max per bucket (keeps every peak and trough), at several zoom levels,
+and packed into a compact JSON-friendly payload; modules.chart remains the matplotlib fallback
+"""
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+import modules.metrics
+
+# Zoom levels as months back from the last date (None is the full history)
+ZOOM_LEVELS = {"1M": 1, "3M": 3, "1Y": 12, "5Y": 60, "All": None}
+
+# About one point per horizontal pixel of a dashboard-width chart
+DEFAULT_POINTS = 600
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: positions of `threshold` points that keep the shape of y(x)
+    The first and last points are always kept; every bucket in between keeps the point forming
+    the largest triangle with the previously kept point and the average of the next bucket.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        next_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Positions of the minimum and maximum of y in each of `buckets` equal buckets, in order"""
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picks = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        window = y[start:end]
+        picks.extend((start + int(np.argmin(window)), start + int(np.argmax(window))))
+    picks.extend((0, n - 1))
+    return np.unique(picks)
+
+
+def downsample(values: pd.DataFrame, points: int = DEFAULT_POINTS, method: str = "lttb",
+               key: str = "Total") -> pd.DataFrame:
+    """
+    Rows of a value frame chosen to draw `key` faithfully with about `points` points
+    Every column is sampled on the same dates, so the lines stay aligned.
+    """
+    values = values.dropna(subset=[key])
+    if len(values) <= points:
+        return values
+
+    y = values[key].to_numpy(dtype=float)
+    if method == "lttb":
+        x = values.index.values.astype("datetime64[s]").astype(float)
+        rows = lttb_indices(x, y, points)
+    elif method == "minmax":
+        rows = minmax_indices(y, max(1, points // 2))
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return values.iloc[rows]
+
+
+def zoom_levels(values: pd.DataFrame, points: int = DEFAULT_POINTS, method: str = "lttb") -> Dict[str, pd.DataFrame]:
+    """
+    The value frame downsampled separately for each zoom window ending at the last date
+    Windows no longer than the data that is there are dropped, except the full history.
+    """
+    if values.empty:
+        return {"All": values}
+    last = values.index[-1]
+    levels = {}
+    for level, months in ZOOM_LEVELS.items():
+        if months is None:
+            window = values
+        else:
+            window_start = last - pd.DateOffset(months=months)
+            if window_start < values.index[0]:
+                continue
+            window = values.loc[values.index >= window_start]
+        levels[level] = downsample(window, points, method)
+    return levels
+
+
+def compact(values: pd.DataFrame) -> Dict[str, Any]:
+    """
+    JSON-friendly payload: dates as days since 1970-01-01 shared by every series,
+    values rounded to cents
+    """
+    days = values.index.values.astype("datetime64[D]").astype(np.int64).tolist()
+    return {
+        "dates": days,
+        "series": {str(column): np.round(values[column].to_numpy(dtype=float), 2).tolist()
+                   for column in values.columns},
+    }
+
+
+def expand(payload: Dict[str, Any]) -> pd.DataFrame:
+    """Rebuild a date-indexed frame from a compact payload"""
+    index = pd.to_datetime(np.asarray(payload["dates"], dtype="int64"), unit="D")
+    return pd.DataFrame(payload["series"], index=pd.DatetimeIndex(index, name="Date"))
+
+
+@modules.metrics.timed("chart_data.value_history_series")
+def value_history_series(values: pd.DataFrame, points: int = DEFAULT_POINTS, method: str = "lttb") -> Dict[str, Any]:
+    """
+    Compact payloads of a stored value history (modules.snapshots.value_history) for every zoom level
+    Meant to be cached with render_cache.render_series; expand() turns a level back into a frame.
+    """
+    return {
+        "method": method,
+        "points": points,
+        "levels": {level: compact(frame) for level, frame in zoom_levels(values, points, method).items()},
+    }
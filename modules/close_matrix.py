@@ -0,0 +1,142 @@
+"""
+close_matrix publishes split-adjusted close history as one (days x symbols) matrix in an .npy
+file that every Streamlit session, server process and batch worker maps read-only, so the prices
+behind valuation and charts sit in the OS page cache once instead of being rebuilt as a frame
+from SQLite on every script run
+
+there is one matrix for every symbol asked for so far; each column records the first date it is
+complete from and the price store version it was read at, so a later request only re-reads the
+columns it needs that are missing or out of date and copies the rest over from the mapping
+
+each build is written under a new generation name and published by atomically replacing a small
+pointer file; a process still mapping an older generation keeps a valid view of it
+"""
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Age after which a superseded generation is deleted
+_REMOVE_AFTER_SECONDS = 60
+
+
+class CloseMatrix:
+    """One published generation of the close matrix, mapped read-only"""
+
+    __slots__ = ("path", "generation", "symbols", "starts", "versions", "dates", "values", "_columns")
+
+    def __init__(self, path: str, generation: str):
+        with open(f"{path}-{generation}.json") as f:
+            meta = json.load(f)
+        self.path = path
+        self.generation = generation
+        self.symbols = meta["symbols"]
+        self.starts = [pd.Timestamp(start) for start in meta["starts"]]
+        self.versions = meta["versions"]
+        self.dates = np.asarray(meta["dates"], dtype=np.int64).astype("datetime64[D]")
+        self.values = np.load(f"{path}-{generation}.npy", mmap_mode="r")
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def latest(cls, path: str) -> Optional["CloseMatrix"]:
+        """The generation currently published at `path`, or None"""
+        try:
+            with open(f"{path}.current") as f:
+                return cls(path, f.read().strip())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def publish(cls, path: str, closes: pd.DataFrame, start, versions: Dict[str, Optional[tuple]],
+                dtype: str = "float64", base: Optional["CloseMatrix"] = None) -> "CloseMatrix":
+        """
+        Publish a new generation: `base` with the columns of a wide close frame added or replaced
+        `closes` is in market_data.get_price_frame layout, read from `start` on at the price store
+        `versions` ({symbol: version}). Columns of `base` that `closes` doesn't replace are copied
+        from its mapping as they are; the rows are the union of both sets of days.
+        """
+        fresh = [str(symbol) for symbol in closes.columns]
+        kept = [] if base is None else [symbol for symbol in base.symbols if symbol not in set(fresh)]
+        fresh_dates = closes.index.values.astype("datetime64[D]")
+        dates = np.union1d(base.dates, fresh_dates) if kept else fresh_dates
+
+        values = np.full((len(dates), len(kept) + len(fresh)), np.nan, dtype=dtype)
+        if kept:
+            columns = [base._columns[symbol] for symbol in kept]
+            values[np.searchsorted(dates, base.dates), :len(kept)] = base.values[:, columns]
+        values[np.searchsorted(dates, fresh_dates), len(kept):] = closes.to_numpy(dtype=dtype)
+        start = pd.Timestamp(start).strftime("%Y-%m-%d")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        generation = f"{os.getpid()}-{time.time_ns()}"
+        np.save(f"{path}-{generation}.npy", values)
+        with open(f"{path}-{generation}.json", "w") as f:
+            json.dump({
+                "symbols": kept + fresh,
+                "starts": ([base.starts[base._columns[symbol]].strftime("%Y-%m-%d") for symbol in kept]
+                           + [start] * len(fresh)),
+                "versions": [base.versions[base._columns[symbol]] for symbol in kept]
+                            + [versions.get(symbol) for symbol in fresh],
+                "dates": dates.astype(np.int64).tolist(),
+            }, f)
+
+        pointer = f"{path}.current.{generation}"
+        with open(pointer, "w") as f:
+            f.write(generation)
+        os.replace(pointer, f"{path}.current")
+        cls._remove_old(path, generation)
+        return cls(path, generation)
+
+    @staticmethod
+    def _remove_old(path: str, keep: str):
+        """
+        Delete superseded generations; mappings other processes hold stay valid on POSIX
+        Recent ones are left for a while, in case another process is still about to open them.
+        """
+        cutoff = time.time() - _REMOVE_AFTER_SECONDS
+        for old in glob.glob(f"{glob.escape(path)}-*"):
+            if os.path.basename(old).split(".")[0] == f"{os.path.basename(path)}-{keep}":
+                continue
+            try:
+                if os.path.getmtime(old) < cutoff:
+                    os.remove(old)
+            except OSError:
+                # Gone already, or still mapped on Windows; a later publish retries
+                pass
+
+    def stale(self, symbols: List[str], start, versions: Dict[str, Optional[tuple]]) -> List[str]:
+        """
+        The `symbols` this generation can't serve from `start` on: missing, starting later,
+        or read at another price store version than `versions` ({symbol: version})
+        """
+        start = pd.Timestamp(start)
+        # Versions are stored as JSON, so compare them in that form
+        versions = json.loads(json.dumps(versions))
+        return [symbol for symbol in symbols
+                if symbol not in self._columns or self.starts[self._columns[symbol]] > start
+                or self.versions[self._columns[symbol]] != versions.get(symbol)]
+
+    def matches(self, symbols: List[str], start, versions: Dict[str, Optional[tuple]]) -> bool:
+        """Whether this generation holds `symbols` from `start` on as of `versions`"""
+        return not self.stale(symbols, start, versions)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.values.nbytes)
+
+    def frame(self, symbols: List[str], start=None, end=None) -> pd.DataFrame:
+        """
+        Closes of `symbols` in [start, end) as a float64 frame, on the days any of them traded
+        Only the requested block is copied out of the mapping.
+        """
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).date(), "D"))
+        hi = (len(self.dates) if end is None
+              else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date(), "D")))
+        block = self.values[lo:hi, [self._columns[symbol] for symbol in symbols]].astype(np.float64)
+        traded = ~np.isnan(block).all(axis=1)
+        return pd.DataFrame(block[traded], columns=list(symbols),
+                            index=pd.DatetimeIndex(self.dates[lo:hi][traded].astype("datetime64[ns]"), name="Date"))
@@ -1,56 +1,157 @@
 import sqlite3
 import json
 import hashlib
+import atexit
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from typing import Dict, Any, Optional, List
+from modules import metrics, migrations
 
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections to one database file, shared by every session"""
+
+    # Applied to every new connection
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",       # readers don't block the writer and vice versa
+        "PRAGMA synchronous=NORMAL",     # safe with WAL, fsyncs only at checkpoints
+        "PRAGMA cache_size=-16384",      # 16 MB page cache per connection
+        "PRAGMA temp_store=MEMORY",
+    )
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 30.0):
+        """Create an empty pool; connections are opened on demand up to `size`"""
+        self.db_path = db_path
+        # Every :memory: connection is a separate database, so only one can be pooled
+        self.size = 1 if db_path == ":memory:" else max(1, size)
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        # Long-lived connections keep their compiled statements cached across reruns
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, open a new one if below size, or wait for one to be returned"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; anything left uncommitted is rolled back on error"""
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# One pool per database file for the whole process
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, size: int = 8) -> ConnectionPool:
+    """Shared connection pool for a database file"""
+    key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_path, size)
+        return _pools[key]
+
+
+# Marker for "nothing known about what is stored"
+_UNKNOWN = object()
+
+
+def _holdings_hash(portfolio_data: Dict[str, Dict[str, Any]]) -> str:
+    """Content hash of a holdings dict, independent of key order"""
+    return hashlib.sha1(json.dumps(portfolio_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@metrics.timed_methods("db")
 class PortfolioDB:
     """Simple database handler for portfolio tracker with authentication"""
     
-    def __init__(self, db_path="portfolio_app.db"):
+    def __init__(self, db_path="portfolio_app.db", pool: Optional[ConnectionPool] = None,
+                 write_behind_seconds: float = 5.0):
         """Initialize the database connection and create tables if needed"""
         # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        # Borrow connections from the process-wide pool for this file
+        self.pool = pool or get_pool(db_path)
         
-        # Connect to database
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        # Last known stored state per user, tagged with the portfolio row's version it was
+        # read or written at; used to skip writes that change nothing
+        self._saved = {}
+        self._saved_lock = threading.Lock()
+        self.skipped_writes = 0
+        
+        # Write-behind buffer: username -> fields waiting to be saved
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flusher = None
+        self._stop_flusher = threading.Event()
+        self.write_behind_seconds = write_behind_seconds
         
         # Create tables if they don't exist
         self._create_tables()
     
     def _create_tables(self):
-        """Create the necessary database tables if they don't exist"""
-        cursor = self.conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password_hash TEXT NOT NULL,
-            email TEXT,
-            full_name TEXT
-        )
-        ''')
-        
-        # Portfolios table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS portfolios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            portfolio_data TEXT NOT NULL,
-            cash_balance REAL DEFAULT 0,
-            start_date TEXT,
-            FOREIGN KEY (username) REFERENCES users (username)
-        )
-        ''')
-        
-        self.conn.commit()
+        """Create the necessary database tables, or upgrade older ones, via the migration runner"""
+        with self.pool.connection() as conn:
+            migrations.migrate(conn)
     
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
+        """Write anything still buffered and close the pooled connections"""
+        self._stop_flusher.set()
+        self.flush()
+        self.pool.close()
     
     # User Management Functions
     def add_user(self, username: str, password: str, email: str = "", full_name: str = "") -> bool:
@@ -59,12 +160,11 @@ class PortfolioDB:
             # Hash the password
             password_hash = self._hash_password(password)
             
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, email, full_name) VALUES (?, ?, ?, ?)",
-                (username, password_hash, email, full_name)
-            )
-            self.conn.commit()
+            with self.pool.connection() as conn, conn:
+                conn.execute(
+                    "INSERT INTO users (username, password_hash, email, full_name) VALUES (?, ?, ?, ?)",
+                    (username, password_hash, email, full_name)
+                )
             
             # Create an initial empty portfolio for the user
             self.create_portfolio(username, {})
@@ -76,12 +176,11 @@ class PortfolioDB:
     
     def verify_user(self, username: str, password: str) -> bool:
         """Verify a user's credentials"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT password_hash FROM users WHERE username = ?",
-            (username,)
-        )
-        result = cursor.fetchone()
+        with self.pool.connection() as conn:
+            result = conn.execute(
+                "SELECT password_hash FROM users WHERE username = ?",
+                (username,)
+            ).fetchone()
         
         if result and result['password_hash'] == self._hash_password(password):
             return True
@@ -89,12 +188,11 @@ class PortfolioDB:
     
     def get_user(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user information by username"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT username, email, full_name FROM users WHERE username = ?",
-            (username,)
-        )
-        result = cursor.fetchone()
+        with self.pool.connection() as conn:
+            result = conn.execute(
+                "SELECT username, email, full_name FROM users WHERE username = ?",
+                (username,)
+            ).fetchone()
         
         return dict(result) if result else None
     
@@ -104,78 +202,465 @@ class PortfolioDB:
         return hashlib.sha256(password.encode()).hexdigest()
     
     # Portfolio Management Functions
+    def _remember(self, username: str, version: int, **saved):
+        """Record what is stored for a user as of a portfolio row version, so identical writes can be skipped"""
+        with self._saved_lock:
+            self._saved[username] = dict(saved, version=version)
+    
+    def _known(self, username: str, version: int) -> Dict[str, Any]:
+        """
+        What was last read or written for a user, if the row is still at that version
+        Any write in between (a trade, another PortfolioDB or process) bumps the version,
+        so nothing remembered from before it is trusted.
+        """
+        with self._saved_lock:
+            known = self._saved.get(username, {})
+            if known.get("version") != version:
+                return {}
+            return {field: value for field, value in known.items() if field != "version"}
+    
+    def _version(self, conn: sqlite3.Connection, username: str) -> Optional[int]:
+        """A user's portfolio row version, or None without a portfolio"""
+        row = conn.execute("SELECT version FROM portfolios WHERE username = ?", (username,)).fetchone()
+        return row['version'] if row else None
+    
     def create_portfolio(self, username: str, portfolio_data: Dict[str, Dict[str, Any]], 
                         cash_balance: float = 1000, start_date: str = "2024-01-01") -> int:
         """Create a new portfolio for a user"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO portfolios (username, portfolio_data, cash_balance, start_date) VALUES (?, ?, ?, ?)",
-            (username, json.dumps(portfolio_data), cash_balance, start_date)
-        )
-        self.conn.commit()
+        with self.pool.connection() as conn, conn:
+            # Holdings live in the positions table; the legacy blob column is left empty
+            cursor = conn.execute(
+                "INSERT INTO portfolios (username, portfolio_data, cash_balance, start_date) VALUES (?, '{}', ?, ?)",
+                (username, cash_balance, start_date)
+            )
+            self._write_positions(conn, username, portfolio_data)
+        self._remember(username, 0, holdings=_holdings_hash(portfolio_data), cash_balance=cash_balance,
+                       start_date=start_date)
         
         return cursor.lastrowid
     
+    def get_positions(self, username: str) -> Dict[str, Dict[str, Any]]:
+        """A user's holdings as {symbol: {"Average Cost": ..., "Shares": ...}}"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT symbol, average_cost, shares FROM positions WHERE username = ?",
+                (username,)
+            ).fetchall()
+        return {row['symbol']: {"Average Cost": row['average_cost'], "Shares": row['shares']} for row in rows}
+    
     def get_portfolio(self, username: str) -> Optional[Dict[str, Any]]:
         """Get the portfolio data for a user"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT id, portfolio_data, cash_balance, start_date FROM portfolios WHERE username = ?",
-            (username,)
-        )
-        result = cursor.fetchone()
+        with self.pool.connection() as conn:
+            result = conn.execute(
+                "SELECT id, cash_balance, start_date, version FROM portfolios WHERE username = ?",
+                (username,)
+            ).fetchone()
         
         if not result:
             return None
         
         portfolio = dict(result)
-        # Parse the JSON data
-        portfolio['portfolio_data'] = json.loads(portfolio['portfolio_data'])
+        # Read before the positions, so a write in between leaves this version stale rather than
+        # vouching for holdings it didn't see
+        version = portfolio.pop('version')
+        portfolio['portfolio_data'] = self.get_positions(username)
+        self._remember(username, version, holdings=_holdings_hash(portfolio['portfolio_data']),
+                       cash_balance=portfolio['cash_balance'], start_date=portfolio['start_date'])
+        
+        # Writes still waiting in the write-behind buffer are newer than the stored row
+        with self._pending_lock:
+            pending = self._pending.get(username)
+        if pending:
+            portfolio.update(pending)
         
         return portfolio
     
-    def update_portfolio(self, username: str, portfolio_data: Dict[str, Dict[str, Any]]) -> bool:
-        """Update a user's portfolio data"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "UPDATE portfolios SET portfolio_data = ? WHERE username = ?",
-            (json.dumps(portfolio_data), username)
-        )
-        self.conn.commit()
+    def _write_positions(self, conn: sqlite3.Connection, username: str,
+                         portfolio_data: Dict[str, Dict[str, Any]]):
+        """Replace a user's positions, touching only the rows that changed (caller commits)"""
+        current = {
+            row['symbol']: (row['shares'], row['average_cost'])
+            for row in conn.execute(
+                "SELECT symbol, shares, average_cost FROM positions WHERE username = ?", (username,)
+            ).fetchall()
+        }
+        wanted = {
+            symbol: (float(details.get("Shares", 0) or 0), float(details.get("Average Cost", 0) or 0))
+            for symbol, details in portfolio_data.items()
+        }
+        now = time.time()
+        
+        removed = [(username, symbol) for symbol in current if symbol not in wanted]
+        changed = [(username, symbol, shares, cost) for symbol, (shares, cost) in wanted.items()
+                   if current.get(symbol) != (shares, cost)]
         
-        return cursor.rowcount > 0
+        conn.executemany("DELETE FROM positions WHERE username = ? AND symbol = ?", removed)
+        # Upsert so a position's realized P&L survives an overwrite of its shares/cost
+        conn.executemany(
+            "INSERT INTO positions (username, symbol, shares, average_cost) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (username, symbol) DO UPDATE SET shares = excluded.shares, average_cost = excluded.average_cost",
+            changed
+        )
+        # Record each overwrite so there is a history of holdings (kept apart from the trade ledger)
+        conn.executemany(
+            "INSERT INTO position_history (username, symbol, shares, average_cost, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(username, symbol, 0.0, 0.0, now) for _, symbol in removed]
+            + [(username, symbol, shares, cost, now) for _, symbol, shares, cost in changed]
+        )
+    
+    def update_portfolio(self, username: str, portfolio_data: Dict[str, Dict[str, Any]]) -> bool:
+        """Update a user's portfolio data (skipped when it matches what is stored)"""
+        return self.save_portfolio(username, portfolio_data=portfolio_data)
     
     def update_portfolio_settings(self, username: str, cash_balance: Optional[float] = None, 
                                 start_date: Optional[str] = None) -> bool:
-        """Update a user's portfolio settings"""
+        """Update a user's portfolio settings (skipped when they match what is stored)"""
+        if cash_balance is None and start_date is None:
+            return False
+        return self.save_portfolio(username, cash_balance=cash_balance, start_date=start_date)
+    
+    def save_portfolio(self, username: str, portfolio_data: Optional[Dict[str, Dict[str, Any]]] = None,
+                       cash_balance: Optional[float] = None, start_date: Optional[str] = None) -> bool:
+        """
+        Write holdings and settings together in one transaction
+        Only fields that differ from what is stored are written; if none differ nothing is written.
+        What is stored is only taken from memory while the row's version is the one it was
+        read or written at, otherwise every given field is written.
+        Returns True if the user's portfolio is up to date afterwards.
+        """
+        with self.pool.connection() as conn:
+            version = self._version(conn, username)
+        if version is None:
+            return False
+        known = self._known(username, version)
+        
         updates = []
         params = []
+        saved = {}
+        
+        if portfolio_data is not None:
+            holdings = _holdings_hash(portfolio_data)
+            if holdings != known.get("holdings", _UNKNOWN):
+                saved["holdings"] = holdings
         
-        if cash_balance is not None:
+        if cash_balance is not None and cash_balance != known.get("cash_balance", _UNKNOWN):
             updates.append("cash_balance = ?")
             params.append(cash_balance)
+            saved["cash_balance"] = cash_balance
         
-        if start_date is not None:
+        if start_date is not None and start_date != known.get("start_date", _UNKNOWN):
             updates.append("start_date = ?")
             params.append(start_date)
+            saved["start_date"] = start_date
         
-        if not updates:
-            return False
+        if not saved:
+            self.skipped_writes += 1
+            return True
         
-        cursor = self.conn.cursor()
-        cursor.execute(
-            f"UPDATE portfolios SET {', '.join(updates)} WHERE username = ?",
-            params + [username]
-        )
-        self.conn.commit()
+        with self.pool.connection() as conn, conn:
+            updates.append("version = version + 1")
+            if not conn.execute(
+                f"UPDATE portfolios SET {', '.join(updates)} WHERE username = ?",
+                params + [username]
+            ).rowcount:
+                return False
+            if "holdings" in saved:
+                self._write_positions(conn, username, portfolio_data)
+            self._trim_snapshots(conn, username, saved.get("start_date"))
+            written = self._version(conn, username)
+        
+        # Fields not written are only still known if nothing else wrote since the version was read
+        self._remember(username, written, **dict(known if written == version + 1 else {}, **saved))
+        return True
+    
+    # Write-behind buffer
+    def save_portfolio_deferred(self, username: str, portfolio_data: Optional[Dict[str, Dict[str, Any]]] = None,
+                                cash_balance: Optional[float] = None, start_date: Optional[str] = None):
+        """
+        Queue a save_portfolio call; repeated calls for a user collapse into one write
+        Queued writes are flushed every `write_behind_seconds`, on flush() and at exit.
+        """
+        changes = {"portfolio_data": portfolio_data, "cash_balance": cash_balance, "start_date": start_date}
+        with self._pending_lock:
+            self._pending.setdefault(username, {}).update(
+                {field: value for field, value in changes.items() if value is not None}
+            )
+        self._start_flusher()
+    
+    def flush(self, username: Optional[str] = None):
+        """Write queued changes for one user, or for everyone"""
+        with self._pending_lock:
+            if username is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {username: self._pending.pop(username)} if username in self._pending else {}
+        
+        for user, changes in pending.items():
+            self.save_portfolio(user, **changes)
+    
+    def _start_flusher(self):
+        """Start the background thread that drains the write-behind buffer"""
+        with self._pending_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="portfolio-db-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+    
+    def _flush_loop(self):
+        while not self._stop_flusher.wait(self.write_behind_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing portfolio writes: {str(e)}")
+    
+    # Trade ledger
+    def record_trade(self, username: str, symbol: str, shares: float, price: float,
+                     fees: float = 0.0) -> Dict[str, Any]:
+        """
+        Append a trade to the ledger and update the position's aggregates in place
+        Positive shares buy, negative shares sell; the symbol is upper-cased like imported holdings
+        and the price must be positive. Buys fold into the average cost, sells
+        realize (price - average cost) per share less fees. Only the one position row is read
+        and written, so the cost is the same however long the history is.
+        Returns the updated position.
+        """
+        symbol = str(symbol or "").strip().upper()
+        if not symbol:
+            raise ValueError("Trade needs a ticker symbol")
+        if shares == 0:
+            raise ValueError("Trade must buy or sell at least some shares")
+        if not price > 0:
+            raise ValueError("Trade price must be positive")
+        
+        # Make sure buffered overwrites land before the trade is applied on top of them
+        self.flush(username)
+        
+        with self.pool.connection() as conn, conn:
+            if not conn.execute("UPDATE portfolios SET version = version + 1 WHERE username = ?", (username,)).rowcount:
+                raise ValueError(f"No portfolio for {username}")
+            version = self._version(conn, username)
+            
+            row = conn.execute(
+                "SELECT shares, average_cost, realized_pnl FROM positions WHERE username = ? AND symbol = ?",
+                (username, symbol)
+            ).fetchone()
+            held, cost, realized = (row['shares'], row['average_cost'], row['realized_pnl']) if row else (0.0, 0.0, 0.0)
+            
+            if shares > 0:
+                new_shares = held + shares
+                cost = (held * cost + shares * price + fees) / new_shares
+            else:
+                if -shares > held + 1e-9:
+                    raise ValueError(f"Cannot sell {-shares} shares of {symbol}, only {held} held")
+                new_shares = held + shares
+                realized += -shares * (price - cost) - fees
+                if abs(new_shares) < 1e-9:
+                    new_shares, cost = 0.0, 0.0
+            
+            conn.execute(
+                "INSERT INTO transactions (username, symbol, kind, shares, price, fees, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (username, symbol, "buy" if shares > 0 else "sell", shares, price, fees, time.time())
+            )
+            conn.execute(
+                "INSERT INTO positions (username, symbol, shares, average_cost, realized_pnl) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (username, symbol) DO UPDATE SET shares = excluded.shares, "
+                "average_cost = excluded.average_cost, realized_pnl = excluded.realized_pnl",
+                (username, symbol, new_shares, cost, realized)
+            )
+            self._trim_snapshots(conn, username)
+        
+        # The settings are untouched; the holdings are no longer what was last seen
+        known = self._known(username, version - 1)
+        known.pop("holdings", None)
+        self._remember(username, version, **known)
         
-        return cursor.rowcount > 0
+        return {"Symbol": symbol, "Shares": new_shares, "Average Cost": cost, "Realized P&L": realized}
+    
+    def get_position_history(self, username: str, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Holdings overwrites (shares and average cost as set), oldest first; a removed symbol shows 0 shares"""
+        query = "SELECT id, symbol, shares, average_cost, created_at FROM position_history WHERE username = ?"
+        params = [username]
+        if symbol is not None:
+            query += " AND symbol = ?"
+            params.append(symbol)
+        with self.pool.connection() as conn:
+            rows = conn.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
     
+    def get_trades(self, username: str, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """A user's trades (buys and sells), oldest first"""
+        query = "SELECT id, symbol, kind, shares, price, fees, created_at FROM transactions WHERE username = ?"
+        params = [username]
+        if symbol is not None:
+            query += " AND symbol = ?"
+            params.append(symbol)
+        with self.pool.connection() as conn:
+            rows = conn.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
+    
+    # Valuation snapshots (written by modules.snapshots)
+    def get_snapshot_ranges(self, usernames: Optional[List[str]] = None) -> Dict[str, tuple]:
+        """(first, last) date of each user's snapshots (users without one are left out)"""
+        query = "SELECT username, MIN(date) AS first_date, MAX(date) AS last_date FROM valuation_snapshots"
+        params = []
+        if usernames is not None:
+            if not usernames:
+                return {}
+            query += f" WHERE username IN ({', '.join('?' * len(usernames))})"
+            params = list(usernames)
+        with self.pool.connection() as conn:
+            rows = conn.execute(query + " GROUP BY username", params).fetchall()
+        return {row['username']: (row['first_date'], row['last_date']) for row in rows}
+
+    def _trim_snapshots(self, conn: sqlite3.Connection, username: str, start_date: Optional[str] = None):
+        """
+        Drop the snapshots a portfolio change makes wrong (caller commits)
+        Days from today on were valued with the old holdings and cash, and with a new start date
+        the days before it are no longer part of the history. Earlier days are kept as they were.
+        """
+        condition = "date >= ?"
+        params = [username, time.strftime("%Y-%m-%d")]
+        if start_date is not None:
+            condition += " OR date < ?"
+            params.append(start_date)
+        for table in ("snapshot_positions", "valuation_snapshots"):
+            conn.execute(f"DELETE FROM {table} WHERE username = ? AND ({condition})", params)
+
+    def save_snapshots(self, totals: List[tuple], positions: List[tuple]):
+        """
+        Insert or replace snapshot rows in one transaction
+        totals are (username, date, total, cash); positions are (username, date, symbol, shares, value).
+        A day that is stored again replaces its symbol rows too, so sold symbols don't linger.
+        """
+        if not totals:
+            return
+        with self.pool.connection() as conn, conn:
+            conn.executemany("DELETE FROM snapshot_positions WHERE username = ? AND date = ?",
+                             [(username, date) for username, date, _, _ in totals])
+            conn.executemany(
+                "INSERT OR REPLACE INTO valuation_snapshots (username, date, total, cash) VALUES (?, ?, ?, ?)",
+                totals
+            )
+            conn.executemany(
+                "INSERT INTO snapshot_positions (username, date, symbol, shares, value) VALUES (?, ?, ?, ?, ?)",
+                positions
+            )
+
+    def get_snapshots(self, username: str, start_date: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """A user's stored daily totals and per-symbol values, oldest first"""
+        condition = "username = ?"
+        params = [username]
+        if start_date is not None:
+            condition += " AND date >= ?"
+            params.append(start_date)
+        with self.pool.connection() as conn:
+            totals = conn.execute(
+                f"SELECT date, total, cash FROM valuation_snapshots WHERE {condition} ORDER BY date", params
+            ).fetchall()
+            positions = conn.execute(
+                f"SELECT date, symbol, value FROM snapshot_positions WHERE {condition} ORDER BY date", params
+            ).fetchall()
+        return {"totals": [dict(row) for row in totals], "positions": [dict(row) for row in positions]}
+
+    def get_holdings_summary(self, username: str, prices: Dict[str, float]) -> List[Dict[str, Any]]:
+        """
+        Holdings table rows from the materialized position aggregates
+        Unrealized P&L is shares x (price - average cost), computed per row from `prices`.
+        """
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT symbol, shares, average_cost, realized_pnl FROM positions WHERE username = ?",
+                (username,)
+            ).fetchall()
+        positions = {row['symbol']: dict(row) for row in rows}
+        
+        # Buffered overwrites replace shares and cost but keep realized P&L
+        with self._pending_lock:
+            pending = self._pending.get(username, {}).get("portfolio_data")
+        if pending is not None:
+            positions = {
+                symbol: {"symbol": symbol, "shares": float(details.get("Shares", 0) or 0),
+                         "average_cost": float(details.get("Average Cost", 0) or 0),
+                         "realized_pnl": positions.get(symbol, {}).get("realized_pnl", 0.0)}
+                for symbol, details in pending.items()
+            }
+        
+        summary = []
+        for symbol, position in positions.items():
+            price = prices.get(symbol, 0) or 0
+            shares = position['shares']
+            summary.append({
+                "Symbol": symbol,
+                "Shares": shares,
+                "Average Cost": position['average_cost'],
+                "Current Price": price,
+                "Total Value": round(shares * price, 2),
+                "Unrealized P&L": round(shares * (price - position['average_cost']), 2) if price else 0.0,
+                "Realized P&L": round(position['realized_pnl'], 2),
+            })
+        return summary
+    
+    # Cross-user queries (index lookups on positions.symbol)
+    def get_users_holding(self, symbol: str) -> List[str]:
+        """Usernames with a non-zero position in a symbol"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT username FROM positions WHERE symbol = ? AND shares != 0",
+                (symbol,)
+            ).fetchall()
+        return [row['username'] for row in rows]
+    
+    def get_held_symbols(self) -> List[str]:
+        """Every symbol any user holds, e.g. for the background quote refresher"""
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT DISTINCT symbol FROM positions WHERE shares != 0").fetchall()
+        return [row['symbol'] for row in rows]
+
+    def get_portfolios(self, usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Stored portfolios for many users in two queries, keyed by username
+        Same shape as get_portfolio; users without a portfolio row are left out.
+        """
+        if not usernames:
+            return {}
+        placeholders = ", ".join("?" * len(usernames))
+        with self.pool.connection() as conn:
+            portfolios = conn.execute(
+                f"SELECT username, cash_balance, start_date FROM portfolios WHERE username IN ({placeholders})",
+                usernames
+            ).fetchall()
+            positions = conn.execute(
+                f"SELECT username, symbol, average_cost, shares FROM positions WHERE username IN ({placeholders})",
+                usernames
+            ).fetchall()
+
+        result = {row['username']: {"cash_balance": row['cash_balance'], "start_date": row['start_date'],
+                                    "portfolio_data": {}} for row in portfolios}
+        for row in positions:
+            if row['username'] in result:
+                result[row['username']]['portfolio_data'][row['symbol']] = {
+                    "Average Cost": row['average_cost'], "Shares": row['shares']}
+        return result
+
     # Admin Functions
     def get_all_users(self) -> List[Dict[str, Any]]:
         """Get all users (for admin purposes)"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT username, email, full_name FROM users")
-        results = cursor.fetchall()
+        with self.pool.connection() as conn:
+            results = conn.execute("SELECT username, email, full_name FROM users").fetchall()
         
-        return [dict(row) for row in results]
\ No newline at end of file
+        return [dict(row) for row in results]
+
+
+# Process-wide handlers, so every session and rerun reuses the same pool and tables check
+_dbs = {}
+_dbs_lock = threading.Lock()
+
+
+def get_db(db_path: str = "portfolio_app.db", write_behind_seconds: float = 5.0) -> PortfolioDB:
+    """Shared PortfolioDB for a database file"""
+    key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+    with _dbs_lock:
+        if key not in _dbs:
+            _dbs[key] = PortfolioDB(db_path, write_behind_seconds=write_behind_seconds)
+        return _dbs[key]
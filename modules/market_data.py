@@ -1,39 +1,244 @@
-import yfinance as yf 
+import threading
+import numpy as np
 import pandas as pd
+from typing import Dict, List
+import config
+from modules import metrics
+from modules.close_matrix import CloseMatrix
+from modules.price_cache import PriceCache
+from modules.quote_cache import QuoteCache
+from modules.quote_refresher import QuoteRefresher
+from modules.return_index import ReturnIndex
 
+# Process-wide price store and quote cache, created on first use
+_price_cache = None
+_quote_cache = None
+_quote_refresher = None
+
+# symbol -> (price version, ReturnIndex, first date covered), rebuilt when the symbol's stored prices change
+_return_indexes = {}
+_return_indexes_lock = threading.Lock()
+
+# The close matrix generation this process has mapped (see modules/close_matrix.py)
+_close_matrix = None
+_close_matrix_lock = threading.Lock()
+
+
+def get_price_cache() -> PriceCache:
+    '''
+    shared on-disk price store used by every market data call
+    '''
+    global _price_cache
+    if _price_cache is None:
+        _price_cache = PriceCache(config.PRICE_CACHE_PATH, refresh_seconds=config.PRICE_REFRESH_SECONDS)
+    return _price_cache
+
+
+def set_price_cache(cache: PriceCache):
+    '''
+    swap the shared price store, e.g. for one backed by a FakeFetcher in tests
+    '''
+    global _price_cache, _close_matrix
+    _price_cache = cache
+    _close_matrix = None
+
+
+@metrics.timed("market_data.load_quotes")
+def _load_quotes(symbols: List[str]) -> Dict[str, float]:
+    '''
+    quote cache loader: one batched request for every expired symbol
+    '''
+    return get_price_cache().fetcher.fetch_quotes(symbols)
+
+
+def get_quote_cache() -> QuoteCache:
+    '''
+    latest-price cache shared by every session in this process
+    '''
+    global _quote_cache
+    if _quote_cache is None:
+        _quote_cache = QuoteCache(_load_quotes, config.QUOTE_TTL_SECONDS, config.QUOTE_TTL_OVERRIDES)
+        metrics.register_collector("quote_cache", _quote_cache.stats)
+    return _quote_cache
+
+
+def start_quote_refresher(fetch_quotes=None, interval_seconds=None, max_concurrency=None) -> QuoteRefresher:
+    '''
+    start (once per process) the background thread that keeps the quote cache warm
+    fetch_quotes defaults to the price store's fetcher; pass FakeFetcher().fetch_quotes to run offline
+    '''
+    global _quote_refresher
+    if _quote_refresher is None:
+        _quote_refresher = QuoteRefresher(
+            get_quote_cache(),
+            fetch_quotes or _load_quotes,
+            interval_seconds or config.QUOTE_REFRESH_INTERVAL_SECONDS,
+            max_concurrency or config.QUOTE_REFRESH_CONCURRENCY,
+            config.QUOTE_REFRESH_BATCH_SIZE,
+        )
+    _quote_refresher.start()
+    return _quote_refresher
+
+
+def get_quote_refresher():
+    '''
+    the running background refresher, started here if config enables it, otherwise None
+    '''
+    if _quote_refresher is None and config.QUOTE_REFRESHER_ENABLED:
+        start_quote_refresher()
+    return _quote_refresher
+
+
+def watch_symbols(stocks: List[str]):
+    '''
+    register a session's held tickers with the background refresher (no-op when it is off)
+    '''
+    refresher = get_quote_refresher()
+    if refresher is not None:
+        refresher.watch(stocks)
+
+
+@metrics.timed("market_data.current_ticker_price")
 def current_ticker_price(ticker):  
     '''
     closing value of chosen ticker
     '''
-    # fetch ticker data 
-    stock = yf.Ticker(str(ticker))
-    
-    #closing price of the stock
-    stock_price = stock.history(period='1d')["Close"].iloc[-1]
+    # shared quote cache, only fetched when the quote has expired
+    stock_price = get_quote_cache().get(ticker)
+    if stock_price is None:
+        raise ValueError(f"No price data available for {ticker}")
 
     return stock_price
 
 
 
+@metrics.timed("market_data.get_return_index")
+def get_return_index(stock: str, start_date) -> ReturnIndex:
+    '''
+    cumulative log-return index for a ticker covering at least start_date to today
+    built once per change of the stored prices and shared by every session; closes are
+    adjusted for splits and dividends, so returns run straight through ex-dates
+    '''
+    symbol = str(stock).upper()
+    start = pd.to_datetime(start_date).normalize()
+    cache = get_price_cache()
+
+    with _return_indexes_lock:
+        entry = _return_indexes.get(symbol)
+    build_start = min(start, entry[2]) if entry is not None else start
+    cache.ensure([symbol], build_start)
+    version = cache.version([symbol])
+    if entry is not None and entry[0] == version and entry[2] <= start:
+        return entry[1]
+
+    index = ReturnIndex(cache.get_history(symbol, build_start, adjust="total")["Close"])
+    with _return_indexes_lock:
+        _return_indexes[symbol] = (version, index, build_start)
+    return index
+
+
+def range_returns(stock: str, start_dates, end_dates) -> np.ndarray:
+    '''
+    percentage change of a ticker over many [start, end) ranges in one vectorized call
+    NaN for ranges with no trading day
+    '''
+    start_dates = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(start_dates)))
+    if len(start_dates) == 0:
+        return np.array([])
+    return get_return_index(stock, start_dates.min()).range_returns(start_dates, end_dates)
+
+
+@metrics.timed("market_data.get_percentage_change")
 def get_percentage_change(stock: str, start_date: str, end_date: str):
-    # Download stock data
-    data = yf.download(stock, start=start_date, end=end_date)
-    
-    if data.empty:
+    # Two lookups in the shared return index instead of reading the whole window
+    percentage_change = range_returns(stock, [start_date], [end_date])[0]
+
+    if np.isnan(percentage_change):
         return f"No data available for {stock} between {start_date} and {end_date}"
-    
-    # Get the closing prices for the start and end dates
-    start_price = data["Close"].iloc[0]
-    end_price = data["Close"].iloc[-1]
-    
-    # Calculate percentage change
-    percentage_change = ((end_price - start_price) / start_price) * 100
-    
-    return float(percentage_change.round(2))
+
+    return round(float(percentage_change), 2)
 
 
+@metrics.timed("market_data.get_stock_data")
 def get_stock_data(stock: str, start_date: str):
-    # Download stock data
-    data = yf.download(stock, start=start_date)
-    
-    return data
\ No newline at end of file
+    # Stock data from the local price store, only missing days are downloaded
+    data = get_price_cache().get_history(stock, start_date)
+
+    return data
+
+
+@metrics.timed("market_data.get_close_matrix")
+def get_close_matrix(stocks: List[str], start_date) -> CloseMatrix:
+    '''
+    read-only split-adjusted close matrix holding these tickers from start_date to today,
+    mapped from the file every process shares; while it holds them at the store's current
+    prices it is served as is, otherwise only the missing or out-of-date columns are read
+    from the store and published together with the rest of the matrix
+    '''
+    global _close_matrix
+    symbols = list(dict.fromkeys(str(stock).upper() for stock in stocks))
+    start = pd.to_datetime(start_date).normalize()
+    cache = get_price_cache()
+
+    # only the requested tickers are topped up; the other columns of the matrix are not read
+    cache.ensure(symbols, start)
+    versions = cache.symbol_versions(symbols)
+    matrix = _close_matrix
+    if matrix is not None and matrix.matches(symbols, start, versions):
+        return matrix
+
+    # another process may already have published a matrix that covers this request
+    latest = CloseMatrix.latest(config.CLOSE_MATRIX_PATH)
+    if latest is not None and latest.matches(symbols, start, versions):
+        _close_matrix = latest
+        return latest
+
+    # keep each re-read column's earlier days
+    base = latest or matrix
+    stale = symbols if base is None else base.stale(symbols, start, versions)
+    starts = [] if base is None else [base.starts[base.symbols.index(symbol)] for symbol in stale
+                                      if symbol in base.symbols]
+    read_start = min([start] + starts)
+    closes = cache.get_closes(stale, read_start)
+
+    with _close_matrix_lock:
+        # build on whatever was published meanwhile, so its new columns aren't dropped
+        base = CloseMatrix.latest(config.CLOSE_MATRIX_PATH) or _close_matrix
+        _close_matrix = CloseMatrix.publish(config.CLOSE_MATRIX_PATH, closes, read_start, versions,
+                                            config.CLOSE_MATRIX_DTYPE, base)
+        return _close_matrix
+
+
+@metrics.timed("market_data.get_price_frame")
+def get_price_frame(stocks: List[str], start_date, end_date=None, adjust: str = "split") -> pd.DataFrame:
+    '''
+    closing prices for several tickers in one aligned frame (one column per ticker)
+    all missing history is fetched in a single batched download
+    adjust="split" prices every day in today's shares (for valuing share counts),
+    "total" also reinvests dividends (for returns), None leaves closes as traded
+    split-adjusted closes are cut from the shared close matrix when it is enabled
+    '''
+    if adjust == "split" and config.CLOSE_MATRIX_ENABLED and len(stocks):
+        symbols = list(dict.fromkeys(str(stock).upper() for stock in stocks))
+        return get_close_matrix(symbols, start_date).frame(symbols, start_date, end_date)
+    return get_price_cache().get_closes(stocks, start_date, end_date, adjust)
+
+
+@metrics.timed("market_data.current_prices")
+def current_prices(stocks: List[str]) -> Dict[str, float]:
+    '''
+    latest price for each ticker from the shared quote cache, expired ones fetched together
+    '''
+    if not stocks:
+        return {}
+
+    # with the background refresher running, never wait on the network: serve what it last published
+    refresher = get_quote_refresher()
+    if refresher is not None and refresher.running:
+        refresher.watch(stocks)
+        return {stock: get_quote_cache().peek(stock) or 0.0 for stock in stocks}
+
+    quotes = get_quote_cache().get_many(stocks)
+
+    # tickers with no quote come back as 0
+    return {stock: quotes.get(str(stock).upper()) or 0.0 for stock in stocks}
@@ -0,0 +1,171 @@
+"""
+metrics records how long the hot paths take, so a slow page can be traced to yfinance,
+SQLite, pandas or matplotlib
+instrumented functions add their duration and call count to process-wide totals and to the
+trace of the current script run; counters (e.g. bytes fetched) and cache gauges sit alongside.
+everything can be dumped in the Prometheus text format. when disabled, each instrumented call
+costs a single flag check.
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import config
+
+_enabled = config.METRICS_ENABLED
+_lock = threading.Lock()
+_timers = {}      # name -> [calls, total seconds, max seconds, errors]
+_counters = {}    # name -> value
+_collectors = {}  # prefix -> callable returning {name: value}, read at dump time
+_local = threading.local()
+
+
+def enable(on: bool = True):
+    """Turn recording on or off for the whole process"""
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _record(name: str, elapsed: float, failed: bool):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = [0, 0.0, 0.0, 0]
+        timer[0] += 1
+        timer[1] += elapsed
+        timer[2] = max(timer[2], elapsed)
+        timer[3] += failed
+
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        entry = trace.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording the duration of every call under `name`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _record(name, time.perf_counter() - started, failed)
+        return wrapper
+    return decorator
+
+
+def timed_methods(prefix: str) -> Callable:
+    """Class decorator applying `timed` to every public method, named prefix.method"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if inspect.isfunction(value) and not attr.startswith("_"):
+                setattr(cls, attr, timed(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def increment(name: str, value: float = 1):
+    """Add to a counter, e.g. rows or bytes fetched"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_collector(prefix: str, collect: Callable[[], Dict[str, float]]):
+    """Read collect() at dump time and report each value as a gauge named prefix_name"""
+    _collectors[prefix] = collect
+
+
+def begin_trace():
+    """Start collecting timings for the calling thread, i.e. one Streamlit script run"""
+    _local.trace = {}
+
+
+def current_trace() -> Dict[str, Dict[str, float]]:
+    """{name: {"calls", "seconds"}} recorded on this thread since begin_trace"""
+    trace = getattr(_local, "trace", None) or {}
+    return {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in trace.items()}
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Copy of every timer, counter and collected gauge"""
+    with _lock:
+        timers = {name: {"calls": t[0], "seconds": t[1], "max_seconds": t[2], "errors": t[3]}
+                  for name, t in _timers.items()}
+        counters = dict(_counters)
+    gauges = {}
+    for prefix, collect in list(_collectors.items()):
+        try:
+            values = collect()
+        except Exception:
+            continue
+        for name, value in values.items():
+            gauges[f"{prefix}_{name}"] = value
+    return {"timers": timers, "counters": counters, "gauges": gauges}
+
+
+def reset():
+    """Clear timers and counters (gauges come from their collectors)"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _metric_name(name: str) -> str:
+    return "portfolio_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def prometheus_text() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    data = snapshot()
+    lines: List[str] = []
+
+    if data["timers"]:
+        lines.append("# TYPE portfolio_call_duration_seconds summary")
+        for name, timer in sorted(data["timers"].items()):
+            lines.append(f'portfolio_call_duration_seconds_count{{name="{name}"}} {timer["calls"]}')
+            lines.append(f'portfolio_call_duration_seconds_sum{{name="{name}"}} {timer["seconds"]:.6f}')
+        lines.append("# TYPE portfolio_call_duration_max_seconds gauge")
+        for name, timer in sorted(data["timers"].items()):
+            lines.append(f'portfolio_call_duration_max_seconds{{name="{name}"}} {timer["max_seconds"]:.6f}')
+        lines.append("# TYPE portfolio_call_errors_total counter")
+        for name, timer in sorted(data["timers"].items()):
+            lines.append(f'portfolio_call_errors_total{{name="{name}"}} {timer["errors"]}')
+
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {_metric_name(name)}_total counter")
+        lines.append(f"{_metric_name(name)}_total {value}")
+
+    for name, value in sorted(data["gauges"].items()):
+        lines.append(f"# TYPE {_metric_name(name)} gauge")
+        lines.append(f"{_metric_name(name)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None):
+    """Write the text dump to a file (config.METRICS_PATH by default), e.g. for a node exporter textfile collector"""
+    path = path or config.METRICS_PATH
+    if not path:
+        return
+    # Write then rename, so a scraper never reads a half-written file
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temporary, path)
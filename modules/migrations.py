@@ -0,0 +1,199 @@
+"""
+migrations brings the portfolio database schema up to date
+each migration runs once, in order, inside its own transaction; the applied
+version is recorded in the schema_version table
+"""
+import json
+import sqlite3
+import time
+from typing import Callable, List, Tuple
+
+
+def _v1_base_tables(conn: sqlite3.Connection):
+    """Users and portfolios tables (the original schema)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password_hash TEXT NOT NULL,
+        email TEXT,
+        full_name TEXT
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS portfolios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        portfolio_data TEXT NOT NULL,
+        cash_balance REAL DEFAULT 0,
+        start_date TEXT,
+        FOREIGN KEY (username) REFERENCES users (username)
+    )
+    ''')
+
+
+def _v2_positions_and_transactions(conn: sqlite3.Connection):
+    """
+    One row per held symbol instead of a JSON blob, plus a transactions table
+    Existing portfolio_data blobs are converted into positions rows. The blob column is
+    left as it was (no longer read or written) so the conversion can be checked or undone.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS positions (
+        username TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        shares REAL NOT NULL DEFAULT 0,
+        average_cost REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, symbol),
+        FOREIGN KEY (username) REFERENCES users (username)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions (symbol, username)")
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        shares REAL NOT NULL,
+        price REAL NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (username) REFERENCES users (username)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_username ON transactions (username, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_symbol ON transactions (symbol)")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_portfolios_username ON portfolios (username)")
+
+    # Convert the JSON blobs
+    now = time.time()
+    for username, portfolio_data in conn.execute("SELECT username, portfolio_data FROM portfolios").fetchall():
+        try:
+            holdings = json.loads(portfolio_data or "{}")
+        except ValueError:
+            continue
+        for symbol, details in holdings.items():
+            shares = float(details.get("Shares", 0) or 0)
+            cost = float(details.get("Average Cost", 0) or 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO positions (username, symbol, shares, average_cost) VALUES (?, ?, ?, ?)",
+                (username, symbol, shares, cost)
+            )
+            conn.execute(
+                "INSERT INTO transactions (username, symbol, kind, shares, price, created_at) VALUES (?, ?, 'set', ?, ?, ?)",
+                (username, symbol, shares, cost, now)
+            )
+
+
+def _v3_trade_ledger(conn: sqlite3.Connection):
+    """Running realized P&L per position and fees per trade for the trade ledger"""
+    conn.execute("ALTER TABLE positions ADD COLUMN realized_pnl REAL NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE transactions ADD COLUMN fees REAL NOT NULL DEFAULT 0")
+
+
+def _v4_valuation_snapshots(conn: sqlite3.Connection):
+    """One stored valuation per user per trading day: totals and cash, plus each symbol's value"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS valuation_snapshots (
+        username TEXT NOT NULL,
+        date TEXT NOT NULL,
+        total REAL NOT NULL,
+        cash REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, date),
+        FOREIGN KEY (username) REFERENCES users (username)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS snapshot_positions (
+        username TEXT NOT NULL,
+        date TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        shares REAL NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (username, date, symbol),
+        FOREIGN KEY (username) REFERENCES users (username)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _v5_position_history(conn: sqlite3.Connection):
+    """
+    Holdings overwrites get their own table, so the transactions ledger only holds trades
+    The 'set' rows written so far move over, with the cost basis in its own column.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS position_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        shares REAL NOT NULL,
+        average_cost REAL NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (username) REFERENCES users (username)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_position_history_username ON position_history (username, id)")
+    conn.execute(
+        "INSERT INTO position_history (username, symbol, shares, average_cost, created_at) "
+        "SELECT username, symbol, shares, price, created_at FROM transactions WHERE kind = 'set' ORDER BY id"
+    )
+    conn.execute("DELETE FROM transactions WHERE kind = 'set'")
+
+
+def _v6_portfolio_version(conn: sqlite3.Connection):
+    """
+    A counter bumped by every write to a user's portfolio or positions
+    Lets a process tell whether what it last read is still what is stored.
+    """
+    conn.execute("ALTER TABLE portfolios ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+
+# (version, description, function) in the order they must run
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base users and portfolios tables", _v1_base_tables),
+    (2, "normalized positions and transactions", _v2_positions_and_transactions),
+    (3, "trade ledger aggregates", _v3_trade_ledger),
+    (4, "daily valuation snapshots", _v4_valuation_snapshots),
+    (5, "holdings overwrites out of the trade ledger", _v5_position_history),
+    (6, "portfolio write counter", _v6_portfolio_version),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration, 0 for a new database"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at REAL NOT NULL
+    )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply every pending migration and return the versions applied"""
+    if current_version(conn) >= MIGRATIONS[-1][0]:
+        return []
+
+    applied = []
+    for number, description, migration in MIGRATIONS:
+        # IMMEDIATE takes the write lock up front, so DDL is transactional and two
+        # processes starting at once can't both run the same migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if number > current_version(conn):
+                migration(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (number, description, time.time())
+                )
+                applied.append(number)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,160 @@
+"""
+parallel_sweep evaluates large grids of 9-Sig variants across every CPU core
+variants differ by signal ticker, start date, cash buffer and target rate
+the close-price matrix is placed in shared memory once and every worker maps it
+instead of receiving a pickled copy with each task; tasks only carry their parameters
+
+usage: python -m modules.parallel_sweep --symbols TQQQ --start-dates 2012-01-01 2015-01-01 \
+           --rates 0.03:0.15:0.005 --cash 0.3 0.4 --out sweep.csv
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import modules.backtest
+import modules.market_data
+
+# Worker-side views onto the shared price matrix, set by _attach
+_shared = {}
+
+
+def _open_shared(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without letting this process unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag; pool workers share the parent's resource tracker,
+        # which only unlinks the block when the parent does
+        return shared_memory.SharedMemory(name=name)
+
+
+def _attach(prices_name: str, dates_name: str, shape, symbols: List[str]):
+    """Pool initializer: map the shared price matrix read-only"""
+    prices_block = _open_shared(prices_name)
+    dates_block = _open_shared(dates_name)
+    prices = np.ndarray(shape, dtype=np.float64, buffer=prices_block.buf)
+    prices.flags.writeable = False
+    dates = np.ndarray((shape[0],), dtype=np.int64, buffer=dates_block.buf)
+
+    _shared.update(blocks=(prices_block, dates_block), prices=prices,
+                   dates=pd.DatetimeIndex(dates.view("datetime64[ns]")), columns={s: i for i, s in enumerate(symbols)})
+
+
+def _run_task(symbol: str, start_date, cash_fraction: float, target_rates: List[float],
+              initial_capital: float, cash_rate: float) -> pd.DataFrame:
+    """Backtest every target rate for one (symbol, start date, cash buffer) on the shared matrix"""
+    column = _shared["prices"][:, _shared["columns"][symbol]]
+    prices = pd.Series(column, index=_shared["dates"])
+    result = modules.backtest.sweep(prices, [start_date], target_rates, initial_capital=initial_capital,
+                                    cash_fraction=cash_fraction, cash_rate=cash_rate)
+    if not result.empty:
+        result.insert(0, "symbol", symbol)
+        result.insert(3, "cash_fraction", cash_fraction)
+    return result
+
+
+def _share(array: np.ndarray) -> shared_memory.SharedMemory:
+    """Copy an array into a new shared memory block"""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
+
+
+def run_sweep(symbols: Iterable[str] = ("TQQQ",), start_dates: Iterable = ("2012-01-01",),
+              target_rates: Iterable[float] = (0.09,), cash_fractions: Iterable[float] = (0.4,),
+              initial_capital: float = 10000, cash_rate: float = 0.0, closes: Optional[pd.DataFrame] = None,
+              max_workers: Optional[int] = None, rank_by: str = "cagr_pct",
+              on_result: Optional[Callable[[pd.DataFrame], None]] = None) -> pd.DataFrame:
+    """
+    Backtest every combination of the given parameters in a process pool
+
+    Parameters:
+    - symbols, start_dates, target_rates, cash_fractions: the grid to evaluate
+    - closes: wide close frame to use; fetched from the price cache when omitted
+    - max_workers: pool size, defaults to every core
+    - rank_by: result column to rank on (highest first)
+    - on_result: called with each task's rows as soon as they arrive
+
+    Returns:
+    - DataFrame of every configuration, ranked
+    """
+    symbols = [str(symbol).upper() for symbol in symbols]
+    start_dates = [pd.Timestamp(date) for date in start_dates]
+    target_rates = [float(rate) for rate in target_rates]
+
+    if closes is None:
+        closes = modules.market_data.get_price_frame(symbols, min(start_dates), adjust="total")
+    closes = closes.reindex(columns=symbols).sort_index()
+
+    prices = np.ascontiguousarray(closes.to_numpy(dtype=np.float64))
+    dates = closes.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    prices_block = _share(prices)
+    dates_block = _share(dates)
+
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_attach,
+                                 initargs=(prices_block.name, dates_block.name, prices.shape, symbols)) as pool:
+            futures = [
+                pool.submit(_run_task, symbol, start_date, cash_fraction, target_rates, initial_capital, cash_rate)
+                for symbol, start_date, cash_fraction in itertools.product(symbols, start_dates, cash_fractions)
+            ]
+            for future in as_completed(futures):
+                rows = future.result()
+                if rows.empty:
+                    continue
+                results.append(rows)
+                if on_result is not None:
+                    on_result(rows)
+    finally:
+        for block in (prices_block, dates_block):
+            block.close()
+            block.unlink()
+
+    if not results:
+        return pd.DataFrame()
+    ranked = pd.concat(results, ignore_index=True).sort_values(rank_by, ascending=False, ignore_index=True)
+    ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+    return ranked
+
+
+def _parse_range(values: List[str]) -> List[float]:
+    """Accept plain numbers or start:stop:step ranges (stop inclusive)"""
+    parsed = []
+    for value in values:
+        if ":" in value:
+            start, stop, step = (float(part) for part in value.split(":"))
+            parsed.extend(np.round(np.arange(start, stop + step / 2, step), 10).tolist())
+        else:
+            parsed.append(float(value))
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank 9-Sig variants across a parameter grid")
+    parser.add_argument("--symbols", nargs="+", default=["TQQQ"])
+    parser.add_argument("--start-dates", nargs="+", default=["2012-01-01"])
+    parser.add_argument("--rates", nargs="+", default=["0.09"], help="target rates, e.g. 0.09 or 0.03:0.15:0.01")
+    parser.add_argument("--cash", nargs="+", default=["0.4"], help="starting cash fractions")
+    parser.add_argument("--capital", type=float, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank-by", default="cagr_pct")
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    ranked = run_sweep(args.symbols, args.start_dates, _parse_range(args.rates), _parse_range(args.cash),
+                       initial_capital=args.capital, max_workers=args.workers, rank_by=args.rank_by)
+    ranked.to_csv(args.out, index=False)
+    print(f"{len(ranked)} configurations written to {args.out}")
+    if not ranked.empty:
+        print(ranked.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
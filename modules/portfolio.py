@@ -1,10 +1,115 @@
-import modules
+"""
+portfolio holds a user's positions in a compact form for code that works on many portfolios
+at once (batch runs, analytics): symbols, share counts and average costs are parallel arrays
+instead of a dict of dicts per position, and Position objects are slotted
+the dict-of-dicts form ({"TQQQ": {"Average Cost": ..., "Shares": ...}}) stays the format of the
+database and app; from_positions/to_positions convert between the two
+"""
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
 import modules.market_data
 
 
+class Position:
+    """One holding"""
+
+    __slots__ = ("symbol", "shares", "average_cost")
+
+    def __init__(self, symbol: str, shares: float = 0.0, average_cost: float = 0.0):
+        self.symbol = symbol
+        self.shares = shares
+        self.average_cost = average_cost
+
+    def __repr__(self):
+        return f"Position({self.symbol!r}, shares={self.shares}, average_cost={self.average_cost})"
+
+
+class Portfolio:
+    """
+    Holdings as parallel arrays plus cash balance and start date
+    Symbols are upper-cased, like every price lookup.
+    """
+
+    __slots__ = ("symbols", "shares", "average_costs", "cash_balance", "start_date")
+
+    def __init__(self, symbols: List[str], shares, average_costs, cash_balance: float = 0.0,
+                 start_date: Optional[str] = None):
+        self.symbols = tuple(str(symbol).upper() for symbol in symbols)
+        self.shares = np.asarray(shares, dtype=float)
+        self.average_costs = np.asarray(average_costs, dtype=float)
+        self.cash_balance = float(cash_balance or 0)
+        self.start_date = start_date
+
+    @classmethod
+    def from_positions(cls, positions: Dict[str, Dict[str, Any]], cash_balance: float = 0.0,
+                       start_date: Optional[str] = None) -> "Portfolio":
+        """From {symbol: {"Shares": ..., "Average Cost": ...}}"""
+        return cls(list(positions),
+                   [float(details.get("Shares", 0) or 0) for details in positions.values()],
+                   [float(details.get("Average Cost", 0) or 0) for details in positions.values()],
+                   cash_balance, start_date)
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Portfolio":
+        """From a PortfolioDB.get_portfolio / get_portfolios entry"""
+        return cls.from_positions(record["portfolio_data"] or {}, record.get("cash_balance") or 0,
+                                  record.get("start_date"))
+
+    def to_positions(self) -> Dict[str, Dict[str, float]]:
+        """Back to the dict-of-dicts form used by the database and app"""
+        return {symbol: {"Average Cost": float(cost), "Shares": float(shares)}
+                for symbol, shares, cost in zip(self.symbols, self.shares, self.average_costs)}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self) -> Iterator[Position]:
+        for symbol, shares, cost in zip(self.symbols, self.shares.tolist(), self.average_costs.tolist()):
+            yield Position(symbol, shares, cost)
+
+    def __contains__(self, symbol):
+        return str(symbol).upper() in self.symbols
+
+    def get(self, symbol: str) -> Optional[Position]:
+        """The position in `symbol`, or None"""
+        symbol = str(symbol).upper()
+        if symbol not in self.symbols:
+            return None
+        i = self.symbols.index(symbol)
+        return Position(symbol, float(self.shares[i]), float(self.average_costs[i]))
+
+    def shares_vector(self, symbols: List[str]) -> np.ndarray:
+        """Share counts ordered like `symbols` (0 for symbols not held)"""
+        return Portfolio.share_matrix([self], symbols)[:, 0]
+
+    def holdings_value(self, prices: Dict[str, float]) -> float:
+        """Value of the holdings at the given prices (missing prices count as 0)"""
+        return float(sum(shares * (prices.get(symbol) or 0.0) for symbol, shares in zip(self.symbols, self.shares)))
+
+    @staticmethod
+    def share_matrix(portfolios: List["Portfolio"], symbols: List[str]) -> np.ndarray:
+        """Share counts of many portfolios as a (symbols x portfolios) matrix, built in one scatter"""
+        columns = {str(symbol).upper(): i for i, symbol in enumerate(symbols)}
+        matrix = np.zeros((len(columns), len(portfolios)))
+        if not portfolios:
+            return matrix
+        held = [symbol for portfolio in portfolios for symbol in portfolio.symbols]
+        rows = np.array([columns.get(symbol, -1) for symbol in held], dtype=np.int64)
+        owners = np.repeat(np.arange(len(portfolios)), [len(portfolio) for portfolio in portfolios])
+        shares = np.concatenate([portfolio.shares for portfolio in portfolios])
+        known = rows >= 0
+        np.add.at(matrix, (rows[known], owners[known]), shares[known])
+        return matrix
+
+
 def portfolio_value_csv(positions):
-    total = 0 
+    # latest prices for every position in one batched call
+    if isinstance(positions, Portfolio):
+        return positions.holdings_value(modules.market_data.current_prices(list(positions.symbols)))
+    prices = modules.market_data.current_prices(list(positions))
+    total = 0
     for i in positions:
-        total += modules.market_data.current_ticker_price(i) * positions[i]["Shares"]
+        total += prices[i] * positions[i]["Shares"]
     return total
-
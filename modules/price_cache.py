@@ -0,0 +1,539 @@
+"""
+price_cache keeps daily OHLCV history on disk, keyed by (symbol, date)
+repeated requests are answered from SQLite and only the missing days are fetched
+
+prices are stored unadjusted, next to a corporate_actions table of splits and dividends with
+their cumulative adjustment factors; reads multiply the stored closes by those factors, so a new
+split or dividend only rewrites the symbol's few action rows and never the price history
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules import metrics
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+ACTION_COLUMNS = ["Dividends", "Stock Splits"]
+
+# How stored prices are adjusted on read: None (as traded), "split" (in today's shares, for
+# valuing share counts) or "total" (splits and reinvested dividends, for returns)
+ADJUSTMENTS = (None, "split", "total")
+
+
+def _empty_history() -> pd.DataFrame:
+    """Empty frame with the same layout as a fetched history"""
+    return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name="Date"), dtype=float)
+
+
+class PriceFetcher:
+    """Interface for a source of daily price history"""
+
+    def fetch(self, symbols: List[str], start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        """
+        Return {symbol: DataFrame} of daily bars in [start, end)
+        Frames are indexed by date and hold the PRICE_COLUMNS columns, plus optionally the
+        ACTION_COLUMNS (split ratio and dividend per share on their ex-dates, 0 elsewhere).
+        Prices and dividends may be split-adjusted as of today, as Yahoo serves them; splits
+        after each day are undone before storing. Symbols without data may be left out.
+        """
+        raise NotImplementedError
+
+    def fetch_quotes(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest close for each symbol, from one batched request over the last week"""
+        today = pd.Timestamp.today().normalize()
+        frames = self.fetch(list(symbols), today - pd.Timedelta(days=7), today + pd.Timedelta(days=1))
+        return {symbol: float(frame["Close"].iloc[-1]) for symbol, frame in frames.items() if not frame.empty}
+
+
+class YahooFetcher(PriceFetcher):
+    """Fetch price history from Yahoo Finance through yfinance"""
+
+    def fetch(self, symbols: List[str], start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        # Dividends stay in the price (adjusted on read from the actions), splits come back as a column
+        data = yf.download(list(symbols), start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+                           group_by="ticker", auto_adjust=False, actions=True, progress=False)
+        if data is None or data.empty:
+            return {}
+
+        result = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            frame = frame.reindex(columns=PRICE_COLUMNS + ACTION_COLUMNS).dropna(subset=["Close"])
+            if not frame.empty:
+                result[symbol] = frame
+        return result
+
+
+class FakeFetcher(PriceFetcher):
+    """
+    Offline fetcher for tests and benchmarks
+    Serves the given frames (which may carry ACTION_COLUMNS), or a deterministic random walk
+    per symbol when none is given.
+    `calls` records every (symbols, start, end) request so callers can check what was fetched.
+    """
+
+    def __init__(self, frames: Optional[Dict[str, pd.DataFrame]] = None, seed: int = 0):
+        self.frames = frames or {}
+        self.seed = seed
+        self.calls = []
+
+    def _synthetic(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        # Fixed origin so overlapping requests see the same prices for the same days
+        dates = pd.bdate_range("2000-01-03", end - pd.Timedelta(days=1), name="Date")
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()) + self.seed)
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, len(dates))))
+        frame = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99,
+                              "Close": close, "Volume": 1_000_000.0}, index=dates)
+        return frame.loc[frame.index >= start]
+
+    def fetch(self, symbols: List[str], start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        self.calls.append((list(symbols), start, end))
+        result = {}
+        for symbol in symbols:
+            if symbol in self.frames:
+                frame = self.frames[symbol]
+                frame = frame.loc[(frame.index >= start) & (frame.index < end)]
+            else:
+                frame = self._synthetic(symbol, start, end)
+            if not frame.empty:
+                result[symbol] = frame
+        return result
+
+
+class PriceCache:
+    """SQLite-backed store of daily price history with incremental refresh"""
+
+    def __init__(self, db_path: str = "data/price_cache.db", fetcher: Optional[PriceFetcher] = None,
+                 refresh_seconds: float = 15 * 60):
+        """Open (or create) the price store"""
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self.fetcher = fetcher or YahooFetcher()
+        self.refresh_seconds = refresh_seconds
+
+        # One connection shared by every Streamlit session thread, guarded by a lock that is
+        # never held across a download
+        self._lock = threading.RLock()
+        # symbol -> event set when the download in progress for it is stored
+        self._in_flight = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the price tables if they don't exist"""
+        with self._lock:
+            # Stores from before corporate actions were tracked hold prices adjusted as of their
+            # fetch date, which cannot be mixed with unadjusted rows: start them over
+            tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "prices" in tables and "corporate_actions" not in tables:
+                self.conn.execute("DELETE FROM prices")
+                self.conn.execute("DELETE FROM price_coverage")
+
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS prices (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (symbol, date)
+            ) WITHOUT ROWID
+            ''')
+
+            # What range has been requested for each symbol and when it was last topped up
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_coverage (
+                symbol TEXT PRIMARY KEY,
+                first_date TEXT NOT NULL,
+                last_date TEXT,
+                fetched_at REAL NOT NULL
+            )
+            ''')
+
+            # Splits and dividends by ex-date, unadjusted; the factors multiply prices on days
+            # before `date` and already include every later action
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS corporate_actions (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                split REAL NOT NULL DEFAULT 1,
+                dividend REAL NOT NULL DEFAULT 0,
+                split_factor REAL NOT NULL DEFAULT 1,
+                total_factor REAL NOT NULL DEFAULT 1,
+                PRIMARY KEY (symbol, date)
+            ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+
+    def close(self):
+        """Close the database connection"""
+        if self.conn:
+            self.conn.close()
+
+    def _split_multipliers(self, symbol: str, dates: pd.DatetimeIndex) -> np.ndarray:
+        """Product of the stored split ratios after each date (1 where no split follows)"""
+        rows = self.conn.execute(
+            "SELECT date, split FROM corporate_actions WHERE symbol = ? AND split != 1 ORDER BY date", (symbol,)
+        ).fetchall()
+        if not rows:
+            return np.ones(len(dates))
+        split_dates = pd.DatetimeIndex([row[0] for row in rows]).values
+        # Entry i is the product of the ratios from the i-th split on; days after every split get 1
+        suffix = np.append(np.cumprod([row[1] for row in rows][::-1])[::-1], 1.0)
+        return suffix[np.searchsorted(split_dates, dates.values, side="right")]
+
+    def _store_actions(self, symbol: str, frame: pd.DataFrame):
+        """Upsert the splits and dividends found in a fetched frame, as unadjusted amounts"""
+        splits = frame["Stock Splits"].fillna(0) if "Stock Splits" in frame else pd.Series(dtype=float)
+        splits = splits[(splits > 0) & (splits != 1)]
+        self.conn.executemany(
+            "INSERT INTO corporate_actions (symbol, date, split) VALUES (?, ?, ?) "
+            "ON CONFLICT (symbol, date) DO UPDATE SET split = excluded.split",
+            [(symbol, date.strftime("%Y-%m-%d"), float(ratio)) for date, ratio in splits.items()]
+        )
+
+        # Dividends come in the same share basis as the prices; splits are stored first so this undoes them too
+        dividends = frame["Dividends"].fillna(0) if "Dividends" in frame else pd.Series(dtype=float)
+        dividends = dividends[dividends > 0]
+        if not dividends.empty:
+            amounts = dividends.to_numpy(dtype=float) * self._split_multipliers(symbol, dividends.index)
+            self.conn.executemany(
+                "INSERT INTO corporate_actions (symbol, date, dividend) VALUES (?, ?, ?) "
+                "ON CONFLICT (symbol, date) DO UPDATE SET dividend = excluded.dividend",
+                [(symbol, date.strftime("%Y-%m-%d"), float(amount)) for date, amount in zip(dividends.index, amounts)]
+            )
+
+    def _update_factors(self, symbol: str):
+        """
+        Recompute a symbol's cumulative adjustment factors from its action rows
+        Each dividend scales earlier prices by (1 - dividend / previous close), each split by 1 / ratio.
+        """
+        rows = self.conn.execute('''
+            SELECT a.date, a.split, a.dividend,
+                   (SELECT p.close FROM prices p WHERE p.symbol = a.symbol AND p.date < a.date
+                    ORDER BY p.date DESC LIMIT 1)
+            FROM corporate_actions a WHERE a.symbol = ? ORDER BY a.date
+        ''', (symbol,)).fetchall()
+        if not rows:
+            return
+
+        split_step = 1 / np.array([row[1] for row in rows], dtype=float)
+        dividend = np.array([row[2] for row in rows], dtype=float)
+        previous = np.array([row[3] or 0 for row in rows], dtype=float)
+        # A dividend before the first stored close counts once that close is fetched
+        dividend_step = np.divide(dividend, previous, out=np.zeros(len(rows)), where=previous > 0)
+        split_factor = np.cumprod(split_step[::-1])[::-1]
+        total_factor = np.cumprod((split_step * (1 - dividend_step))[::-1])[::-1]
+        self.conn.executemany(
+            "UPDATE corporate_actions SET split_factor = ?, total_factor = ? WHERE symbol = ? AND date = ?",
+            [(float(split), float(total), symbol, row[0]) for split, total, row in zip(split_factor, total_factor, rows)]
+        )
+
+    def _store(self, symbol: str, frame: pd.DataFrame):
+        """Upsert fetched bars for a symbol, undoing the splits after each day"""
+        multipliers = self._split_multipliers(symbol, frame.index)
+        values = frame[PRICE_COLUMNS].to_numpy(dtype=float, copy=True)
+        values[:, :4] *= multipliers[:, None]
+        values[:, 4] /= multipliers
+        rows = [
+            (symbol, date.strftime("%Y-%m-%d"), *(None if np.isnan(v) else float(v) for v in row))
+            for date, row in zip(frame.index, values.tolist())
+        ]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO prices (symbol, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    @metrics.timed("price_cache.fetch")
+    def _fetch(self, symbols: List[str], start: pd.Timestamp, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        """Fetch [start, end) for several symbols in one call (no lock held, so it can be slow)"""
+        frames = self.fetcher.fetch(list(symbols), start, end)
+        metrics.increment("price_fetch_calls")
+        return frames
+
+    def _store_frames(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.Timestamp]:
+        """Store fetched frames and return each symbol's last date (caller holds the lock and commits)"""
+        last_dates = {}
+        for symbol, frame in frames.items():
+            if frame is None or frame.empty:
+                continue
+            frame = frame.copy()
+            frame.index = pd.to_datetime(frame.index).tz_localize(None).normalize()
+            self._store_actions(symbol, frame)
+            self._store(symbol, frame)
+            self._update_factors(symbol)
+            if metrics.enabled():
+                metrics.increment("price_fetch_rows", len(frame))
+                metrics.increment("price_fetch_bytes", int(frame.memory_usage(index=True).sum()))
+            last_dates[symbol] = frame.index.max()
+        return last_dates
+
+    def _plan(self, symbols: List[str], start: pd.Timestamp):
+        """
+        The gaps to fetch for these symbols and the coverage to record once they are stored
+        Returns ({(gap start, gap end): symbols}, {symbol: [first date, last date, fetched at]}).
+        """
+        tomorrow = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+        now = time.time()
+
+        coverage = {}
+        gaps = {}  # (gap start, gap end) -> symbols missing that range
+        for symbol in symbols:
+            row = self.conn.execute(
+                "SELECT first_date, last_date, fetched_at FROM price_coverage WHERE symbol = ?", (symbol,)
+            ).fetchone()
+
+            if row is None:
+                coverage[symbol] = [start, None, now]
+                gaps.setdefault((start, tomorrow), []).append(symbol)
+                continue
+
+            first_date = pd.Timestamp(row[0])
+            last_date = pd.Timestamp(row[1]) if row[1] else None
+            fetched_at = row[2]
+
+            # Head gap: caller wants history from before anything we have
+            if start < first_date:
+                gaps.setdefault((start, first_date), []).append(symbol)
+                coverage[symbol] = [start, last_date, fetched_at]
+
+            # Tail gap: re-fetch from the last stored day, which may have been a partial session
+            if now - fetched_at >= self.refresh_seconds:
+                tail_start = last_date if last_date is not None else first_date
+                gaps.setdefault((tail_start, tomorrow), []).append(symbol)
+                coverage[symbol] = [min(start, first_date), last_date, now]
+        return gaps, coverage
+
+    def _ensure(self, symbols: List[str], start: pd.Timestamp):
+        """
+        Make sure the store covers [start, today] for every symbol, fetching only the gaps
+        Gaps that share the same date range are fetched together in one batched call. The gaps
+        are found and stored under the lock but downloaded without it, so sessions reading cached
+        symbols don't wait on the network; a symbol another thread is already downloading is
+        waited for instead of fetched twice. Must be called without holding the lock.
+        """
+        while True:
+            with self._lock:
+                busy = [self._in_flight[symbol] for symbol in symbols if symbol in self._in_flight]
+                if not busy:
+                    gaps, coverage = self._plan(symbols, start)
+                    claimed = {symbol: threading.Event() for symbol in coverage}
+                    self._in_flight.update(claimed)
+                    break
+            for event in busy:
+                event.wait()
+
+        try:
+            # Newest gaps first, so every split up to today is known before older days are stored
+            for (gap_start, gap_end), gap_symbols in sorted(gaps.items(), key=lambda gap: gap[0][0], reverse=True):
+                frames = self._fetch(gap_symbols, gap_start, gap_end)
+                with self._lock:
+                    for symbol, last in self._store_frames(frames).items():
+                        if coverage[symbol][1] is None or last > coverage[symbol][1]:
+                            coverage[symbol][1] = last
+                    self.conn.commit()
+
+            with self._lock:
+                for symbol, (first_date, last_date, fetched_at) in coverage.items():
+                    self._set_coverage(symbol, first_date, last_date, fetched_at)
+                self.conn.commit()
+        finally:
+            with self._lock:
+                for symbol, event in claimed.items():
+                    del self._in_flight[symbol]
+                    event.set()
+
+    def _set_coverage(self, symbol: str, first_date: pd.Timestamp, last_date: Optional[pd.Timestamp], fetched_at: float):
+        """Record what range is stored for a symbol"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO price_coverage (symbol, first_date, last_date, fetched_at) VALUES (?, ?, ?, ?)",
+            (symbol, first_date.strftime("%Y-%m-%d"),
+             last_date.strftime("%Y-%m-%d") if last_date is not None else None, fetched_at)
+        )
+
+    def _action_factors(self, symbols: List[str], adjust: Optional[str]) -> Dict[str, tuple]:
+        """{symbol: (action dates, cumulative factors)} for the symbols that have actions"""
+        if adjust not in ADJUSTMENTS:
+            raise ValueError(f"Unknown price adjustment: {adjust}")
+        if adjust is None or not symbols:
+            return {}
+        column = "split_factor" if adjust == "split" else "total_factor"
+        rows = self.conn.execute(
+            f"SELECT symbol, date, {column} FROM corporate_actions WHERE symbol IN ({', '.join('?' * len(symbols))}) "
+            "ORDER BY symbol, date", symbols
+        ).fetchall()
+        actions = {}
+        for symbol, date, factor in rows:
+            actions.setdefault(symbol, ([], []))
+            actions[symbol][0].append(date)
+            actions[symbol][1].append(factor)
+        return {symbol: (pd.DatetimeIndex(dates).values, np.append(factors, 1.0))
+                for symbol, (dates, factors) in actions.items()}
+
+    @staticmethod
+    def _factors_on(actions: tuple, dates: pd.DatetimeIndex) -> np.ndarray:
+        """Each date's factor: the one stored on the first action after it (1 after the last action)"""
+        action_dates, factors = actions
+        return factors[np.searchsorted(action_dates, dates.values, side="right")]
+
+    def _read(self, symbol: str, start: pd.Timestamp, end: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """Read stored bars for a symbol in [start, end)"""
+        query = "SELECT date, open, high, low, close, volume FROM prices WHERE symbol = ? AND date >= ?"
+        params = [symbol, start.strftime("%Y-%m-%d")]
+        if end is not None:
+            query += " AND date < ?"
+            params.append(end.strftime("%Y-%m-%d"))
+        rows = self.conn.execute(query + " ORDER BY date", params).fetchall()
+
+        if not rows:
+            return _empty_history()
+        frame = pd.DataFrame(rows, columns=["Date"] + PRICE_COLUMNS)
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame.set_index("Date")
+
+    def get_history(self, symbol: str, start, end=None, adjust: Optional[str] = "split") -> pd.DataFrame:
+        """
+        Daily bars for a symbol from start up to (but not including) end
+        Only the days missing from the store are fetched. `adjust` is one of ADJUSTMENTS.
+        """
+        symbol = str(symbol).upper()
+        start = pd.to_datetime(start).normalize()
+        end = pd.to_datetime(end).normalize() if end is not None else None
+
+        self._ensure([symbol], start)
+        with self._lock:
+            frame = self._read(symbol, start, end)
+            actions = self._action_factors([symbol], adjust)
+
+        if symbol in actions and not frame.empty:
+            factors = self._factors_on(actions[symbol], frame.index)
+            frame[["Open", "High", "Low", "Close"]] = frame[["Open", "High", "Low", "Close"]].mul(factors, axis=0)
+            frame["Volume"] = frame["Volume"] / factors
+        return frame
+
+    def get_closes(self, symbols: List[str], start, end=None, adjust: Optional[str] = "split") -> pd.DataFrame:
+        """
+        Wide frame of closing prices, one column per symbol, on the union of their trading days
+        Missing days for all symbols are fetched in batched calls rather than one per symbol.
+        Days where a symbol did not trade are NaN. `adjust` is one of ADJUSTMENTS.
+        """
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in symbols))
+        start = pd.to_datetime(start).normalize()
+        end = pd.to_datetime(end).normalize() if end is not None else None
+
+        self._ensure(symbols, start)
+        with self._lock:
+            query = ("SELECT date, symbol, close FROM prices WHERE symbol IN ({}) AND date >= ?"
+                     .format(", ".join("?" * len(symbols))))
+            params = symbols + [start.strftime("%Y-%m-%d")]
+            if end is not None:
+                query += " AND date < ?"
+                params.append(end.strftime("%Y-%m-%d"))
+            rows = self.conn.execute(query, params).fetchall()
+            actions = self._action_factors(symbols, adjust)
+
+        long = pd.DataFrame(rows, columns=["Date", "Symbol", "Close"])
+        wide = long.pivot(index="Date", columns="Symbol", values="Close").reindex(columns=symbols)
+        wide.index = pd.DatetimeIndex(pd.to_datetime(wide.index), name="Date")
+        wide.columns.name = None
+        wide = wide.sort_index()
+
+        if actions:
+            # One factor per (day, symbol), applied in a single multiply
+            factors = np.ones(wide.shape)
+            for column, symbol in enumerate(wide.columns):
+                if symbol in actions:
+                    factors[:, column] = self._factors_on(actions[symbol], wide.index)
+            wide = wide * factors
+        return wide
+
+    def ensure(self, symbols: List[str], start):
+        """Fetch whatever the store is missing for these symbols from start to today, without reading it"""
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in symbols))
+        self._ensure(symbols, pd.to_datetime(start).normalize())
+
+    def actions(self, symbol: str) -> pd.DataFrame:
+        """A symbol's stored splits and dividends (unadjusted) with their cumulative factors, by ex-date"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT date, split, dividend, split_factor, total_factor FROM corporate_actions "
+                "WHERE symbol = ? ORDER BY date", (str(symbol).upper(),)
+            ).fetchall()
+        frame = pd.DataFrame(rows, columns=["Date", "Split", "Dividend", "Split Factor", "Total Factor"])
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame.set_index("Date")
+
+    def version(self, symbols: List[str]):
+        """
+        Cheap marker that changes whenever stored prices for these symbols change
+        (latest stored date, last top-up time); nothing is fetched.
+        """
+        symbols = [str(symbol).upper() for symbol in symbols]
+        if not symbols:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(last_date), MAX(fetched_at), COUNT(*) FROM price_coverage WHERE symbol IN ({})"
+                .format(", ".join("?" * len(symbols))), symbols
+            ).fetchone()
+        # Symbols that were never fetched have no version yet
+        if row[2] < len(set(symbols)):
+            return None
+        return (row[0], row[1])
+
+    def symbol_versions(self, symbols: List[str]) -> Dict[str, Optional[tuple]]:
+        """Each symbol's own version (see version), None for a symbol never fetched; nothing is fetched"""
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in symbols))
+        if not symbols:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT symbol, last_date, fetched_at FROM price_coverage WHERE symbol IN ({})"
+                .format(", ".join("?" * len(symbols))), symbols
+            ).fetchall()
+        stored = {symbol: (last_date, fetched_at) for symbol, last_date, fetched_at in rows}
+        return {symbol: stored.get(symbol) for symbol in symbols}
+
+    def latest_date(self, symbols: List[str], before=None) -> Optional[pd.Timestamp]:
+        """Latest day any of these symbols has a stored close (before `before` if given); nothing is fetched"""
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in symbols))
+        if not symbols:
+            return None
+        query = "SELECT MAX(date) FROM prices WHERE symbol IN ({})".format(", ".join("?" * len(symbols)))
+        params = list(symbols)
+        if before is not None:
+            query += " AND date < ?"
+            params.append(pd.Timestamp(before).strftime("%Y-%m-%d"))
+        with self._lock:
+            row = self.conn.execute(query, params).fetchone()
+        return pd.Timestamp(row[0]) if row[0] else None
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Forget cached history for one symbol, or for all symbols"""
+        with self._lock:
+            if symbol is None:
+                self.conn.execute("DELETE FROM prices")
+                self.conn.execute("DELETE FROM price_coverage")
+                self.conn.execute("DELETE FROM corporate_actions")
+            else:
+                symbol = symbol.upper()
+                self.conn.execute("DELETE FROM prices WHERE symbol = ?", (symbol,))
+                self.conn.execute("DELETE FROM price_coverage WHERE symbol = ?", (symbol,))
+                self.conn.execute("DELETE FROM corporate_actions WHERE symbol = ?", (symbol,))
+            self.conn.commit()
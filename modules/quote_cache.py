@@ -0,0 +1,141 @@
+"""
+quote_cache holds the latest price per symbol for the whole process, shared by every session
+entries expire after a per-symbol TTL; concurrent misses for the same symbol are
+collapsed into a single fetch (single-flight) and hit/miss counters are kept for monitoring
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class _Flight:
+    """A fetch in progress that other callers can wait on"""
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class QuoteCache:
+    """Thread-safe latest-price cache with per-symbol TTL and single-flight loading"""
+
+    def __init__(self, loader: Callable[[List[str]], Dict[str, float]], ttl_seconds: float = 60,
+                 ttl_overrides: Optional[Dict[str, float]] = None):
+        """
+        loader receives a list of symbols and returns {symbol: price}; symbols it leaves out
+        are cached as having no quote until their TTL runs out
+        """
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.ttl_overrides = {symbol.upper(): ttl for symbol, ttl in (ttl_overrides or {}).items()}
+
+        self._quotes = {}    # symbol -> (price or None, stored at)
+        self._inflight = {}  # symbol -> _Flight
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+
+    def ttl_for(self, symbol: str) -> float:
+        return self.ttl_overrides.get(symbol, self.ttl_seconds)
+
+    def set_ttl(self, symbol: str, ttl_seconds: float):
+        self.ttl_overrides[symbol.upper()] = ttl_seconds
+
+    def _fresh(self, symbol: str, now: float) -> bool:
+        entry = self._quotes.get(symbol)
+        return entry is not None and now - entry[1] < self.ttl_for(symbol)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        Latest price for each symbol (None when the source has none)
+        Expired or missing symbols are loaded in one batched loader call; symbols another
+        thread is already loading are waited on instead of fetched again.
+        """
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in symbols))
+        result = {}
+        leading = {}
+        waiting = {}
+
+        with self._lock:
+            now = time.time()
+            for symbol in symbols:
+                if self._fresh(symbol, now):
+                    result[symbol] = self._quotes[symbol][0]
+                    self.hits += 1
+                    continue
+                self.misses += 1
+                flight = self._inflight.get(symbol)
+                if flight is None:
+                    leading[symbol] = self._inflight[symbol] = _Flight()
+                else:
+                    waiting[symbol] = flight
+                    self.coalesced += 1
+
+        if leading:
+            error = None
+            loaded = {}
+            try:
+                loaded = {str(symbol).upper(): price for symbol, price in self.loader(list(leading)).items()}
+            except Exception as e:
+                error = e
+
+            with self._lock:
+                self.loads += 1
+                stored_at = time.time()
+                for symbol, flight in leading.items():
+                    if error is None:
+                        price = loaded.get(symbol)
+                        self._quotes[symbol] = (float(price) if price is not None else None, stored_at)
+                        result[symbol] = self._quotes[symbol][0]
+                    del self._inflight[symbol]
+                    flight.error = error
+                    flight.done.set()
+            if error is not None:
+                raise error
+
+        for symbol, flight in waiting.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            result[symbol] = self._quotes.get(symbol, (None, 0))[0]
+
+        return result
+
+    def get(self, symbol: str) -> Optional[float]:
+        """Latest price for one symbol"""
+        return self.get_many([symbol])[str(symbol).upper()]
+
+    def peek(self, symbol: str) -> Optional[float]:
+        """Last stored price, however old, without ever fetching"""
+        entry = self._quotes.get(str(symbol).upper())
+        return entry[0] if entry is not None else None
+
+    def put(self, symbol: str, price: Optional[float], stored_at: Optional[float] = None):
+        """Publish a price fetched elsewhere"""
+        with self._lock:
+            self._quotes[str(symbol).upper()] = (float(price) if price is not None else None,
+                                                 stored_at if stored_at is not None else time.time())
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Expire one symbol, or everything"""
+        with self._lock:
+            if symbol is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(str(symbol).upper(), None)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "symbols": len(self._quotes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
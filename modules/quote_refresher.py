@@ -0,0 +1,115 @@
+"""
+quote_refresher keeps the shared quote cache warm from a background thread
+it refreshes the union of every session's held symbols on an interval, fanning the
+requests out over a bounded thread pool, so page renders only read cached quotes
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+from modules.quote_cache import QuoteCache
+
+
+class QuoteRefresher:
+    """Background scheduler that publishes fresh quotes into a QuoteCache"""
+
+    def __init__(self, quote_cache: QuoteCache, fetch_quotes: Callable[[List[str]], Dict[str, float]],
+                 interval_seconds: float = 60, max_concurrency: int = 8, batch_size: int = 25):
+        """
+        fetch_quotes takes a batch of symbols and returns {symbol: price}; pass a
+        FakeFetcher().fetch_quotes to run offline
+        """
+        self.quote_cache = quote_cache
+        self.fetch_quotes = fetch_quotes
+        self.interval_seconds = interval_seconds
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+
+        self._symbols = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_duration = None
+
+    def watch(self, symbols: Iterable[str]):
+        """Add symbols to the refreshed set; new ones trigger an early refresh"""
+        symbols = {str(symbol).upper() for symbol in symbols}
+        with self._lock:
+            new = symbols - self._symbols
+            self._symbols |= new
+        if new:
+            self._wake.set()
+
+    def unwatch(self, symbols: Iterable[str]):
+        """Stop refreshing symbols"""
+        with self._lock:
+            self._symbols -= {str(symbol).upper() for symbol in symbols}
+
+    @property
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return sorted(self._symbols)
+
+    def refresh_once(self) -> Dict[str, float]:
+        """Fetch every watched symbol concurrently in batches and publish the results"""
+        symbols = self.symbols
+        if not symbols:
+            return {}
+
+        started = time.time()
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        refreshed = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches)),
+                                thread_name_prefix="quote-fetch") as pool:
+            futures = [pool.submit(self.fetch_quotes, batch) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    quotes = future.result()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error refreshing quotes: {str(e)}")
+                    continue
+                for symbol, price in quotes.items():
+                    self.quote_cache.put(symbol, price)
+                    refreshed[str(symbol).upper()] = price
+
+        self.runs += 1
+        self.last_run = started
+        self.last_duration = time.time() - started
+        return refreshed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in quote refresher: {str(e)}")
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+
+    def start(self):
+        """Start the background thread (no-op if it is already running)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quote-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the thread to exit and wait for it"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -2,53 +2,177 @@
 rebalance gets price from start date compared to price now
 it also tracks each quarter after start date as 9 sig aims to gain 9% per quarter 
 """
+import calendar
+import datetime
+import functools
+import numpy as np
 import pandas as pd
 
+# Steps after which a start's clamped day stops changing: every month it can pass (3 apart) has been
+# passed by then, February of a non-leap year included, since two consecutive years can't both be leap
+_DRIFT_STEPS = 8
 
-#determine how many quarter have passed since start date
-def get_quarters(start_date):
-    #get current date
-    current_date = pd.to_datetime("today")
-    #get difference in days
-    days = (current_date - start_date).days
-    return days // 90
 
+def _month_parts(dates):
+    """Split dates into (month, day of month) numpy arrays"""
+    days = pd.DatetimeIndex(pd.to_datetime(dates)).values.astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    day_of_month = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+    return months, day_of_month
 
-def get_next_quarter(start_date):
-    # Convert input to datetime if not already
-    start_date = pd.to_datetime(start_date)
 
-    # Get today's date
-    today = pd.to_datetime("today").normalize()
+def _month_length(month_index: int) -> int:
+    """Number of days in a month counted from January of year 0"""
+    return calendar.monthrange(month_index // 12, month_index % 12 + 1)[1]
+
+
+def _month_lengths(months):
+    """Number of days in each month"""
+    return ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+
+
+def _quarter_dates(months, day_of_month, k):
+    """
+    The k-th quarter boundary of each start, as reached by adding pd.DateOffset(months=3) k times
+    Every step clamps to the end of a shorter month and the shortened day carries into later
+    steps (a 31 Jan start gives 30 Apr, 30 Jul, 30 Oct...), so the day is the start's day capped
+    by the shortest month passed so far. That stops changing after _DRIFT_STEPS steps, so only
+    those are looked at, whatever k is. k = -1 is one step back from the start.
+    """
+    months, day_of_month, k = np.broadcast_arrays(months, day_of_month, np.asarray(k, dtype=np.int64))
+    passed = _month_lengths(months[..., None] + 3 * np.arange(1, _DRIFT_STEPS + 1))
+    shortest = np.minimum.accumulate(passed, axis=-1)
+    reached = np.take_along_axis(shortest, np.clip(k - 1, 0, _DRIFT_STEPS - 1)[..., None], axis=-1)[..., 0]
+    day = np.where(k >= 1, np.minimum(day_of_month, reached), day_of_month)
+    target = months + 3 * k
+    day = np.where(k < 0, np.minimum(day, _month_lengths(target)), day)
+    return target.astype("datetime64[D]") + (day - 1)
+
+
+def _quarter_position(months, day_of_month, today):
+    """
+    Index k of the latest boundary start + 3k months on or before today (-1 if not started yet)
+    Closed form: count whole months, then step back one quarter if that boundary is still ahead.
+    """
+    today = np.datetime64(pd.Timestamp(today).normalize().date(), "D")
+    k = (today.astype("datetime64[M]") - months).astype(np.int64) // 3
+    k = np.where(_quarter_dates(months, day_of_month, k) > today, k - 1, k)
+    return np.maximum(k, -1)
+
+
+class QuarterSchedule:
+    """
+    Quarter boundaries for one strategy start date: the start, then 3 months at a time
+    Dates match stepping with pd.DateOffset(months=3), including its month-end drift. Single
+    lookups use plain integer month arithmetic; the day reached after each of the first
+    _DRIFT_STEPS steps is worked out once here.
+    """
+
+    def __init__(self, start_date):
+        self.start_date = pd.Timestamp(start_date).normalize()
+        # Months since year 0, and the clamped day after 0, 1, ..., _DRIFT_STEPS steps
+        self._month_index = self.start_date.year * 12 + self.start_date.month - 1
+        self._month = np.datetime64(self._month_index - 1970 * 12, "M")
+        self._day = self.start_date.day
+        self._days = [self.start_date.day]
+        for step in range(1, _DRIFT_STEPS + 1):
+            self._days.append(min(self._days[-1], _month_length(self._month_index + 3 * step)))
+
+    def _date(self, k: int) -> datetime.date:
+        month_index = self._month_index + 3 * k
+        if k >= 0:
+            day = self._days[min(k, _DRIFT_STEPS)]
+        else:
+            day = min(self._days[0], _month_length(month_index))
+        return datetime.date(month_index // 12, month_index % 12 + 1, day)
+
+    def boundary(self, k) -> pd.Timestamp:
+        """The k-th boundary (0 is the start date)"""
+        return pd.Timestamp(self._date(int(k)))
+
+    def _position(self, today=None) -> int:
+        today = datetime.date.today() if today is None else pd.Timestamp(today).date()
+        k = (today.year * 12 + today.month - 1 - self._month_index) // 3
+        if self._date(k) > today:
+            k -= 1
+        return max(k, -1)
+
+    def elapsed(self, today=None) -> int:
+        """Number of quarters completed since the start date"""
+        return max(self._position(today), 0)
+
+    def next_boundary(self, today=None) -> pd.Timestamp:
+        """First boundary after today (the start date itself if it is still ahead)"""
+        return self.boundary(max(self._position(today) + 1, 0))
+
+    def previous_boundary(self, today=None) -> pd.Timestamp:
+        """Boundary one quarter before next_boundary"""
+        return self.boundary(self._position(today))
+
+    def boundaries(self, until=None) -> pd.DatetimeIndex:
+        """Every boundary from the start date up to and including `until` (default today)"""
+        last = self._position(until)
+        return pd.DatetimeIndex(_quarter_dates(self._month, self._day, np.arange(last + 1)))
+
+    def trading_day_positions(self, trading_days: pd.DatetimeIndex) -> np.ndarray:
+        """Positions in `trading_days` of each boundary, snapped forward to the next trading day"""
+        if len(trading_days) == 0:
+            return np.array([], dtype=int)
+        idx = trading_days.searchsorted(self.boundaries(until=trading_days[-1]), side="left")
+        return np.unique(idx[idx < len(trading_days)])
+
+
+@functools.lru_cache(maxsize=1024)
+def get_schedule(start_date) -> QuarterSchedule:
+    """Quarter schedule for a start date, built once and reused across reruns"""
+    return QuarterSchedule(start_date)
+
+
+def quarter_status(start_dates, today=None) -> pd.DataFrame:
+    """
+    Elapsed quarters and previous/next boundaries for many start dates in one vectorized pass
+    Rows line up with `start_dates`.
+    """
+    months, day_of_month = _month_parts(start_dates)
+    k = _quarter_position(months, day_of_month, today if today is not None else pd.Timestamp.today())
+    return pd.DataFrame({
+        "start_date": months.astype("datetime64[D]") + (day_of_month - 1),
+        "elapsed": np.maximum(k, 0),
+        "previous_quarter": _quarter_dates(months, day_of_month, k),
+        "next_quarter": _quarter_dates(months, day_of_month, np.maximum(k + 1, 0)),
+    })
+
 
-    # Find the next quarter date from the start_date
-    next_quarter_date = start_date
+#determine how many quarter have passed since start date
+def get_quarters(start_date):
+    return get_schedule(pd.Timestamp(start_date).normalize()).elapsed()
 
-    # Keep adding 3 months (90 days approximation) until it's in the future
-    while next_quarter_date <= today:
-        next_quarter_date += pd.DateOffset(months=3)
 
-    return next_quarter_date.normalize()  # Normalize to remove time component
+def get_next_quarter(start_date):
+    # Closed-form lookup on the cached schedule instead of stepping 3 months at a time
+    return get_schedule(pd.Timestamp(start_date).normalize()).next_boundary()
 
-def get_previous_quarter(get_next_quarter):
-    #previous quarter = next quarter - 3 months 
-    return get_next_quarter - pd.DateOffset(months=3)
+def get_last_quarter(start_date):
+    # Boundary before get_next_quarter(start_date), from the same cached schedule; this replaces
+    # get_previous_quarter(next_quarter), which stepped back from the next date and lost month-end drift
+    return get_schedule(pd.Timestamp(start_date).normalize()).previous_boundary()
 
 
-def tqqq_quarterly_buy(current_shares, last_quarter_gain):
+def tqqq_quarterly_buy(current_shares, last_quarter_gain, target_rate=0.09):
     """
     Calculate how many TQQQ shares to buy to ensure a 9% increase in holdings.
 
     :param current_shares: Number of TQQQ shares currently owned
     :param last_quarter_gain: Percentage gain/loss last quarter (e.g., -5 for -5%, 10 for +10%)
+    :param target_rate: Quarterly growth target as a decimal (0.09 for the standard 9-Sig)
     :return: Shares to buy
     """
 
     # Convert gain percentage to decimal
     gain_decimal = last_quarter_gain / 100  
 
-    # Calculate new target shares (increase by 9%)
-    target_shares = current_shares * 1.09  
+    # Calculate new target shares (increase by the target rate, 9% by default)
+    target_shares = current_shares * (1 + target_rate)
 
     # Calculate current adjusted shares based on last quarter’s performance
     current_adjusted_shares = current_shares * (1 + gain_decimal)
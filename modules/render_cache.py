@@ -0,0 +1,170 @@
+"""
+render_cache keeps rendered chart images and interactive chart data so reruns that don't
+change the chart inputs (e.g. editing the cash balance) skip price loading and matplotlib entirely
+entries are keyed on (chart, holdings hash, start date, price version), or on a version the caller
+supplies (e.g. a user's stored snapshots), and evicted least-recently-used once the byte or entry
+cap is reached
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import config
+import modules.market_data
+import modules.metrics
+
+
+class RenderCache:
+    """Thread-safe LRU cache of image bytes with a total size cap"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return cached bytes and mark them recently used"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes):
+        """Store bytes, evicting the least recently used entries to stay under the caps"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-wide cache shared by every session
+_render_cache = RenderCache(config.RENDER_CACHE_MAX_BYTES, config.RENDER_CACHE_MAX_ENTRIES)
+modules.metrics.register_collector("render_cache", lambda: {
+    "hits": _render_cache.hits, "misses": _render_cache.misses,
+    "entries": len(_render_cache), "bytes": _render_cache.size_bytes,
+})
+
+
+def get_render_cache() -> RenderCache:
+    return _render_cache
+
+
+def holdings_hash(positions: Dict[str, Dict[str, Any]]) -> str:
+    """Hash of what the charts depend on: symbols and share counts"""
+    shares = sorted((str(symbol).upper(), float(details.get("Shares", 0) or 0)) for symbol, details in positions.items())
+    return hashlib.sha1(json.dumps(shares).encode()).hexdigest()
+
+
+@modules.metrics.timed("render_cache.figure_bytes")
+def figure_bytes(fig, fmt: str = "png", dpi: int = 100) -> bytes:
+    """Render a matplotlib figure to image bytes and close it"""
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _cached(name: str, fmt: str, positions: Dict[str, Dict[str, Any]], start_date,
+            produce: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+    """Bytes from produce(), served from the cache while holdings, start date and prices are unchanged"""
+    symbols = list(positions)
+    holdings = holdings_hash(positions)
+    start = str(start_date)
+    price_cache = modules.market_data.get_price_cache()
+
+    key = (name, fmt, holdings, start, price_cache.version(symbols))
+    data = _render_cache.get(key)
+    if data is not None:
+        return data
+
+    data = produce()
+    if data is None:
+        return None
+
+    # Key on the price version after the build, which may have fetched new days
+    _render_cache.put((name, fmt, holdings, start, price_cache.version(symbols)), data)
+    return data
+
+
+@modules.metrics.timed("render_cache.render_chart")
+def render_chart(name: str, build: Callable, positions: Dict[str, Dict[str, Any]], start_date,
+                 fmt: str = "png") -> Optional[bytes]:
+    """
+    Image bytes for build(positions, start_date), served from the cache when the inputs are unchanged
+    Returns None when build returns no figure.
+    """
+    def produce():
+        fig = build(positions, start_date)
+        return figure_bytes(fig, fmt) if fig is not None else None
+
+    return _cached(name, fmt, positions, start_date, produce)
+
+
+@modules.metrics.timed("render_cache.render_versioned")
+def render_versioned(name: str, build: Callable, version: Hashable, fmt: str = "png") -> Optional[bytes]:
+    """
+    Image bytes for build(), served from the cache while `version` is unchanged
+    For charts whose inputs aren't holdings and prices, e.g. modules.snapshots.history_version
+    of a stored value history. Returns None when build returns no figure.
+    """
+    key = (name, fmt, version)
+    data = _render_cache.get(key)
+    if data is not None:
+        return data
+
+    fig = build()
+    if fig is None:
+        return None
+    data = figure_bytes(fig, fmt)
+    _render_cache.put(key, data)
+    return data
+
+
+@modules.metrics.timed("render_cache.render_series")
+def render_series(name: str, build: Callable, version: Hashable) -> Optional[Dict]:
+    """
+    Chart data from build() (e.g. chart_data.value_history_series), cached as JSON bytes alongside
+    the images while `version` is unchanged, so every zoom level is computed once per change
+    """
+    key = (name, "json", version)
+    data = _render_cache.get(key)
+    if data is None:
+        payload = build()
+        if payload is None:
+            return None
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        _render_cache.put(key, data)
+    return json.loads(data)
@@ -0,0 +1,50 @@
+"""
+return_index answers "how much did this symbol move between two dates" without rereading prices
+each symbol's log closes are kept in an array aligned to its trading days, so the return over
+any range is two binary searches and a subtraction, and many ranges go through one vectorized call
+
+endpoints snap like a price window [start, end): the start moves forward to the first trading
+day on or after it, the end back to the last trading day before it
+"""
+import numpy as np
+import pandas as pd
+
+
+class ReturnIndex:
+    """Cumulative log returns of one close series on its trading days"""
+
+    def __init__(self, closes: pd.Series):
+        closes = closes.dropna()
+        closes = closes[closes > 0].sort_index()
+        self.dates = pd.DatetimeIndex(closes.index).values.astype("datetime64[D]")
+        # log(close) - log(first close); differences of it are log returns
+        self.cumulative = np.log(closes.to_numpy(dtype=float))
+        if len(self.cumulative):
+            self.cumulative -= self.cumulative[0]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def first_date(self):
+        return pd.Timestamp(self.dates[0]) if len(self.dates) else None
+
+    def positions(self, starts, ends):
+        """Trading-day positions of each range's snapped first and last day (first > last when empty)"""
+        starts = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(starts))).values.astype("datetime64[D]")
+        ends = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(ends))).values.astype("datetime64[D]")
+        first = np.searchsorted(self.dates, starts, side="left")
+        last = np.searchsorted(self.dates, ends, side="left") - 1
+        return first, last
+
+    def log_returns(self, starts, ends) -> np.ndarray:
+        """Log return over each [start, end) range, NaN where the range holds no trading day"""
+        first, last = self.positions(starts, ends)
+        valid = (first <= last) & (first < len(self.dates)) & (last >= 0)
+        result = np.full(len(first), np.nan)
+        result[valid] = self.cumulative[last[valid]] - self.cumulative[first[valid]]
+        return result
+
+    def range_returns(self, starts, ends) -> np.ndarray:
+        """Percentage change over each [start, end) range (e.g. 9.0 for +9%), NaN where empty"""
+        return np.expm1(self.log_returns(starts, ends)) * 100
@@ -0,0 +1,189 @@
+"""
+snapshots stores one valuation per user per trading day, so value charts read a stored series
+instead of revaluing the whole history from raw prices on every page load
+a day is stored once its session is over (before today) and is then kept as it was valued, so
+the series records the holdings and cash the user had on each day; each update only values the
+days after a user's last snapshot, plus the days before their first one when the start date
+moved earlier. A user's first update backfills from their start date with the current holdings
+and cash. PortfolioDB drops the days a portfolio change makes wrong (today on, or before a new
+start date)
+
+usage: python -m modules.snapshots --db data/portfolio_app.db   (e.g. nightly from cron)
+"""
+import argparse
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import modules.market_data
+import modules.metrics
+import modules.valuation
+from modules.database import PortfolioDB
+
+# How far before a user's first missing day to read closes, so the first day can be forward-filled
+_LOOKBACK = pd.Timedelta(days=10)
+
+
+def _snapshot_rows(username: str, portfolio: Dict, closes: pd.DataFrame, windows: List[tuple]):
+    """
+    (totals, positions) rows valuing one portfolio on every trading day in the [from, to) windows
+    A cash-only portfolio is a constant series over the days in `closes`.
+    """
+    holdings = portfolio["portfolio_data"] or {}
+    symbols = [symbol.upper() for symbol in holdings if symbol.upper() in closes.columns]
+    if holdings and not symbols:
+        return [], []
+
+    user_closes = closes[symbols].dropna(how="all") if symbols else closes[[]]
+    cash = float(portfolio["cash_balance"] or 0)
+    values = modules.valuation.value_positions(holdings, user_closes, cash)
+    wanted = np.zeros(len(values), dtype=bool)
+    for window_start, window_end in windows:
+        wanted |= (values.index >= window_start) & (values.index < window_end)
+    values = values.loc[wanted]
+    if values.empty:
+        return [], []
+
+    dates = values.index.strftime("%Y-%m-%d").tolist()
+    shares = modules.valuation.shares_vector(holdings, symbols)
+    totals = list(zip([username] * len(dates), dates, values["Total"].round(2).tolist(), [cash] * len(dates)))
+    positions = [
+        (username, date, symbol, float(count), value)
+        for symbol, count in zip(symbols, shares)
+        for date, value in zip(dates, values[symbol].round(2).tolist())
+    ]
+    return totals, positions
+
+
+def _missing_windows(portfolio: Dict, stored: Optional[tuple], today: pd.Timestamp) -> List[tuple]:
+    """[from, to) windows of days a user has no snapshot for, between their start date and today"""
+    start = pd.Timestamp(portfolio["start_date"] or "2024-01-01")
+    if stored is None:
+        return [(start, today)]
+    first, last = pd.Timestamp(stored[0]), pd.Timestamp(stored[1])
+    windows = [(start, first)] if start < first else []
+    return windows + [(last + pd.Timedelta(days=1), today)]
+
+
+@modules.metrics.timed("snapshots.update_snapshots")
+def update_snapshots(db: PortfolioDB, usernames: Optional[List[str]] = None, chunk_size: int = 500) -> int:
+    """
+    Store the missing daily snapshots for the given users (default: everyone)
+    Prices for every held symbol are read in one batched call per chunk of users. A missing window
+    is only valued once the price store has a close in it, so for users who are up to date nothing
+    is read beyond that check and nothing is written.
+    Returns the number of user-days written.
+    """
+    if usernames is None:
+        usernames = [user["username"] for user in db.get_all_users()]
+    today = pd.Timestamp.today().normalize()
+    cache = modules.market_data.get_price_cache()
+
+    written = 0
+    for i in range(0, len(usernames), chunk_size):
+        chunk = usernames[i:i + chunk_size]
+        portfolios = db.get_portfolios(chunk)
+        if not portfolios:
+            continue
+        stored = db.get_snapshot_ranges(list(portfolios))
+        windows = {username: _missing_windows(portfolio, stored.get(username), today)
+                   for username, portfolio in portfolios.items()}
+        symbols = sorted({symbol.upper() for portfolio in portfolios.values()
+                          for symbol in portfolio["portfolio_data"] or {}})
+        if symbols:
+            cache.ensure(symbols, min(window_start for user_windows in windows.values() for window_start, _ in user_windows))
+
+        def has_day(user_symbols, window_start, window_end):
+            # Cash-only users are valued on the chunk's trading days, or on weekdays without any
+            user_symbols = user_symbols or symbols
+            if not user_symbols:
+                return len(pd.bdate_range(window_start, window_end - pd.Timedelta(days=1))) > 0
+            latest = cache.latest_date(user_symbols, before=window_end)
+            return latest is not None and latest >= window_start
+
+        due = {}
+        for username, portfolio in portfolios.items():
+            user_symbols = [symbol.upper() for symbol in portfolio["portfolio_data"] or {}]
+            user_windows = [window for window in windows[username] if has_day(user_symbols, *window)]
+            if user_windows:
+                due[username] = user_windows
+        if not due:
+            continue
+
+        start = min(window_start for user_windows in due.values() for window_start, _ in user_windows) - _LOOKBACK
+        if symbols:
+            closes = modules.market_data.get_price_frame(symbols, start, today)
+        else:
+            # Only cash in this chunk; value it on weekdays
+            closes = pd.DataFrame(index=pd.bdate_range(start, today - pd.Timedelta(days=1), name="Date"))
+
+        totals, positions = [], []
+        for username, user_windows in due.items():
+            user_totals, user_positions = _snapshot_rows(username, portfolios[username], closes, user_windows)
+            totals += user_totals
+            positions += user_positions
+        db.save_snapshots(totals, positions)
+        written += len(totals)
+    return written
+
+
+def value_history(db: PortfolioDB, username: str, start_date=None, refresh: bool = True) -> pd.DataFrame:
+    """
+    A user's stored value history: one column per symbol plus "Cash" and "Total", indexed by date
+    With refresh, missing days are valued first; when the user is up to date that only checks the
+    price store and writes nothing.
+    """
+    if refresh:
+        # Buffered edits first, so new days are valued with them
+        db.flush(username)
+        update_snapshots(db, [username])
+
+    start = pd.Timestamp(start_date).strftime("%Y-%m-%d") if start_date is not None else None
+    snapshots = db.get_snapshots(username, start)
+    if not snapshots["totals"]:
+        return pd.DataFrame(columns=["Cash", "Total"], index=pd.DatetimeIndex([], name="Date"), dtype=float)
+
+    totals = pd.DataFrame(snapshots["totals"])
+    index = pd.DatetimeIndex(pd.to_datetime(totals["date"]), name="Date")
+    values = pd.DataFrame(index=index)
+    if snapshots["positions"]:
+        long = pd.DataFrame(snapshots["positions"])
+        wide = long.pivot(index="date", columns="symbol", values="value")
+        wide.index = pd.DatetimeIndex(pd.to_datetime(wide.index), name="Date")
+        wide.columns.name = None
+        # Symbols not held on a day have no row for it
+        values = wide.reindex(index).fillna(0.0)
+    values["Cash"] = totals["cash"].to_numpy(dtype=float)
+    values["Total"] = totals["total"].to_numpy(dtype=float)
+    return values
+
+
+def history_version(username: str, values: pd.DataFrame) -> tuple:
+    """
+    Cache key for charts of a value_history frame: the user, first and last day and day count
+    Stored days are only appended or dropped, never revalued, so these change whenever it does.
+    """
+    if values.empty:
+        return (username, None, None, 0)
+    return (username, values.index[0].strftime("%Y-%m-%d"), values.index[-1].strftime("%Y-%m-%d"), len(values))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Append missing daily valuation snapshots for every user")
+    parser.add_argument("--db", default="data/portfolio_app.db")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    db = PortfolioDB(args.db, write_behind_seconds=0)
+    try:
+        written = update_snapshots(db, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"{written} user-days written in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
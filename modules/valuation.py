@@ -0,0 +1,50 @@
+"""
+valuation turns a wide close-price frame and a set of holdings into a value history
+prices are aligned on the union of trading days and forward-filled, then valued
+with a single matrix product instead of a per-date, per-symbol loop
+"""
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+
+def shares_vector(positions: Dict[str, Dict[str, Any]], symbols: List[str]) -> np.ndarray:
+    """Share counts ordered like `symbols` (columns of the close frame)"""
+    shares = {symbol.upper(): float(details.get("Shares", 0) or 0) for symbol, details in positions.items()}
+    return np.array([shares.get(symbol, 0.0) for symbol in symbols], dtype=float)
+
+
+def align_closes(closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Carry each symbol's last close across days it did not trade
+    Days before a symbol's first close stay NaN and are valued at zero.
+    """
+    return closes.sort_index().ffill()
+
+
+def value_positions(positions: Dict[str, Dict[str, Any]], closes: pd.DataFrame,
+                    cash_balance: float = 0.0) -> pd.DataFrame:
+    """
+    Value holdings on every date of the close frame
+
+    Parameters:
+    - positions: {symbol: {"Shares": ..., "Average Cost": ...}}
+    - closes: wide close frame from market_data.get_price_frame
+    - cash_balance: constant cash added to the total
+
+    Returns:
+    - DataFrame with one value column per symbol, plus "Cash" and "Total"
+    """
+    aligned = align_closes(closes)
+    symbols = list(aligned.columns)
+    shares = shares_vector(positions, symbols)
+
+    prices = np.nan_to_num(aligned.to_numpy(dtype=float), nan=0.0)
+    per_symbol = prices * shares
+    total = prices @ shares + cash_balance
+
+    values = pd.DataFrame(per_symbol, index=aligned.index, columns=symbols)
+    values["Cash"] = float(cash_balance)
+    values["Total"] = total
+    return values
@@ -0,0 +1,31 @@
+import pytest
+
+import config
+import modules.market_data
+from modules.database import PortfolioDB
+from modules.price_cache import FakeFetcher, PriceCache
+
+
+@pytest.fixture
+def fetcher():
+    return FakeFetcher()
+
+
+@pytest.fixture
+def price_cache(tmp_path, monkeypatch, fetcher):
+    """Offline price store and close matrix, private to the test"""
+    monkeypatch.setattr(config, "CLOSE_MATRIX_PATH", str(tmp_path / "close_matrix"))
+    cache = PriceCache(str(tmp_path / "prices.db"), fetcher)
+    modules.market_data.set_price_cache(cache)
+    modules.market_data._return_indexes.clear()
+    yield cache
+    modules.market_data._return_indexes.clear()
+    modules.market_data.set_price_cache(None)
+    cache.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = PortfolioDB(str(tmp_path / "portfolio.db"), write_behind_seconds=0)
+    yield db
+    db.close()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import analytics
+
+
+@pytest.fixture
+def curves():
+    """Three random-walk equity curves and a benchmark on the same 400 days"""
+    rng = np.random.default_rng(1)
+    benchmark = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.012, 400)))
+    noise = rng.normal(0, 0.01, (400, 3))
+    returns = np.diff(np.log(benchmark))[:, None] * [0.5, 1.0, 2.0] + noise[1:]
+    values = 1000 * np.exp(np.vstack([np.zeros((1, 3)), np.cumsum(returns, axis=0)]))
+    return values, benchmark
+
+
+def test_drawdown_and_time_under_water():
+    metrics = analytics.risk_metrics(np.array([100, 120, 90, 110, 130, 100.0]))
+
+    assert metrics["max_drawdown_pct"] == pytest.approx(25.0)
+    assert metrics["current_drawdown_pct"] == pytest.approx(100 * (1 - 100 / 130))
+    assert metrics["longest_under_water_days"] == 2
+    assert metrics["current_under_water_days"] == 1
+
+
+def test_measures_match_pandas(curves):
+    values, benchmark = curves
+    window, rate = 63, 0.02
+
+    metrics = analytics.risk_metrics(values, benchmark, window=window, risk_free_rate=rate)
+
+    returns = pd.DataFrame(values).pct_change().iloc[1:]
+    excess = returns - rate / analytics.TRADING_DAYS
+    benchmark_returns = pd.Series(benchmark).pct_change().iloc[1:]
+    scale = np.sqrt(analytics.TRADING_DAYS)
+    assert np.allclose(metrics["volatility_pct"], returns.tail(window).std() * scale * 100)
+    assert np.allclose(metrics["sharpe"], excess.mean() / excess.std() * scale)
+    assert np.allclose(metrics["sortino"], excess.mean() / np.sqrt((excess.clip(upper=0) ** 2).mean()) * scale)
+    assert np.allclose(metrics["beta"], [returns[column].cov(benchmark_returns) / benchmark_returns.var()
+                                         for column in returns])
+    peaks = pd.DataFrame(values).cummax()
+    assert np.allclose(metrics["max_drawdown_pct"], ((1 - values / peaks).max() * 100))
+
+
+def test_batch_matches_single_curves(curves):
+    values, benchmark = curves
+
+    batch = analytics.risk_metrics(values, benchmark)
+
+    for column in range(values.shape[1]):
+        single = analytics.risk_metrics(values[:, column], benchmark)
+        assert list(single) == analytics.METRICS
+        for key in analytics.METRICS:
+            assert single[key] == pytest.approx(batch[key][column])
+
+
+def test_rolling_volatility_matches_pandas(curves):
+    values, _ = curves
+
+    rolling = analytics.rolling_volatility(values, window=20)
+
+    expected = pd.DataFrame(values).pct_change().iloc[1:].rolling(20).std().iloc[19:]
+    assert rolling.shape == expected.shape
+    assert np.allclose(rolling, expected.to_numpy() * np.sqrt(analytics.TRADING_DAYS) * 100)
+
+
+def test_missing_days_are_skipped():
+    values = np.array([100, 110, 0, 121, 133.1])
+
+    returns = analytics.daily_returns(values)
+
+    assert np.isnan(returns[1:3]).all()
+    assert analytics.risk_metrics(values)["max_drawdown_pct"] == 0
+
+
+def test_rolling_state_matches_a_recompute(curves):
+    values, benchmark = curves
+    state = analytics.RollingRisk.from_history(values[:100], benchmark[:100], window=30, risk_free_rate=0.01)
+
+    for day in range(100, len(values)):
+        state.update(values[day], benchmark[day])
+        if day % 47 == 0 or day == len(values) - 1:
+            expected = analytics.risk_metrics(values[:day + 1], benchmark[:day + 1], window=30, risk_free_rate=0.01)
+            for key in analytics.METRICS:
+                assert np.allclose(state.metrics()[key], expected[key]), key
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import modules.render_cache
+from modules import chart_data
+
+
+@pytest.fixture
+def values():
+    index = pd.bdate_range("2018-01-01", "2024-12-31", name="Date")
+    rng = np.random.default_rng(0)
+    total = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    return pd.DataFrame({"AAA": (total - 100).round(2), "Cash": 100.0, "Total": total.round(2)}, index=index)
+
+
+def test_lttb_keeps_the_ends_and_the_point_count(values):
+    y = values["Total"].to_numpy()
+    x = np.arange(len(y), dtype=float)
+
+    rows = chart_data.lttb_indices(x, y, 200)
+
+    assert len(rows) == 200
+    assert rows[0] == 0 and rows[-1] == len(y) - 1
+    assert np.all(np.diff(rows) > 0)
+
+
+def test_minmax_keeps_every_extreme(values):
+    y = values["Total"].to_numpy()
+
+    rows = chart_data.minmax_indices(y, 50)
+
+    assert y.argmax() in rows and y.argmin() in rows
+    assert len(rows) <= 2 * 50 + 2
+
+
+def test_zoom_levels_end_at_the_last_day(values):
+    levels = chart_data.zoom_levels(values, points=100)
+
+    assert list(levels) == ["1M", "3M", "1Y", "5Y", "All"]
+    for level, frame in levels.items():
+        assert frame.index[-1] == values.index[-1]
+        assert len(frame) <= 100
+    assert levels["All"].index[0] == values.index[0]
+    assert levels["1Y"].index[0] >= values.index[-1] - pd.DateOffset(years=1)
+
+
+def test_short_histories_only_get_the_windows_they_fill(values):
+    levels = chart_data.zoom_levels(values.iloc[-70:], points=100)
+
+    assert list(levels) == ["1M", "3M", "All"]
+    assert len(levels["All"]) == 70
+
+
+def test_compact_payload_round_trips(values):
+    frame = chart_data.downsample(values, 300)
+
+    restored = chart_data.expand(chart_data.compact(frame))
+
+    assert restored.index.equals(frame.index)
+    assert np.allclose(restored.to_numpy(), frame.to_numpy())
+
+
+def test_series_are_computed_once_per_version(values):
+    modules.render_cache.get_render_cache().clear()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return chart_data.value_history_series(values, points=100)
+
+    first = modules.render_cache.render_series("history", build, ("alice", 1))
+    again = modules.render_cache.render_series("history", build, ("alice", 1))
+    modules.render_cache.render_series("history", build, ("alice", 2))
+
+    assert len(calls) == 2
+    assert again == first
+    assert chart_data.expand(first["levels"]["All"]).index[-1] == values.index[-1]
+    modules.render_cache.get_render_cache().clear()
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+import modules.market_data
+from modules.close_matrix import CloseMatrix
+
+
+@pytest.fixture
+def reads(price_cache, monkeypatch):
+    """Symbols of each get_closes call the matrix makes on the store"""
+    calls = []
+    get_closes = price_cache.get_closes
+
+    def recording(symbols, *args, **kwargs):
+        calls.append(sorted(symbols))
+        return get_closes(symbols, *args, **kwargs)
+
+    monkeypatch.setattr(price_cache, "get_closes", recording)
+    return calls
+
+
+def test_new_symbols_are_added_as_columns(reads):
+    first = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+
+    second = modules.market_data.get_close_matrix(["CCC"], "2020-01-01")
+
+    assert first.symbols == ["AAA", "BBB"]
+    assert second.symbols == ["AAA", "BBB", "CCC"]
+    assert reads == [["AAA", "BBB"], ["CCC"]]
+
+
+def test_covered_requests_publish_nothing(reads):
+    matrix = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+    modules.market_data.get_close_matrix(["CCC"], "2020-01-01")
+    matrix = modules.market_data.get_close_matrix(["AAA"], "2020-01-01")
+    reads.clear()
+
+    for symbols, start in [(["AAA"], "2021-01-01"), (["CCC"], "2020-06-01"), (["BBB", "AAA", "CCC"], "2020-01-01")]:
+        assert modules.market_data.get_close_matrix(symbols, start).generation == matrix.generation
+
+    assert reads == []
+
+
+def test_earlier_start_rereads_only_that_column(reads):
+    both = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+
+    earlier = modules.market_data.get_close_matrix(["AAA"], "2019-01-01")
+
+    assert earlier.generation != both.generation
+    assert reads[-1] == ["AAA"]
+    assert earlier.starts[earlier.symbols.index("AAA")].strftime("%Y-%m-%d") == "2019-01-01"
+    assert earlier.starts[earlier.symbols.index("BBB")].strftime("%Y-%m-%d") == "2020-01-01"
+    assert earlier.frame(["BBB"], "2020-01-01").equals(both.frame(["BBB"], "2020-01-01"))
+
+
+def test_changed_prices_reread_only_their_column(price_cache, reads):
+    matrix = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+    assert matrix.matches(["AAA", "BBB"], "2020-01-01", price_cache.symbol_versions(["AAA", "BBB"]))
+
+    time.sleep(0.01)
+    price_cache.invalidate("AAA")
+    rebuilt = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+
+    assert rebuilt.generation != matrix.generation
+    assert reads[-1] == ["AAA"]
+    assert modules.market_data.get_close_matrix(["AAA"], "2020-01-01").generation == rebuilt.generation
+
+
+def test_matrices_published_by_another_process_are_reused(reads):
+    published = modules.market_data.get_close_matrix(["AAA", "BBB"], "2020-01-01")
+    # A process that hasn't mapped anything yet
+    modules.market_data._close_matrix = None
+    reads.clear()
+
+    matrix = modules.market_data.get_close_matrix(["BBB"], "2021-01-01")
+
+    assert matrix.generation == published.generation
+    assert CloseMatrix.latest(matrix.path).generation == published.generation
+    assert reads == []
+
+
+def test_price_frame_matches_the_store(price_cache):
+    modules.market_data.get_price_frame(["CCC"], "2019-01-01")
+
+    frame = modules.market_data.get_price_frame(["bbb", "AAA"], "2020-01-01", "2023-01-01")
+
+    assert frame.equals(price_cache.get_closes(["BBB", "AAA"], "2020-01-01", "2023-01-01"))
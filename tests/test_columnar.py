@@ -0,0 +1,79 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pytest
+
+from csvportion import parseCSVfile
+from csvportion.parseCSVfile import export_holdings, export_price_history, import_positions, read_price_history
+
+HOLDINGS = {"TQQQ": {"Average Cost": 20.0, "Shares": 10.0}, "AGG": {"Average Cost": 100.0, "Shares": 5.0}}
+
+
+def upload(data, name):
+    file = io.BytesIO(data)
+    file.name = name
+    return file
+
+
+@pytest.mark.parametrize("fmt, name", [("parquet", "holdings.parquet"), ("arrow", "holdings.arrow"),
+                                       ("arrow", "holdings.feather"), ("csv", "holdings.csv")])
+def test_exported_holdings_import_unchanged(fmt, name):
+    positions, report = import_positions(upload(export_holdings(HOLDINGS, fmt), name))
+
+    assert positions == HOLDINGS
+    assert report.rows_imported == 2
+
+
+def test_only_the_needed_columns_are_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(parseCSVfile, "CHUNK_ROWS", 2)
+    df = pd.DataFrame({"Account": ["A", "B", "C"], "Symbol": ["tqqq", "AGG", "TQQQ"],
+                       "Shares": [10.0, 5.0, 10.0], "Average Cost": [10.0, 100.0, 30.0]})
+    path = str(tmp_path / "holdings.parquet")
+    df.to_parquet(path)
+
+    chunks = list(parseCSVfile.read_chunks(path))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert all(list(chunk.columns) == parseCSVfile.REQUIRED_COLUMNS for chunk in chunks)
+    positions, _ = import_positions(path)
+    assert positions["TQQQ"] == {"Average Cost": 20.0, "Shares": 20.0}
+
+
+def test_arrow_streams_are_read_too():
+    table = pa.Table.from_pandas(pd.DataFrame({"Symbol": ["TQQQ"], "Shares": [10.0], "Average Cost": [20.0]}))
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    positions, _ = import_positions(upload(sink.getvalue(), "holdings.arrow"))
+
+    assert positions == {"TQQQ": {"Average Cost": 20.0, "Shares": 10.0}}
+
+
+def test_columnar_files_without_the_columns_are_rejected():
+    data = parseCSVfile.export_frame(pd.DataFrame({"Symbol": ["TQQQ"], "Shares": [10.0]}), "parquet")
+
+    with pytest.raises(ValueError, match="Average Cost"):
+        import_positions(upload(data, "holdings.parquet"))
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow", "csv"])
+def test_price_history_round_trips(tmp_path, fmt):
+    index = pd.bdate_range("2024-01-01", periods=50)
+    closes = pd.DataFrame({"TQQQ": np.linspace(20, 30, 50), "AGG": np.linspace(100, 101, 50)}, index=index)
+    path = tmp_path / f"prices.{fmt}"
+    path.write_bytes(export_price_history(closes, fmt))
+
+    restored = read_price_history(str(path))
+
+    assert list(restored.columns) == ["TQQQ", "AGG"]
+    assert (restored.index == index).all()
+    assert np.allclose(restored.to_numpy(), closes.to_numpy())
+
+
+def test_unknown_export_formats_are_rejected():
+    with pytest.raises(ValueError):
+        parseCSVfile.export_frame(pd.DataFrame({"a": [1]}), "xml")
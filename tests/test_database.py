@@ -0,0 +1,113 @@
+import pytest
+
+from modules.database import PortfolioDB
+
+
+@pytest.fixture
+def alice(db):
+    db.add_user("alice", "password")
+    db.save_portfolio("alice", {}, 1000.0, "2024-01-02")
+    return "alice"
+
+
+def test_trade_symbol_is_normalized(db, alice):
+    position = db.record_trade(alice, " tqqq ", 10, 20.0)
+
+    assert position["Symbol"] == "TQQQ"
+    assert [trade["symbol"] for trade in db.get_trades(alice)] == ["TQQQ"]
+
+
+@pytest.mark.parametrize("symbol, shares, price", [("", 1, 10.0), ("   ", 1, 10.0), ("TQQQ", 0, 10.0),
+                                                   ("TQQQ", 1, 0.0), ("TQQQ", 1, -5.0)])
+def test_invalid_trades_are_rejected(db, alice, symbol, shares, price):
+    with pytest.raises(ValueError):
+        db.record_trade(alice, symbol, shares, price)
+
+    assert db.get_trades(alice) == []
+
+
+def test_trades_fold_into_the_average_cost(db, alice):
+    db.record_trade(alice, "TQQQ", 10, 20.0)
+    db.record_trade(alice, "TQQQ", 10, 30.0)
+    position = db.record_trade(alice, "TQQQ", -5, 40.0, fees=1.0)
+
+    assert position["Shares"] == 15
+    assert position["Average Cost"] == 25.0
+    assert position["Realized P&L"] == 5 * (40.0 - 25.0) - 1.0
+
+
+def test_holdings_overwrites_stay_out_of_the_trade_ledger(db, alice):
+    db.save_portfolio(alice, {"TQQQ": {"Shares": 10, "Average Cost": 20.0}})
+
+    assert db.get_trades(alice) == []
+    assert [(row["symbol"], row["shares"]) for row in db.get_position_history(alice)] == [("TQQQ", 10)]
+
+
+def test_unchanged_saves_are_skipped(db, alice):
+    holdings = {"TQQQ": {"Shares": 10, "Average Cost": 20.0}}
+    db.save_portfolio(alice, holdings, 1000.0, "2024-01-02")
+    skipped = db.skipped_writes
+
+    assert db.save_portfolio(alice, dict(holdings), 1000.0, "2024-01-02")
+
+    assert db.skipped_writes == skipped + 1
+    assert len(db.get_position_history(alice)) == 1
+
+
+def test_saves_after_a_trade_are_written(db, alice):
+    holdings = {"TQQQ": {"Shares": 10, "Average Cost": 20.0}}
+    db.save_portfolio(alice, holdings)
+    db.record_trade(alice, "TQQQ", 5, 30.0)
+
+    db.save_portfolio(alice, holdings)
+
+    assert db.get_positions(alice)["TQQQ"]["Shares"] == 10
+    # The trade left the settings alone, so they are still known
+    skipped = db.skipped_writes
+    db.save_portfolio(alice, cash_balance=1000.0, start_date="2024-01-02")
+    assert db.skipped_writes == skipped + 1
+
+
+def test_writes_from_another_handler_are_not_skipped(db, alice, tmp_path):
+    holdings = {"TQQQ": {"Shares": 10, "Average Cost": 20.0}}
+    db.save_portfolio(alice, holdings, 1000.0)
+    other = PortfolioDB(str(tmp_path / "portfolio.db"), pool=db.pool, write_behind_seconds=0)
+    other.save_portfolio(alice, {"TQQQ": {"Shares": 1, "Average Cost": 20.0}}, 5.0)
+
+    db.save_portfolio(alice, holdings, 1000.0)
+
+    portfolio = other.get_portfolio(alice)
+    assert portfolio["portfolio_data"]["TQQQ"]["Shares"] == 10
+    assert portfolio["cash_balance"] == 1000.0
+
+
+def test_deferred_saves_collapse_into_one_write(tmp_path):
+    db = PortfolioDB(str(tmp_path / "portfolio.db"), write_behind_seconds=60)
+    try:
+        db.add_user("alice", "password")
+        for shares in (1, 2, 3):
+            db.save_portfolio_deferred("alice", {"TQQQ": {"Shares": shares, "Average Cost": 20.0}}, 500.0)
+
+        # Reads see the queued values before they are written
+        assert db.get_portfolio("alice")["portfolio_data"]["TQQQ"]["Shares"] == 3
+        assert db.get_positions("alice") == {}
+
+        db.flush()
+
+        assert [row["shares"] for row in db.get_position_history("alice")] == [3]
+        assert db.get_portfolio("alice")["cash_balance"] == 500.0
+    finally:
+        db.close()
+
+
+def test_trades_apply_on_top_of_queued_saves(tmp_path):
+    db = PortfolioDB(str(tmp_path / "portfolio.db"), write_behind_seconds=60)
+    try:
+        db.add_user("alice", "password")
+        db.save_portfolio_deferred("alice", {"TQQQ": {"Shares": 10, "Average Cost": 20.0}})
+
+        position = db.record_trade("alice", "TQQQ", 10, 30.0)
+
+        assert position["Shares"] == 20 and position["Average Cost"] == 25.0
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+import json
+import sqlite3
+
+from modules import migrations
+from modules.database import PortfolioDB
+
+
+def make_v1_database(path):
+    """A database as the original schema wrote it: holdings as a JSON blob"""
+    conn = sqlite3.connect(path)
+    migrations._v1_base_tables(conn)
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('alice', 'x')")
+    conn.execute(
+        "INSERT INTO portfolios (username, portfolio_data, cash_balance, start_date) VALUES (?, ?, ?, ?)",
+        ("alice", json.dumps({"tqqq": {"Shares": 10, "Average Cost": 20.0}}), 150.0, "2024-01-02")
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_v1_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    make_v1_database(path)
+
+    db = PortfolioDB(path, write_behind_seconds=0)
+    try:
+        portfolio = db.get_portfolio("alice")
+        assert portfolio["cash_balance"] == 150.0
+        assert portfolio["start_date"] == "2024-01-02"
+        assert {symbol.upper(): details["Shares"] for symbol, details in portfolio["portfolio_data"].items()} == {"TQQQ": 10}
+
+        # The converted holdings are history, not trades
+        assert db.get_trades("alice") == []
+        assert [(row["shares"], row["average_cost"]) for row in db.get_position_history("alice")] == [(10, 20.0)]
+
+        db.record_trade("alice", "TQQQ", 5, 26.0)
+        assert [trade["kind"] for trade in db.get_trades("alice")] == ["buy"]
+    finally:
+        db.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert migrations.current_version(conn) == migrations.MIGRATIONS[-1][0]
+        assert migrations.migrate(conn) == []
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    assert {"positions", "transactions", "valuation_snapshots", "snapshot_positions", "position_history"} <= tables
+
+
+def test_new_database_applies_every_migration(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "portfolio.db"))
+    try:
+        assert migrations.migrate(conn) == [number for number, _, _ in migrations.MIGRATIONS]
+    finally:
+        conn.close()
@@ -0,0 +1,66 @@
+import io
+
+import openpyxl
+import pytest
+
+from csvportion import parseCSVfile
+from csvportion.parseCSVfile import import_positions
+
+
+def csv_file(text):
+    file = io.BytesIO(text.encode())
+    file.name = "positions.csv"
+    return file
+
+
+def test_rows_for_the_same_symbol_are_combined():
+    positions, report = import_positions(csv_file("Symbol,Shares,Average Cost\ntqqq,10,20\nTQQQ,30,40\nAGG,5,100\n"))
+
+    assert positions == {"TQQQ": {"Average Cost": 35.0, "Shares": 40.0},
+                         "AGG": {"Average Cost": 100.0, "Shares": 5.0}}
+    assert report.rows_imported == 3
+
+
+def test_zero_and_negative_shares_are_invalid_rows():
+    positions, report = import_positions(csv_file("Symbol,Shares,Average Cost\nTQQQ,10,20\nTQQQ,-10,20\nAGG,0,100\n"))
+
+    assert positions == {"TQQQ": {"Average Cost": 20.0, "Shares": 10.0}}
+    assert report.rows_imported == 1
+    assert report.error_counts == {"rows with invalid shares": 2}
+    assert [row for row, _ in report.error_samples] == [3, 4]
+
+
+def test_symbols_are_combined_across_chunks(monkeypatch):
+    monkeypatch.setattr(parseCSVfile, "CHUNK_ROWS", 2)
+    rows = "".join(f"{symbol},10,{cost}\n" for symbol, cost in [("TQQQ", 10), ("AGG", 100), ("tqqq", 30),
+                                                                ("BAD", "x"), ("TQQQ", 20)])
+
+    positions, report = import_positions(csv_file("Symbol,Shares,Average Cost\n" + rows))
+
+    assert positions == {"TQQQ": {"Average Cost": 20.0, "Shares": 30.0},
+                         "AGG": {"Average Cost": 100.0, "Shares": 10.0}}
+    assert report.rows_read == 5 and report.rows_imported == 4
+    # Row numbers carry on from one chunk to the next
+    assert report.error_samples == [(5, "rows with invalid average cost")]
+
+
+def test_excel_rows_are_read_in_chunks(monkeypatch):
+    monkeypatch.setattr(parseCSVfile, "CHUNK_ROWS", 2)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Account", "Symbol", "Shares", "Average Cost"])
+    for row in [("A", "TQQQ", 10, 10.0), ("A", "AGG", 5, 100.0), ("B", "TQQQ", 10, 30.0)]:
+        sheet.append(row)
+    file = io.BytesIO()
+    workbook.save(file)
+    file.name = "positions.xlsx"
+
+    assert [len(chunk) for chunk in parseCSVfile.read_chunks(file)] == [2, 1]
+    positions, _ = import_positions(file)
+    assert positions == {"TQQQ": {"Average Cost": 20.0, "Shares": 20.0},
+                         "AGG": {"Average Cost": 100.0, "Shares": 5.0}}
+
+
+def test_missing_columns_are_reported():
+    with pytest.raises(ValueError, match="Average Cost"):
+        import_positions(csv_file("Symbol,Shares\nTQQQ,10\n"))
@@ -0,0 +1,107 @@
+import threading
+
+import pandas as pd
+
+from modules.price_cache import FakeFetcher, PriceCache
+
+
+class GatedFetcher(FakeFetcher):
+    """FakeFetcher whose downloads of `gated` symbols wait until the gate opens"""
+
+    def __init__(self, gated):
+        super().__init__()
+        self.gated = set(gated)
+        self.gate = threading.Event()
+        self.waiting = threading.Event()
+
+    def fetch(self, symbols, start, end):
+        if self.gated & set(symbols):
+            self.waiting.set()
+            assert self.gate.wait(10)
+        return super().fetch(symbols, start, end)
+
+
+def test_repeated_requests_are_served_from_the_store(price_cache, fetcher):
+    first = price_cache.get_history("AAA", "2020-01-01")
+    assert len(fetcher.calls) == 1
+
+    again = price_cache.get_history("aaa", "2021-01-01")
+
+    assert len(fetcher.calls) == 1
+    assert again.equals(first.loc[first.index >= "2021-01-01"])
+
+
+def test_only_the_missing_head_is_fetched(price_cache, fetcher):
+    price_cache.get_history("AAA", "2020-01-01")
+
+    earlier = price_cache.get_history("AAA", "2019-01-01")
+
+    symbols, start, end = fetcher.calls[-1]
+    assert (symbols, start, end) == (["AAA"], pd.Timestamp("2019-01-01"), pd.Timestamp("2020-01-01"))
+    assert earlier.index[0] == pd.Timestamp("2019-01-01")
+    assert earlier.index.is_unique
+
+
+def test_stale_symbols_are_topped_up_from_their_last_day(tmp_path, fetcher):
+    cache = PriceCache(str(tmp_path / "prices.db"), fetcher, refresh_seconds=0)
+    try:
+        history = cache.get_history("AAA", "2020-01-01")
+        cache.get_history("AAA", "2020-01-01")
+
+        symbols, start, _ = fetcher.calls[-1]
+        assert symbols == ["AAA"]
+        assert start == history.index[-1]
+    finally:
+        cache.close()
+
+
+def test_missing_symbols_are_fetched_in_one_batch(price_cache, fetcher):
+    price_cache.get_closes(["AAA", "BBB", "CCC"], "2020-01-01")
+
+    assert [sorted(symbols) for symbols, _, _ in fetcher.calls] == [["AAA", "BBB", "CCC"]]
+
+
+def test_cached_reads_do_not_wait_on_a_download(tmp_path):
+    fetcher = GatedFetcher(["SLOW"])
+    cache = PriceCache(str(tmp_path / "prices.db"), fetcher)
+    try:
+        cache.get_history("AAA", "2020-01-01")
+        slow = threading.Thread(target=cache.get_history, args=("SLOW", "2020-01-01"))
+        slow.start()
+        assert fetcher.waiting.wait(10)
+
+        # The store is not locked while SLOW downloads
+        read = []
+        reader = threading.Thread(target=lambda: read.append(cache.get_closes(["AAA"], "2020-01-01")))
+        reader.start()
+        reader.join(5)
+        assert read and not read[0].empty
+
+        fetcher.gate.set()
+        slow.join(10)
+        assert not cache.get_history("SLOW", "2020-01-01").empty
+    finally:
+        fetcher.gate.set()
+        cache.close()
+
+
+def test_concurrent_requests_download_a_symbol_once(tmp_path):
+    fetcher = GatedFetcher(["AAA"])
+    cache = PriceCache(str(tmp_path / "prices.db"), fetcher)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_history("AAA", "2020-01-01")))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        assert fetcher.waiting.wait(10)
+        fetcher.gate.set()
+        for thread in threads:
+            thread.join(10)
+
+        assert len(fetcher.calls) == 1
+        assert len(results) == 4
+        assert all(result.equals(results[0]) for result in results)
+    finally:
+        fetcher.gate.set()
+        cache.close()
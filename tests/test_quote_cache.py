@@ -0,0 +1,130 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from modules import quote_cache
+from modules.quote_cache import QuoteCache
+
+
+class Loader:
+    """Quote loader that records each batch it is asked for"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+        self.gate = None
+        self.waiting = threading.Event()
+
+    def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        if self.gate is not None:
+            self.waiting.set()
+            assert self.gate.wait(10)
+        return {symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices}
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quote_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_quotes_are_reused_until_their_ttl_runs_out(clock):
+    loader = Loader({"AAA": 10.0})
+    cache = QuoteCache(loader, ttl_seconds=60)
+
+    assert cache.get("aaa") == 10.0
+    clock[0] += 59
+    assert cache.get("AAA") == 10.0
+    assert len(loader.calls) == 1
+
+    clock[0] += 1
+    loader.prices["AAA"] = 11.0
+    assert cache.get("AAA") == 11.0
+    assert len(loader.calls) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_ttl_overrides_are_per_symbol(clock):
+    loader = Loader({"AAA": 10.0, "BBB": 20.0})
+    cache = QuoteCache(loader, ttl_seconds=60, ttl_overrides={"bbb": 5})
+    cache.get_many(["AAA", "BBB"])
+
+    clock[0] += 10
+    cache.get_many(["AAA", "BBB"])
+
+    assert loader.calls == [["AAA", "BBB"], ["BBB"]]
+
+
+def test_missing_quotes_are_cached_as_none(clock):
+    loader = Loader({"AAA": 10.0})
+    cache = QuoteCache(loader, ttl_seconds=60)
+
+    assert cache.get_many(["AAA", "NOPE"]) == {"AAA": 10.0, "NOPE": None}
+    assert cache.get("NOPE") is None
+    assert len(loader.calls) == 1
+
+
+def test_concurrent_misses_are_loaded_once():
+    loader = Loader({"AAA": 10.0})
+    loader.gate = threading.Event()
+    cache = QuoteCache(loader, ttl_seconds=60)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("AAA"))) for _ in range(4)]
+    threads[0].start()
+    assert loader.waiting.wait(10)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: cache.stats()["coalesced"] == 3)
+    loader.gate.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == [10.0] * 4
+    assert loader.calls == [["AAA"]]
+    assert cache.stats()["loads"] == 1
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    loader = Loader({})
+    loader.gate = threading.Event()
+    failing = [True]
+
+    def load(symbols):
+        loader(symbols)
+        if failing[0]:
+            raise RuntimeError("quote source down")
+        return {"AAA": 10.0}
+
+    cache = QuoteCache(load, ttl_seconds=60)
+    errors = []
+
+    def get():
+        try:
+            cache.get("AAA")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(2)]
+    threads[0].start()
+    assert loader.waiting.wait(10)
+    threads[1].start()
+    wait_for(lambda: cache.stats()["coalesced"] == 1)
+    loader.gate.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(errors) == 2
+    failing[0] = False
+    assert cache.get("AAA") == 10.0
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import rebalance
+
+TODAY = pd.Timestamp("2026-10-18")
+
+
+def stepped_boundaries(start, until):
+    """Boundaries the way they were originally computed: 3 months at a time with DateOffset"""
+    boundaries = [pd.Timestamp(start)]
+    while boundaries[-1] + pd.DateOffset(months=3) <= until:
+        boundaries.append(boundaries[-1] + pd.DateOffset(months=3))
+    return boundaries
+
+
+@pytest.mark.parametrize("start", ["1999-11-30", "2000-02-29", "2015-01-31", "2016-11-30", "2019-08-31", "2020-02-29", "2023-05-30",
+                                   "2024-01-15", "2024-03-31"])
+def test_boundaries_match_dateoffset_stepping(start):
+    schedule = rebalance.QuarterSchedule(start)
+    expected = stepped_boundaries(start, TODAY)
+
+    assert list(schedule.boundaries(TODAY)) == expected
+    assert schedule.previous_boundary(TODAY) == expected[-1]
+    assert schedule.next_boundary(TODAY) == expected[-1] + pd.DateOffset(months=3)
+    assert schedule.elapsed(TODAY) == len(expected) - 1
+
+
+def test_quarter_status_matches_dateoffset_stepping_for_month_ends():
+    starts = pd.DatetimeIndex([day for day in pd.date_range("2012-01-01", "2026-09-30") if day.day >= 28])
+    status = rebalance.quarter_status(starts, TODAY)
+
+    expected = [stepped_boundaries(start, TODAY) for start in starts]
+    assert list(status["previous_quarter"]) == [boundaries[-1] for boundaries in expected]
+    assert list(status["next_quarter"]) == [boundaries[-1] + pd.DateOffset(months=3) for boundaries in expected]
+    assert np.array_equal(status["elapsed"].to_numpy(), [len(boundaries) - 1 for boundaries in expected])
+
+
+def test_future_start_has_no_elapsed_quarters():
+    status = rebalance.quarter_status(["2027-01-31"], TODAY)
+
+    assert status["elapsed"][0] == 0
+    assert status["next_quarter"][0] == pd.Timestamp("2027-01-31")
+
+
+def test_last_quarter_uses_the_schedule():
+    start = pd.Timestamp("2015-01-31")
+    schedule = rebalance.get_schedule(start)
+
+    assert rebalance.get_last_quarter(start) == schedule.previous_boundary()
+    assert rebalance.get_next_quarter(start) == schedule.next_boundary()
+    # The old name took the next quarter date; calls to it must not quietly mean something else
+    assert not hasattr(rebalance, "get_previous_quarter")
+
+
+def test_single_lookups_match_quarter_status():
+    starts = pd.date_range("1995-01-01", "2026-12-31", freq="5D")
+    status = rebalance.quarter_status(starts, TODAY)
+
+    for start, previous, following in zip(starts, status["previous_quarter"], status["next_quarter"]):
+        schedule = rebalance.QuarterSchedule(start)
+        assert schedule.next_boundary(TODAY) == following
+        if start <= TODAY:
+            assert schedule.previous_boundary(TODAY) == previous
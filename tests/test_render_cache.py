@@ -0,0 +1,98 @@
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pytest
+
+import modules.render_cache
+from modules.render_cache import RenderCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    modules.render_cache.get_render_cache().clear()
+    yield
+    modules.render_cache.get_render_cache().clear()
+
+
+class CountingBuild:
+    """Chart builder that draws a tiny figure and counts its calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        fig, ax = plt.subplots(figsize=(1, 1))
+        ax.plot([0, 1], [0, self.calls])
+        return fig
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RenderCache(max_bytes=10, max_entries=2)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    cache.put("d", b"12345678")
+    assert len(cache) == 1 and cache.size_bytes == 8
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_chart_is_rebuilt_only_when_its_inputs_change(price_cache):
+    build = CountingBuild()
+    positions = {"AAA": {"Shares": 10, "Average Cost": 1.0}}
+    price_cache.ensure(["AAA"], "2024-01-01")
+
+    first = modules.render_cache.render_chart("chart", build, positions, "2024-01-01")
+    # Average cost isn't drawn, so it isn't part of the key
+    again = modules.render_cache.render_chart("chart", build, {"aaa": {"Shares": 10, "Average Cost": 2.0}},
+                                              "2024-01-01")
+    assert build.calls == 1 and again == first
+
+    modules.render_cache.render_chart("chart", build, {"AAA": {"Shares": 11, "Average Cost": 1.0}}, "2024-01-01")
+    assert build.calls == 2
+    modules.render_cache.render_chart("chart", build, positions, "2024-02-01")
+    assert build.calls == 3
+    modules.render_cache.render_chart("other", build, positions, "2024-01-01")
+    assert build.calls == 4
+
+
+def test_new_prices_rebuild_the_chart(price_cache):
+    build = CountingBuild()
+    positions = {"AAA": {"Shares": 10, "Average Cost": 1.0}}
+    price_cache.ensure(["AAA"], "2024-01-01")
+    modules.render_cache.render_chart("chart", build, positions, "2024-01-01")
+
+    time.sleep(0.01)
+    price_cache.invalidate("AAA")
+    price_cache.ensure(["AAA"], "2024-01-01")
+    modules.render_cache.render_chart("chart", build, positions, "2024-01-01")
+
+    assert build.calls == 2
+
+
+def test_versioned_chart_is_drawn_once_per_version():
+    build = CountingBuild()
+
+    first = modules.render_cache.render_versioned("history", build, ("alice", "2024-01-02", "2024-06-28", 125))
+    again = modules.render_cache.render_versioned("history", build, ("alice", "2024-01-02", "2024-06-28", 125))
+    assert build.calls == 1 and again == first and first.startswith(b"\x89PNG")
+
+    modules.render_cache.render_versioned("history", build, ("alice", "2024-01-02", "2024-07-01", 126))
+    modules.render_cache.render_versioned("history", build, ("bob", "2024-01-02", "2024-06-28", 125))
+    assert build.calls == 3
+
+
+def test_no_figure_is_not_cached():
+    calls = []
+    assert modules.render_cache.render_versioned("empty", lambda: calls.append(1), "v") is None
+    assert modules.render_cache.render_versioned("empty", lambda: calls.append(1), "v") is None
+    assert len(calls) == 2
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+import modules.market_data
+from modules.return_index import ReturnIndex
+
+
+def window_change(closes, start, end):
+    """Percent change over [start, end) by compounding pct_change on the days in it"""
+    window = closes.loc[(closes.index >= start) & (closes.index < end)]
+    return ((1 + window.pct_change().dropna()).prod() - 1) * 100
+
+
+def test_range_returns_match_pct_change(price_cache):
+    closes = price_cache.get_closes(["AAA"], "2020-01-01", adjust="total")["AAA"]
+    index = ReturnIndex(closes)
+    starts = pd.to_datetime(["2020-01-01", "2020-03-14", "2021-06-30", "2022-12-25"])
+    ends = pd.to_datetime(["2020-04-01", "2020-12-31", "2021-07-15", "2023-01-03"])
+
+    expected = [window_change(closes, start, end) for start, end in zip(starts, ends)]
+
+    assert np.allclose(index.range_returns(starts, ends), expected)
+
+
+def test_empty_ranges_are_nan():
+    closes = pd.Series([10.0, 11.0, 12.1], index=pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"]))
+    index = ReturnIndex(closes)
+
+    returns = index.range_returns(["2024-01-02", "2024-01-06", "2023-01-01"], ["2024-01-05", "2024-01-09", "2023-06-01"])
+
+    assert np.isclose(returns[0], 21.0)
+    assert np.isnan(returns[1:]).all()
+
+
+def test_shared_index_matches_total_return_closes(price_cache):
+    closes = modules.market_data.get_price_frame(["AAA"], "2022-01-01", adjust="total")["AAA"]
+    index = modules.market_data.get_return_index("AAA", "2022-01-01")
+
+    assert np.isclose(index.range_returns(["2022-02-01"], ["2022-08-01"])[0],
+                      window_change(closes, pd.Timestamp("2022-02-01"), pd.Timestamp("2022-08-01")))
+    assert modules.market_data.get_return_index("aaa", "2023-01-01") is index
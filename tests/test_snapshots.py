@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import modules.market_data
+from modules.snapshots import history_version, update_snapshots, value_history
+
+TODAY = pd.Timestamp.today().normalize()
+
+
+def make_user(db, username, holdings, cash=0.0, start_date="2024-03-01"):
+    db.add_user(username, "password")
+    db.save_portfolio(username, holdings, cash, start_date)
+
+
+@pytest.fixture
+def writes(db, monkeypatch):
+    """Snapshot rows each save_snapshots call was given"""
+    calls = []
+    save = db.save_snapshots
+
+    def recording(totals, positions):
+        calls.append(len(totals))
+        save(totals, positions)
+
+    monkeypatch.setattr(db, "save_snapshots", recording)
+    return calls
+
+
+def test_first_update_backfills_completed_days(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}}, 100.0)
+
+    values = value_history(db, "alice")
+    closes = modules.market_data.get_price_frame(["AAA"], "2024-03-01", TODAY)["AAA"]
+
+    assert values.index.equals(closes.index)
+    assert values.index[-1] < TODAY
+    assert np.allclose(values["Total"].to_numpy(), (10 * closes + 100.0).round(2).to_numpy())
+
+
+def test_up_to_date_history_writes_nothing(db, price_cache, writes):
+    make_user(db, "alice", {"AAA": {"Shares": 1, "Average Cost": 1}})
+    first = value_history(db, "alice")
+    assert writes and writes[0] == len(first)
+
+    writes.clear()
+    again = value_history(db, "alice")
+
+    assert writes == []
+    assert again.equals(first)
+    assert update_snapshots(db) == 0
+
+
+def test_earlier_start_date_fills_only_the_new_days(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}})
+    before = value_history(db, "alice")
+
+    db.save_portfolio("alice", start_date="2024-01-02")
+    after = value_history(db, "alice")
+
+    assert after.index[0] == pd.Timestamp("2024-01-02")
+    assert after.loc[before.index].equals(before)
+
+
+def test_later_start_date_drops_earlier_days(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}})
+    before = value_history(db, "alice")
+
+    db.save_portfolio("alice", start_date="2025-01-02")
+    after = value_history(db, "alice", refresh=False)
+
+    assert after.index[0] >= pd.Timestamp("2025-01-02")
+    assert after.equals(before.loc[before.index >= "2025-01-02"])
+
+
+def test_portfolio_changes_keep_past_days(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}})
+    before = value_history(db, "alice")
+
+    db.record_trade("alice", "AAA", 10, 5.0)
+    db.save_portfolio("alice", {"BBB": {"Shares": 1, "Average Cost": 1}}, 50.0)
+
+    assert value_history(db, "alice").equals(before)
+
+
+def test_portfolio_changes_drop_days_from_today(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}})
+    value_history(db, "alice")
+    today = TODAY.strftime("%Y-%m-%d")
+    db.save_snapshots([("alice", today, 1.0, 0.0)], [("alice", today, "AAA", 10.0, 1.0)])
+
+    db.record_trade("alice", "AAA", 10, 5.0)
+
+    assert db.get_snapshots("alice", today) == {"totals": [], "positions": []}
+
+
+def test_cash_only_portfolio_is_a_constant_series(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 1, "Average Cost": 1}})
+    make_user(db, "carol", {}, 500.0)
+
+    update_snapshots(db)
+    values = value_history(db, "carol", refresh=False)
+
+    assert not values.empty
+    assert values.index[0] >= pd.Timestamp("2024-03-01")
+    assert (values["Total"] == 500.0).all()
+    assert (values["Cash"] == 500.0).all()
+
+
+def test_cash_only_chunk_is_valued_on_weekdays(db, price_cache):
+    make_user(db, "carol", {}, 500.0, start_date="2025-01-01")
+
+    values = value_history(db, "carol")
+
+    assert values.index.equals(pd.bdate_range("2025-01-01", TODAY - pd.Timedelta(days=1), name="Date"))
+    assert value_history(db, "carol").equals(values)
+
+
+def test_history_version_follows_the_stored_days(db, price_cache):
+    make_user(db, "alice", {"AAA": {"Shares": 10, "Average Cost": 1}})
+    values = value_history(db, "alice")
+    version = history_version("alice", values)
+
+    assert history_version("alice", value_history(db, "alice")) == version
+    assert history_version("alice", values.iloc[:-1]) != version
+    assert history_version("bob", values) != version